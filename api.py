@@ -3,19 +3,26 @@
 Использование: uvicorn api:app --reload --port 8000
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Literal
 import json
 from datetime import datetime
 from collections import defaultdict
 import tempfile
+import time
 import os
 
 from hh_parser import HHParser
 from contacts_search_engine import ContactsSearchEngine
+from quota_ledger import QuotaLedger, QuotaPlanner
+from near_duplicates import remove_near_duplicates
+from company_resolution import CompanyResolver
+from vacancy_store import default_store
+import metrics
+import tracing
 
 # ================================================================
 # ИНИЦИАЛИЗАЦИЯ FASTAPI
@@ -32,13 +39,31 @@ app = FastAPI(
 import os
 API_KEY_2GIS = os.getenv("API_KEY_2GIS", "75730e35-2767-46d6-b42b-548b4acae13e")
 
+# Квота 2GIS общая для API и батч-скриптов (пустое значение = без лимита)
+QUOTA_2GIS_DAILY = os.getenv("QUOTA_2GIS_DAILY", "")
+QUOTA_2GIS_MONTHLY = os.getenv("QUOTA_2GIS_MONTHLY", "1000")
+
+quota_ledger = QuotaLedger(
+    ledger_file=os.getenv("QUOTA_LEDGER_FILE", "api_quota_ledger.json"),
+    limits={
+        '2gis': {
+            'daily': int(QUOTA_2GIS_DAILY) if QUOTA_2GIS_DAILY else None,
+            'monthly': int(QUOTA_2GIS_MONTHLY) if QUOTA_2GIS_MONTHLY else None
+        }
+    }
+)
+
 contacts_engine = ContactsSearchEngine(
     api_key_2gis=API_KEY_2GIS,
     enable_2gis=True,
     enable_hh=True,
-    enable_website_parsing=True
+    enable_website_parsing=True,
+    quota_ledger=quota_ledger
 )
 
+# "ГК Ромашка" и "Ромашка Групп" при дедупликации - одна компания
+company_resolver = CompanyResolver()
+
 # CORS (для доступа из браузера/n8n)
 app.add_middleware(
     CORSMiddleware,
@@ -49,6 +74,39 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Задержка и статус каждого запроса по шаблону пути (/api/vacancy/{vacancy_id})"""
+    method = request.method
+    metrics.API_IN_PROGRESS.inc(method=method)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.API_IN_PROGRESS.dec(method=method)
+        route = request.scope.get('route')
+        endpoint = getattr(route, 'path', 'unmatched')
+        metrics.API_LATENCY.observe(time.perf_counter() - start, method=method, endpoint=endpoint)
+        metrics.API_REQUESTS.inc(method=method, endpoint=endpoint, status=status)
+
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    """
+    Трасса на каждый запрос: этапы парсера, дедупликации и поиска контактов
+    пишут в нее время (сводка - include_timings, выгрузка - TRACE_EXPORT)
+    """
+    with tracing.start_trace(f"{request.method} {request.url.path}") as trace:
+        response = await call_next(request)
+        route = request.scope.get('route')
+        if route is not None:
+            trace.name = trace.root.name = f"{request.method} {route.path}"
+        return response
+
+
 # ================================================================
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 # ================================================================
@@ -138,16 +196,21 @@ def calculate_vacancy_score(vacancy: Dict) -> int:
     return score
 
 
-def deduplicate_vacancies(vacancies: List[Dict]) -> List[Dict]:
+@tracing.traced('deduplicate_vacancies')
+def deduplicate_vacancies(vacancies: List[Dict], near_duplicate_threshold: Optional[float] = None) -> List[Dict]:
     """
     Удаляет дубликаты вакансий от одной компании
     Оставляет только лучшую вакансию от каждой компании
+    
+    Если задан near_duplicate_threshold, затем удаляет вакансии с почти
+    одинаковым описанием от разных компаний (MinHash/LSH, порог Жаккара)
     """
     if not vacancies:
         return []
     
-    # Группируем по компаниям
+    # Группируем по компаниям (с учетом вариантов написания названия)
     companies = defaultdict(list)
+    company_keys = company_resolver.cluster(v.get('компания', '') for v in vacancies)
     
     for vacancy in vacancies:
         company = vacancy.get('компания', '')
@@ -155,7 +218,7 @@ def deduplicate_vacancies(vacancies: List[Dict]) -> List[Dict]:
             # Вакансии без компании оставляем как есть
             companies[f'_no_company_{id(vacancy)}'].append(vacancy)
         else:
-            normalized = normalize_company_name(company)
+            normalized = company_keys.get(company) or normalize_company_name(company)
             companies[normalized].append(vacancy)
     
     # Выбираем лучшую вакансию от каждой компании
@@ -182,9 +245,14 @@ def deduplicate_vacancies(vacancies: List[Dict]) -> List[Dict]:
             result.append(best_vacancy)
             duplicates_removed += len(company_vacancies) - 1
     
+    # Копии одного текста под разными работодателями
+    if near_duplicate_threshold:
+        result, _ = remove_near_duplicates(result, near_duplicate_threshold, calculate_vacancy_score)
+    
     return result
 
 
+@tracing.traced('create_txt_file')
 def create_txt_file(vacancies: List[Dict], filename: str = None) -> str:
     """
     Создаёт TXT файл с вакансиями и возвращает путь к файлу
@@ -231,6 +299,27 @@ class VacancySearchRequest(BaseModel):
     )
     limit: int = Field(20, description="Сколько ВЕРНУТЬ самых свежих вакансий (по умолчанию 20)", json_schema_extra={"example": 20}, ge=1, le=1000)
     max_results: int = Field(10000, description="Максимум вакансий для ПОИСКА (внутренний параметр, по умолчанию 10000)", json_schema_extra={"example": 10000}, ge=1, le=10000)
+    near_duplicate_threshold: Optional[float] = Field(
+        None,
+        description="Удалять вакансии с почти одинаковым описанием (порог схожести 0.5-1.0, по умолчанию выключено)",
+        json_schema_extra={"example": 0.8},
+        ge=0.5,
+        le=1.0
+    )
+    include_timings: bool = Field(
+        False,
+        description="Добавить в statistics время этапов запроса (страницы HH.ru, детали, паузы, дедупликация)",
+        json_schema_extra={"example": False}
+    )
+    source: Literal["hh", "local"] = Field(
+        "hh",
+        description=(
+            "Откуда брать вакансии: hh - поиск на HH.ru, local - локальное хранилище прошлых поисков "
+            "(без запросов к HH.ru). local ищет слова по упрощенной основе без морфологии HH.ru: "
+            "часть форм слова не находится (\"заявки\" не найдет \"заявок\"), выдача может быть меньше"
+        ),
+        json_schema_extra={"example": "hh"}
+    )
 
 
 class VacancyItem(BaseModel):
@@ -238,6 +327,8 @@ class VacancyItem(BaseModel):
     id: str
     название: str
     компания: str
+    employer_id: str = ""
+    area_id: str = ""
     оплата: str
     описание: str
     ссылка: str
@@ -265,8 +356,9 @@ class HealthResponse(BaseModel):
 class ContactsSearchRequest(BaseModel):
     """Запрос на поиск контактов компании"""
     company_name: str = Field(..., description="Название компании", example="Яндекс")
-    city: str = Field("Москва", description="Город поиска", example="Москва")
+    city: Optional[str] = Field(None, description="Город поиска (по умолчанию - регион работодателя HH.ru или Москва)", example="Москва")
     vacancy_link: Optional[str] = Field(None, description="Ссылка на вакансию HH.ru (опционально)", example="https://hh.ru/vacancy/123456")
+    employer_id: Optional[str] = Field(None, description="ID работодателя HH.ru из выдачи поиска (опционально, быстрее чем vacancy_link)", example="1740")
 
 
 class ContactsSearchResponse(BaseModel):
@@ -281,6 +373,51 @@ class ContactsSearchResponse(BaseModel):
     from_cache: bool
 
 
+def local_store(source: str):
+    """
+    Локальное хранилище для source=local (400, если оно выключено)
+    """
+    store = default_store()
+    if source == "local" and store is None:
+        raise HTTPException(status_code=400, detail="Локальное хранилище выключено (VACANCY_STORE_FILE)")
+    return store
+
+
+def find_vacancies(request: VacancySearchRequest, source: str, store) -> List[Dict]:
+    """
+    Ищет ВСЕ вакансии запроса на HH.ru или в локальном хранилище (source=local)
+    """
+    if source == "local":
+        with tracing.span('store.search'):
+            return store.search(
+                keywords=request.keywords,
+                area=request.region,
+                salary=request.min_salary,
+                only_with_salary=request.only_with_salary,
+                period=request.period,
+                excluded_text=request.excluded_words,
+                limit=request.max_results
+            )
+    
+    # Инициализация парсера (найденное сохраняется в локальное хранилище)
+    parser = HHParser(delay=0.3)
+    
+    # Вычисляем количество страниц для поиска ВСЕХ вакансий
+    max_pages = (request.max_results + 99) // 100  # Округление вверх
+    
+    # ВАЖНО: Ищем ВСЕ вакансии с сортировкой по дате!
+    return parser.search_vacancies(
+        keywords=request.keywords,
+        area=request.region,
+        salary=request.min_salary,
+        only_with_salary=request.only_with_salary,
+        period=request.period,
+        excluded_text=request.excluded_words,
+        order_by='publication_time',  # ВСЕГДА по дате!
+        max_pages=max_pages
+    )
+
+
 # ================================================================
 # ЭНДПОИНТЫ API
 # ================================================================
@@ -309,8 +446,16 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    📈 Метрики в формате Prometheus (запросы к HH.ru/2GIS/сайтам, кеши, очереди, эндпоинты)
+    """
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.post("/api/search", response_model=VacancySearchResponse)
-async def search_vacancies(request: VacancySearchRequest):
+async def search_vacancies(request: VacancySearchRequest, source: Optional[Literal["hh", "local"]] = None):
     """
     🔍 ОСНОВНОЙ ЭНДПОИНТ: Поиск вакансий
     
@@ -323,37 +468,28 @@ async def search_vacancies(request: VacancySearchRequest):
     4. Возвращает только первые `limit` штук (по умолчанию 20)
     
     Это позволяет N8N получать только самые актуальные вакансии без дубликатов!
+    
+    source=local (в теле или `/api/search?source=local`) - поиск по локальному
+    хранилищу прошлых поисков за миллисекунды, без запросов к HH.ru.
     """
+    source = source or request.source
+    store = local_store(source)
+    
     try:
-        # Инициализация парсера
-        parser = HHParser(delay=0.3)
-        
-        # Вычисляем количество страниц для поиска ВСЕХ вакансий
-        max_pages = (request.max_results + 99) // 100  # Округление вверх
-        
-        # ВАЖНО: Ищем ВСЕ вакансии с сортировкой по дате!
-        all_vacancies = parser.search_vacancies(
-            keywords=request.keywords,
-            area=request.region,
-            salary=request.min_salary,
-            only_with_salary=request.only_with_salary,
-            period=request.period,
-            excluded_text=request.excluded_words,
-            order_by='publication_time',  # ВСЕГДА по дате!
-            max_pages=max_pages
-        )
+        all_vacancies = find_vacancies(request, source, store)
         
         # ДЕДУПЛИЦИРУЕМ (удаляем дубликаты компаний)
         before_dedup = len(all_vacancies)
-        all_vacancies = deduplicate_vacancies(all_vacancies)
+        all_vacancies = deduplicate_vacancies(all_vacancies, request.near_duplicate_threshold)
         after_dedup = len(all_vacancies)
         duplicates_removed = before_dedup - after_dedup
         
         # Сортируем по дате (на всякий случай, если API вернул не в порядке)
-        all_vacancies.sort(
-            key=lambda x: x.get('дата_публикации', ''), 
-            reverse=True  # Новые первыми
-        )
+        with tracing.span('sort'):
+            all_vacancies.sort(
+                key=lambda x: x.get('дата_публикации', ''), 
+                reverse=True  # Новые первыми
+            )
         
         # ОГРАНИЧИВАЕМ до limit самых свежих
         freshest_vacancies = all_vacancies[:request.limit]
@@ -370,6 +506,7 @@ async def search_vacancies(request: VacancySearchRequest):
             "with_salary": with_salary_count,
             "with_salary_percent": round(with_salary_count / len(freshest_vacancies) * 100, 1) if freshest_vacancies else 0,
             "unique_companies": unique_companies,
+            "source": source,
             "search_params": {
                 "keywords": request.keywords,
                 "region": request.region,
@@ -379,6 +516,10 @@ async def search_vacancies(request: VacancySearchRequest):
             }
         }
         
+        trace = tracing.current_trace()
+        if request.include_timings and trace:
+            statistics["timings"] = trace.timings()
+        
         return {
             "success": True,
             "count": len(freshest_vacancies),
@@ -424,10 +565,11 @@ async def search_quick(
         after_dedup = len(all_vacancies)
         
         # Сортируем по дате
-        all_vacancies.sort(
-            key=lambda x: x.get('дата_публикации', ''), 
-            reverse=True
-        )
+        with tracing.span('sort'):
+            all_vacancies.sort(
+                key=lambda x: x.get('дата_публикации', ''), 
+                reverse=True
+            )
         
         # Берём только N самых свежих
         freshest_vacancies = all_vacancies[:limit]
@@ -485,7 +627,7 @@ async def get_regions():
 
 
 @app.post("/api/search-txt")
-async def search_vacancies_txt(request: VacancySearchRequest):
+async def search_vacancies_txt(request: VacancySearchRequest, source: Optional[Literal["hh", "local"]] = None):
     """
     📄 ПОИСК ВАКАНСИЙ С ВОЗВРАТОМ TXT ФАЙЛА
     
@@ -499,35 +641,26 @@ async def search_vacancies_txt(request: VacancySearchRequest):
     4. Берёт только limit самых свежих
     5. Создаёт TXT файл
     6. Возвращает файл
+    
+    source=local - как в /api/search, из локального хранилища.
     """
+    source = source or request.source
+    store = local_store(source)
+    
     try:
-        # Инициализация парсера
-        parser = HHParser(delay=0.3)
-        
-        # Вычисляем количество страниц
-        max_pages = (request.max_results + 99) // 100
-        
         # Ищем ВСЕ вакансии
-        all_vacancies = parser.search_vacancies(
-            keywords=request.keywords,
-            area=request.region,
-            salary=request.min_salary,
-            only_with_salary=request.only_with_salary,
-            period=request.period,
-            excluded_text=request.excluded_words,
-            order_by='publication_time',
-            max_pages=max_pages
-        )
+        all_vacancies = find_vacancies(request, source, store)
         
         # ДЕДУПЛИЦИРУЕМ
         before_dedup = len(all_vacancies)
-        all_vacancies = deduplicate_vacancies(all_vacancies)
+        all_vacancies = deduplicate_vacancies(all_vacancies, request.near_duplicate_threshold)
         
         # Сортируем по дате
-        all_vacancies.sort(
-            key=lambda x: x.get('дата_публикации', ''), 
-            reverse=True
-        )
+        with tracing.span('sort'):
+            all_vacancies.sort(
+                key=lambda x: x.get('дата_публикации', ''), 
+                reverse=True
+            )
         
         # Берём только limit самых свежих
         freshest_vacancies = all_vacancies[:request.limit]
@@ -619,7 +752,8 @@ async def search_company_contacts(request: ContactsSearchRequest):
         result = contacts_engine.search_company(
             company_name=request.company_name,
             city=request.city,
-            vacancy_link=request.vacancy_link
+            vacancy_link=request.vacancy_link,
+            employer_id=request.employer_id
         )
         
         return {
@@ -634,7 +768,8 @@ async def search_company_contacts(request: ContactsSearchRequest):
 @app.post("/api/contacts/search-quick")
 async def search_company_contacts_quick(
     company_name: str,
-    city: str = "Москва"
+    city: Optional[str] = None,
+    employer_id: Optional[str] = None
 ):
     """
     ⚡ БЫСТРЫЙ ПОИСК КОНТАКТОВ (упрощенный)
@@ -644,7 +779,8 @@ async def search_company_contacts_quick(
     try:
         result = contacts_engine.search_company(
             company_name=company_name,
-            city=city
+            city=city,
+            employer_id=employer_id
         )
         
         return {
@@ -661,14 +797,17 @@ async def search_batch_contacts(companies: List[Dict]):
     """
     📦 ПАКЕТНЫЙ ПОИСК КОНТАКТОВ
     
-    Принимает массив компаний, возвращает контакты для каждой
+    Принимает массив компаний, возвращает контакты для каждой.
+    Если у компаний есть priority_score, остаток квоты 2GIS достается
+    самым приоритетным, остальные ищутся только в бесплатных источниках.
     
     Пример запроса:
     [
-        {"company_name": "Яндекс", "city": "Москва"},
+        {"company_name": "Яндекс", "city": "Москва", "employer_id": "1740", "priority_score": 7.5},
         {"company_name": "Сбер", "city": "Москва"}
     ]
     """
+    queued = 0
     try:
         if not companies:
             return {
@@ -676,12 +815,28 @@ async def search_batch_contacts(companies: List[Dict]):
                 "message": "Пустой список компаний"
             }
         
+        # Распределяем квоту 2GIS по приоритету (кеш квоту не тратит)
+        planner = QuotaPlanner(quota_ledger)
+        paid, _ = planner.plan(
+            companies,
+            cost=lambda c: 0 if contacts_engine.is_cached(
+                c.get('company_name', ''), c.get('city'), c.get('employer_id')
+            ) else 1
+        )
+        paid_ids = {id(c) for c in paid}
+        
         results = []
+        # Пакеты могут идти параллельно: каждый добавляет и снимает только свои задачи
+        metrics.QUEUE_DEPTH.inc(len(companies), queue='contacts_batch')
+        queued = len(companies)
         
         for company in companies:
+            metrics.QUEUE_DEPTH.dec(queue='contacts_batch')
+            queued -= 1
             company_name = company.get('company_name')
-            city = company.get('city', 'Москва')
+            city = company.get('city')
             vacancy_link = company.get('vacancy_link')
+            employer_id = company.get('employer_id')
             
             if not company_name:
                 continue
@@ -689,7 +844,9 @@ async def search_batch_contacts(companies: List[Dict]):
             result = contacts_engine.search_company(
                 company_name=company_name,
                 city=city,
-                vacancy_link=vacancy_link
+                vacancy_link=vacancy_link,
+                employer_id=employer_id,
+                allow_paid=id(company) in paid_ids
             )
             
             results.append(result)
@@ -702,6 +859,11 @@ async def search_batch_contacts(companies: List[Dict]):
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    finally:
+        # Оставшиеся задачи пакета, если он прервался ошибкой
+        if queued:
+            metrics.QUEUE_DEPTH.dec(queued, queue='contacts_batch')
 
 
 @app.get("/api/contacts/stats")
@@ -721,6 +883,21 @@ async def get_contacts_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/contacts/quota")
+async def get_contacts_quota():
+    """
+    📒 Расход и остаток квоты платных API (2GIS) по дням и месяцам
+    """
+    try:
+        return {
+            "success": True,
+            "quota": quota_ledger.get_stats()
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/contacts/clear-cache")
 async def clear_contacts_cache():
     """
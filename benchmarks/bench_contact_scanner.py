@@ -0,0 +1,178 @@
+"""
+БЕНЧМАРК ИЗВЛЕЧЕНИЯ КОНТАКТОВ ИЗ HTML
+Сравнивает однопроходный сканер WebsiteParser с прежним вариантом
+(11 отдельных re.findall по одному HTML)
+
+Использование:
+    python benchmarks/bench_contact_scanner.py                      # страницы из benchmarks/pages
+    python benchmarks/bench_contact_scanner.py --save https://site.ru   # сохранить страницу
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from website_parser import WebsiteParser
+
+
+PAGES_DIR = Path(__file__).resolve().parent / "pages"
+
+# Цель однопроходного сканера - на порядок быстрее прежнего варианта
+TARGET_SPEEDUP = 10
+
+# Прежние паттерны (до однопроходного сканера)
+LEGACY_TELEGRAM = [
+    r't\.me/([a-zA-Z0-9_]+)',
+    r'telegram\.me/([a-zA-Z0-9_]+)',
+    r'@([a-zA-Z0-9_]{5,32})',
+    r'tg://resolve\?domain=([a-zA-Z0-9_]+)',
+]
+LEGACY_WHATSAPP = [
+    r'wa\.me/(\+?[0-9]{10,15})',
+    r'api\.whatsapp\.com/send\?phone=(\+?[0-9]{10,15})',
+    r'whatsapp://send\?phone=(\+?[0-9]{10,15})',
+    r'chat\.whatsapp\.com/([a-zA-Z0-9]+)',
+]
+LEGACY_PHONES = [
+    r'\+7[\s-]?\(?[0-9]{3}\)?[\s-]?[0-9]{3}[\s-]?[0-9]{2}[\s-]?[0-9]{2}',
+    r'8[\s-]?\(?[0-9]{3}\)?[\s-]?[0-9]{3}[\s-]?[0-9]{2}[\s-]?[0-9]{2}',
+]
+LEGACY_EMAIL = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+
+
+def legacy_extract(parser: WebsiteParser, html: str) -> Dict[str, List[str]]:
+    """Прежний многопроходный поиск (для сравнения)"""
+    telegram, whatsapp, phones, emails = [], [], [], []
+
+    for pattern in LEGACY_TELEGRAM:
+        for match in re.findall(pattern, html, re.IGNORECASE):
+            if parser._is_valid_telegram(match) and f"@{match}" not in telegram:
+                telegram.append(f"@{match}")
+
+    for pattern in LEGACY_WHATSAPP:
+        for match in re.findall(pattern, html, re.IGNORECASE):
+            cleaned = match.strip()
+            if parser._is_valid_phone(cleaned):
+                formatted = parser._format_phone(cleaned)
+                if formatted and formatted not in whatsapp:
+                    whatsapp.append(formatted)
+            elif r'chat\.whatsapp\.com' in pattern:
+                # Групповой чат (в прежнем коде проверка шла по неэкранированной
+                # строке и не срабатывала - здесь ссылки выдаются, как у сканера)
+                invite_link = f"https://chat.whatsapp.com/{cleaned}"
+                if invite_link not in whatsapp:
+                    whatsapp.append(invite_link)
+
+    for pattern in LEGACY_PHONES:
+        for match in re.findall(pattern, html):
+            if parser._is_valid_phone(match):
+                formatted = parser._format_phone(match)
+                if formatted and formatted not in phones:
+                    phones.append(formatted)
+
+    for email in re.findall(LEGACY_EMAIL, html):
+        email = email.lower()
+        if parser._is_valid_email(email) and email not in emails:
+            emails.append(email)
+
+    return {
+        'telegram': telegram[:5],
+        'whatsapp': whatsapp[:3],
+        'phones': phones[:5],
+        'emails': emails[:5]
+    }
+
+
+def synthetic_page(size_kb: int = 2000) -> str:
+    """Большая страница без контактов в начале и с контактами в подвале"""
+    filler = (
+        '<div class="product-card" data-id="48812"><a href="/catalog/item-8812?utm_source=main">'
+        'Товар 8812</a><span class="price">1 890 ₽</span>'
+        '<p>Доставка по всей России, гарантия качества 2024.</p>'
+        '<img src="https://cdn.example.ru/img/88/12.webp" alt="item"></div>\n'
+    )
+    body = filler * (size_kb * 1024 // len(filler.encode('utf-8')))
+    footer = (
+        '<footer>+7 (495) 123-45-67, 8 800 555-35-35, hr@romashka.ru, '
+        '<a href="https://t.me/romashka_hr">TG</a> '
+        '<a href="https://wa.me/79991234567">WA</a></footer>'
+    )
+    return f'<html><body>{body}{footer}</body></html>'
+
+
+def load_pages() -> Dict[str, str]:
+    """Сохраненные страницы или синтетическая, если их нет"""
+    pages = {
+        path.name: path.read_text(encoding='utf-8', errors='replace')
+        for path in sorted(PAGES_DIR.glob('*.html'))
+    }
+    if not pages:
+        print("⚠️ Нет сохраненных страниц в benchmarks/pages, используем синтетическую (2 МБ)")
+        pages['synthetic_2mb.html'] = synthetic_page()
+    return pages
+
+
+def save_pages(urls: List[str]):
+    """Скачать и сохранить страницы для бенчмарка"""
+    PAGES_DIR.mkdir(exist_ok=True)
+    parser = WebsiteParser(max_bytes=10_000_000)
+
+    for url in urls:
+        try:
+            page = parser._fetch(url if url.startswith('http') else f'https://{url}')
+        except Exception as e:
+            print(f"✗ {url}: {e}")
+            continue
+        if page['html'] is None:
+            print(f"✗ {url}: {page['error']}")
+            continue
+        name = re.sub(r'[^a-zA-Z0-9.-]+', '_', url.split('://')[-1]).strip('_') + '.html'
+        (PAGES_DIR / name).write_text(page['html'], encoding='utf-8')
+        print(f"✓ {url} → {PAGES_DIR / name}")
+
+
+def bench(func, html: str, repeat: int) -> float:
+    """Среднее время одного вызова в миллисекундах"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(html)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Бенчмарк извлечения контактов")
+    arg_parser.add_argument('--save', nargs='+', metavar='URL', help="Сохранить страницы в benchmarks/pages")
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    if args.save:
+        save_pages(args.save)
+        return
+
+    parser = WebsiteParser()
+
+    print("=" * 70)
+    print("⏱️  ИЗВЛЕЧЕНИЕ КОНТАКТОВ: многопроходный vs однопроходный")
+    print("=" * 70)
+
+    for name, html in load_pages().items():
+        legacy_ms = bench(lambda h: legacy_extract(parser, h), html, args.repeat)
+        scanner_ms = bench(parser._extract_contacts, html, args.repeat)
+
+        speedup = legacy_ms / scanner_ms
+        status = "✅ достигнута" if speedup >= TARGET_SPEEDUP else "⚠️ не достигнута"
+
+        print(f"{name} ({len(html) / 1024:.0f} КБ)")
+        print(f"   Прежний:  {legacy_ms:8.1f} мс")
+        print(f"   Сканер:   {scanner_ms:8.1f} мс")
+        print(f"   Ускорение: x{speedup:.1f} (цель x{TARGET_SPEEDUP}: {status})")
+        print(f"   Найдено:  {parser._extract_contacts(html)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+БЕНЧМАРК ФИЛЬТРОВ ВАКАНСИЙ
+- UnwantedVacanciesFilter: скомпилированный матчер против прежнего цикла
+  по ключевым словам (новая регулярка на каждое слово)
+- filter_and_rank_vacancies: RuleEngine против прежних re.search по каждому
+  паттерну с повторным lower() описания
+Проверяет, что результаты совпадают
+
+Использование:
+    python benchmarks/bench_filters.py                          # 10k синтетических вакансий
+    python benchmarks/bench_filters.py --dir filtered_batches   # реальные батчи
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import filter_and_rank_vacancies as rank
+from filter_unwanted_vacancies import UnwantedVacanciesFilter
+
+
+def legacy_is_unwanted(tool: UnwantedVacanciesFilter, vacancy: Dict) -> Tuple[bool, str]:
+    """Прежняя реализация is_unwanted"""
+    title = vacancy.get('название', '').lower()
+    description = vacancy.get('описание', '').lower()
+
+    for exception in tool.exceptions:
+        if exception.lower() in title or exception.lower() in description:
+            return False, ""
+
+    for category, keywords in tool.unwanted_keywords.items():
+        for keyword in keywords:
+            if keyword in title:
+                return True, f"Категория: {category}, найдено в названии: '{keyword}'"
+
+            if len(keyword.split()) <= 3:
+                pattern = r'\b' + re.escape(keyword) + r'\b'
+                if re.search(pattern, description):
+                    return True, f"Категория: {category}, найдено в описании: '{keyword}'"
+
+    return False, ""
+
+
+def legacy_check_patterns(text: str, patterns: List[str]) -> bool:
+    """Прежний check_patterns"""
+    if not text:
+        return False
+    text_lower = text.lower()
+    for pattern in patterns:
+        if re.search(pattern, text_lower, re.IGNORECASE):
+            return True
+    return False
+
+
+def legacy_rank(vacancy: Dict) -> Tuple[bool, str, int]:
+    """Прежние should_exclude_vacancy + calculate_pre_score"""
+    название = vacancy.get('название', '')
+    описание = vacancy.get('описание', '')
+
+    if legacy_check_patterns(название, rank.SALES_EXCLUDE_PATTERNS['название']):
+        return True, f"Исключено по названию: '{название[:100]}...'", 0
+
+    desc_matches = sum(
+        1 for pattern in rank.SALES_EXCLUDE_PATTERNS['описание']
+        if re.search(pattern, описание.lower(), re.IGNORECASE)
+    )
+    if desc_matches >= 2:
+        return True, f"Исключено: {desc_matches} маркеров продаж в описании", 0
+
+    score = 5
+    if legacy_check_patterns(описание, rank.SALES_REDUCE_PATTERNS['описание']):
+        score -= 2
+    high = sum(
+        1 for pattern in rank.HIGH_POTENTIAL_PATTERNS['описание']
+        if re.search(pattern, описание.lower(), re.IGNORECASE)
+    )
+    if high >= 5:
+        score += 3
+    elif high >= 3:
+        score += 2
+    elif high >= 1:
+        score += 1
+    return False, "", max(0, min(10, score))
+
+
+def compiled_rank(vacancy: Dict) -> Tuple[bool, str, int]:
+    """Текущие функции на общих счетчиках analyze_vacancy"""
+    counts = rank.analyze_vacancy(vacancy)
+    excluded, reason = rank.should_exclude_vacancy(vacancy, counts)
+    if excluded:
+        return True, reason, 0
+    return False, "", rank.calculate_pre_score(vacancy, counts)
+
+
+TITLES = [
+    'Python разработчик', 'Бухгалтер', 'Менеджер по продажам', 'Агент по недвижимости',
+    'Кредитный брокер', 'Аналитик данных', 'Оператор колл-центра', 'Водитель',
+    'Sales manager', 'Юрист', 'Специалист отдела продаж B2B', 'Дизайнер интерфейсов',
+]
+WORDS = (
+    'компания ищет сотрудника в команду опыт работы от года график работы '
+    'официальное оформление белая зарплата обучение за счет компании офис '
+    'в центре города задачи ведение клиентов работа с документами отчетность '
+    'требования ответственность внимательность коммуникабельность условия'
+).split()
+PHRASES = [
+    'брокер', 'страховой брокер', 'риэлтор', 'торговый представитель',
+    'сделки с недвижимостью', 'входящие заявки', 'работа в crm', 'брокерские услуги',
+    'холодные звонки', 'активные продажи', 'привлечение клиентов', 'отдел продаж',
+    'ведение переговоров', 'битрикс24 и 1С', 'работа с базами данных', 'автоматизация отчетов',
+    'интеграция по api', 'рутинные задачи', 'формирование счетов и договоров',
+]
+
+
+def synthetic_vacancies(count: int, seed: int = 42) -> List[Dict]:
+    """Вакансии со случайными описаниями ~1500 символов"""
+    rnd = random.Random(seed)
+    vacancies = []
+    for i in range(count):
+        words = [rnd.choice(WORDS) for _ in range(180)]
+        for _ in range(rnd.randint(0, 2)):
+            words.insert(rnd.randrange(len(words)), rnd.choice(PHRASES))
+        vacancies.append({
+            'id': str(i),
+            'название': rnd.choice(TITLES),
+            'описание': ' '.join(words).capitalize()
+        })
+    return vacancies
+
+
+def load_vacancies(directory: str) -> List[Dict]:
+    """Вакансии из filtered_batch_*.json / batch_*.json"""
+    vacancies = []
+    for path in sorted(Path(directory).glob('*batch_*.json')):
+        with open(path, 'r', encoding='utf-8') as f:
+            vacancies.extend(json.load(f))
+    return vacancies
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Бенчмарк фильтров вакансий")
+    arg_parser.add_argument('--dir', help="Директория с батчами вакансий")
+    arg_parser.add_argument('--count', type=int, default=10_000, help="Синтетических вакансий")
+    args = arg_parser.parse_args()
+
+    vacancies = load_vacancies(args.dir) if args.dir else synthetic_vacancies(args.count)
+    tool = UnwantedVacanciesFilter()
+
+    start = time.perf_counter()
+    legacy = [legacy_is_unwanted(tool, v) for v in vacancies]
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = [tool.is_unwanted(v) for v in vacancies]
+    compiled_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for vacancy in vacancies:
+        tool.find_matches(vacancy)
+    matches_s = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(legacy, compiled) if a != b)
+
+    print("=" * 70)
+    print(f"⏱️  ФИЛЬТР НЕЖЕЛАТЕЛЬНЫХ ВАКАНСИЙ ({len(vacancies)} вакансий)")
+    print("=" * 70)
+    print(f"Прежний:        {legacy_s:6.2f} с")
+    print(f"Скомпилированный: {compiled_s:6.2f} с  (x{legacy_s / compiled_s:.1f})")
+    print(f"find_matches:   {matches_s:6.2f} с  (все совпадения)")
+    print(f"Отфильтровано:  {sum(1 for u, _ in compiled if u)}")
+    print(f"Расхождений:    {mismatches}")
+
+    start = time.perf_counter()
+    legacy = [legacy_rank(v) for v in vacancies]
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = [compiled_rank(v) for v in vacancies]
+    compiled_s = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(legacy, compiled) if a != b)
+
+    print()
+    print("=" * 70)
+    print(f"⏱️  ФИЛЬТР И ПРЕДОЦЕНКА ({len(vacancies)} вакансий)")
+    print("=" * 70)
+    print(f"Прежний:        {legacy_s:6.2f} с")
+    print(f"RuleEngine:     {compiled_s:6.2f} с  (x{legacy_s / compiled_s:.1f})")
+    print(f"Исключено:      {sum(1 for e, _, _ in compiled if e)}")
+    print(f"Расхождений:    {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+БЕНЧМАРК ФОРМАТОВ ВАКАНСИЙ В ЗАПРОСЕ GPT
+Сравнивает PROMPT_ENCODING (json / compact / table): токены системного
+промпта и вакансий на запрос, время кодирования. С --live отправляет
+запросы и меряет задержку и prompt_tokens из ответа API
+(OPENAI_BASE_URL можно направить на fake_openai_server.py).
+
+Использование:
+    python benchmarks/bench_prompt_encoding.py                          # синтетические вакансии
+    python benchmarks/bench_prompt_encoding.py --dir filtered_batches   # реальные батчи
+    python benchmarks/bench_prompt_encoding.py --dir filtered_batches --live 5
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import process_vacancies_with_gpt as gpt
+from prompt_encoding import ENCODINGS
+from token_budget import estimate_tokens, _encoding
+
+from bench_filters import load_vacancies, synthetic_vacancies
+
+
+COMPANIES = ['ООО Ромашка', 'АО Техпром', 'ИП Иванов', 'ООО Логистик Групп', 'ПАО Сбербанк']
+SALARIES = ['от 60 000 руб.', 'от 80 000 до 120 000 руб.', 'Не указана']
+EXPERIENCE = ['Нет опыта', 'От 1 года до 3 лет', 'От 3 до 6 лет']
+
+
+def realistic_vacancies(count: int, seed: int = 7) -> List[Dict]:
+    """Синтетические вакансии со всеми полями HHParser.get_vacancy_details"""
+    rnd = random.Random(seed)
+    vacancies = []
+    for vacancy in synthetic_vacancies(count, seed):
+        vacancy_id = str(100_000_000 + int(vacancy['id']))
+        vacancies.append({
+            'название': vacancy['название'],
+            'описание': vacancy['описание'],
+            'оплата': rnd.choice(SALARIES),
+            'компания': rnd.choice(COMPANIES),
+            'employer_id': str(rnd.randint(1000, 999_999)),
+            'ссылка': f"https://hh.ru/vacancy/{vacancy_id}",
+            'id': vacancy_id,
+            'опыт': rnd.choice(EXPERIENCE),
+            'тип_занятости': 'Полная занятость',
+            'дата_публикации': '2025-12-01T10:00:00+0300'
+        })
+    return vacancies
+
+
+def measure_offline(batches: List[List[Dict]], prompt: str) -> Dict[str, Dict]:
+    """Токены и время кодирования для каждого формата"""
+    report = {}
+    for encoding in ENCODINGS:
+        gpt.PROMPT_ENCODING = encoding
+
+        start = time.perf_counter()
+        payloads = [gpt.serialize_vacancies(gpt.prepare_batch_for_api(batch)) for batch in batches]
+        encode_s = time.perf_counter() - start
+
+        report[encoding] = {
+            'system_tokens': estimate_tokens(gpt.system_prompt(prompt)),
+            'vacancy_tokens': sum(estimate_tokens(p) for p in payloads) / len(payloads),
+            'chars': sum(len(p) for p in payloads) / len(payloads),
+            'encode_ms': encode_s * 1000 / len(payloads)
+        }
+    return report
+
+
+def measure_live(batches: List[List[Dict]], prompt: str, requests: int) -> Dict[str, Dict]:
+    """Задержка и prompt_tokens реальных запросов"""
+    from openai import OpenAI
+    client = OpenAI(api_key=gpt.OPENAI_API_KEY or "local", base_url=gpt.OPENAI_BASE_URL)
+
+    report = {}
+    for encoding in ENCODINGS:
+        gpt.PROMPT_ENCODING = encoding
+        latencies = []
+        prompt_tokens = []
+
+        for batch in batches[:requests]:
+            clean = gpt.prepare_batch_for_api(batch)
+            params = gpt.completion_params(gpt.build_messages(prompt, clean), gpt.output_tokens(len(clean)))
+
+            start = time.perf_counter()
+            response = client.chat.completions.create(**params)
+            latencies.append(time.perf_counter() - start)
+            if response.usage:
+                prompt_tokens.append(response.usage.prompt_tokens)
+
+        report[encoding] = {
+            'latency_p50_s': statistics.median(latencies),
+            'prompt_tokens': statistics.mean(prompt_tokens) if prompt_tokens else None
+        }
+    return report
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Бенчмарк форматов вакансий для GPT")
+    arg_parser.add_argument('--dir', help="Директория с батчами вакансий")
+    arg_parser.add_argument('--count', type=int, default=600, help="Синтетических вакансий")
+    arg_parser.add_argument('--batch-size', type=int, default=15, help="Вакансий в запросе")
+    arg_parser.add_argument('--live', type=int, default=0, help="Запросов к API на каждый формат")
+    args = arg_parser.parse_args()
+
+    vacancies = load_vacancies(args.dir) if args.dir else realistic_vacancies(args.count)
+    batches = [vacancies[i:i + args.batch_size] for i in range(0, len(vacancies), args.batch_size)]
+    prompt = gpt.load_prompt()
+
+    offline = measure_offline(batches, prompt)
+    baseline = offline['json']
+
+    print("=" * 70)
+    print(f"⏱️  ФОРМАТЫ ВАКАНСИЙ ({len(vacancies)} вакансий, {len(batches)} запросов по {args.batch_size})")
+    print(f"   Токены: {'tiktoken o200k' if _encoding else 'оценка по символам'}")
+    print("=" * 70)
+    print(f"{'Формат':<10}{'Промпт':>9}{'Вакансии':>11}{'Символов':>11}{'Экономия':>11}{'Кодир., мс':>12}")
+    for encoding, row in offline.items():
+        saving = 1 - (row['system_tokens'] + row['vacancy_tokens']) / (baseline['system_tokens'] + baseline['vacancy_tokens'])
+        print(f"{encoding:<10}{row['system_tokens']:>9.0f}{row['vacancy_tokens']:>11.0f}"
+              f"{row['chars']:>11.0f}{saving:>10.1%}{row['encode_ms']:>12.2f}")
+
+    if args.live:
+        live = measure_live(batches, prompt, args.live)
+        print()
+        print(f"{'Формат':<10}{'p50, с':>9}{'prompt_tokens':>15}")
+        for encoding, row in live.items():
+            tokens = f"{row['prompt_tokens']:.0f}" if row['prompt_tokens'] else '-'
+            print(f"{encoding:<10}{row['latency_p50_s']:>9.2f}{tokens:>15}")
+
+
+if __name__ == "__main__":
+    main()
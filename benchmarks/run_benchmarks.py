@@ -0,0 +1,364 @@
+"""
+СКВОЗНОЙ БЕНЧМАРК ПАРСЕРА, ДЕДУПЛИКАЦИИ, ФИЛЬТРОВ И ПОИСКА КОНТАКТОВ
+Синтетические корпуса (по умолчанию 1k и 10k вакансий, можно 100k) и
+локальная имитация HH.ru / 2GIS / сайтов (mock_upstreams.py) вместо сети.
+
+Меряет:
+- вакансий/с: HHParser.search_vacancies (с нуля и повторно через
+  локальное хранилище), поиск по хранилищу, HHParser._clean_html,
+  deduplicate_vacancies (по компаниям и с почти-дубликатами), фильтры
+  (UnwantedVacanciesFilter, предоценка filter_and_rank_vacancies)
+- компаний/с: ContactsSearchEngine.search_company (без кеша и из кеша)
+- p50/p95 задержки эндпоинтов API (FastAPI TestClient)
+- пиковый RSS процесса после каждого этапа
+
+Результат пишется в JSON; --compare сравнивает с прошлым прогоном и
+возвращает код 1, если что-то стало медленнее порога.
+
+Использование:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes 1000,10000,100000 --output baseline.json
+    python benchmarks/run_benchmarks.py --compare baseline.json --threshold 0.15
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_upstreams import start_mock_upstreams
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# HH.ru не отдает поиск глубже 2000 вакансий - имитация тоже
+SEARCH_LIMIT = 2000
+
+# Быстрые этапы повторяются, пока не наберется столько секунд (берется лучший прогон)
+MIN_STAGE_SECONDS = 0.5
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Пиковый RSS процесса, МБ (None, если недоступно)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux - килобайты, macOS - байты
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def timed(func: Callable, items: int, repeat: bool = True) -> Dict:
+    """
+    Время выполнения и пропускная способность
+
+    Этапы без побочных эффектов (repeat=True) повторяются до MIN_STAGE_SECONDS,
+    чтобы миллисекундные замеры не зависели от шума.
+    """
+    runs = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        while True:
+            start = time.perf_counter()
+            func()
+            runs.append(time.perf_counter() - start)
+            if not repeat or sum(runs) >= MIN_STAGE_SECONDS:
+                break
+    seconds = min(runs)
+    return {
+        'items': items,
+        'seconds': round(seconds, 4),
+        'per_sec': round(items / seconds, 1) if seconds else None,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def build_corpus(server, parser, count: int) -> List[Dict]:
+    """Вакансии в формате HHParser.get_vacancy_details и их исходный HTML"""
+    corpus = []
+    for index in range(count):
+        data = server.vacancy(100_000_000 + index)
+        employer = data['employer']
+        corpus.append({
+            'название': data['name'],
+            'описание': data['description'],
+            'оплата': parser._format_salary(data.get('salary')),
+            'компания': employer['name'],
+            'employer_id': employer['id'],
+            'ссылка': data['alternate_url'],
+            'id': data['id'],
+            'опыт': data['experience']['name'],
+            'тип_занятости': data['employment']['name'],
+            'дата_публикации': data['published_at']
+        })
+    return corpus
+
+
+def bench_size(server, count: int, max_companies: int) -> Dict:
+    """Все этапы на корпусе из count вакансий"""
+    import api
+    import filter_and_rank_vacancies as rank
+    from contacts_search_engine import ContactsSearchEngine
+    from filter_unwanted_vacancies import UnwantedVacanciesFilter
+    from hh_parser import HHParser
+    from vacancy_store import VacancyStore
+
+    # Работодателей в 5 раз меньше вакансий - дедупликации есть что удалять
+    server.vacancies = count
+    server.employers = max(1, count // 5)
+
+    parser = HHParser(delay=0, store=False)
+    corpus = build_corpus(server, parser, count)
+    html = [vacancy['описание'] for vacancy in corpus]
+    for vacancy in corpus:
+        vacancy['описание'] = parser._clean_html(vacancy['описание'])
+
+    results = {}
+
+    searched = min(count, SEARCH_LIMIT)
+    results['search_vacancies'] = timed(
+        lambda: parser.search_vacancies("бенчмарк", per_page=100, max_pages=-(-searched // 100)),
+        searched,
+        repeat=False
+    )
+
+    # Повторный поиск: детали берутся из хранилища, у HH.ru - только страницы выдачи
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = VacancyStore(os.path.join(store_dir, "vacancies.sqlite"))
+        store.save_many((vacancy, server.vacancy(int(vacancy['id']))) for vacancy in corpus)
+        stored_parser = HHParser(delay=0, store=store)
+        results['search_vacancies_delta'] = timed(
+            lambda: stored_parser.search_vacancies("бенчмарк", per_page=100, max_pages=-(-searched // 100)),
+            searched
+        )
+        results['store_search'] = timed(
+            lambda: store.search("оператор", area=1, period=3650, excluded_text="агент", limit=count),
+            count
+        )
+        store.close()
+
+    results['clean_html'] = timed(lambda: [parser._clean_html(text) for text in html], count)
+
+    # deduplicate_vacancies помечает лучшие вакансии - каждому прогону своя копия
+    results['deduplicate'] = timed(lambda: api.deduplicate_vacancies([dict(v) for v in corpus]), count)
+    results['deduplicate_near'] = timed(
+        lambda: api.deduplicate_vacancies([dict(v) for v in corpus], near_duplicate_threshold=0.8), count
+    )
+
+    unwanted = UnwantedVacanciesFilter()
+    results['filter_unwanted'] = timed(lambda: [unwanted.is_unwanted(v) for v in corpus], count)
+
+    def pre_rank():
+        for vacancy in corpus:
+            counts = rank.analyze_vacancy(vacancy)
+            if not rank.should_exclude_vacancy(vacancy, counts)[0]:
+                rank.calculate_pre_score(vacancy, counts)
+
+    results['filter_rank'] = timed(pre_rank, count)
+
+    companies = {v['employer_id']: v for v in corpus}
+    companies = list(companies.values())[:max_companies]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        engine = ContactsSearchEngine(
+            api_key_2gis="bench",
+            cache_file=os.path.join(cache_dir, "contacts.json"),
+            employers_cache_file=os.path.join(cache_dir, "employers.json"),
+            website_cache_file=os.path.join(cache_dir, "website.json")
+        )
+        engine.request_delay = 0
+
+        def search_companies():
+            for vacancy in companies:
+                engine.search_company(
+                    vacancy['компания'],
+                    vacancy_link=vacancy['ссылка'],
+                    employer_id=vacancy['employer_id']
+                )
+
+        results['search_company'] = timed(search_companies, len(companies), repeat=False)
+        results['search_company_cached'] = timed(search_companies, len(companies))
+
+    return results
+
+
+def bench_parser(*args, **kwargs):
+    """HHParser без паузы между запросами (паузы нужны только настоящему HH.ru)"""
+    from hh_parser import HHParser
+    return HHParser(*args, **{**kwargs, 'delay': 0})
+
+
+def bench_api(server, requests_count: int) -> Dict:
+    """p50/p95 задержки эндпоинтов через TestClient"""
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError:
+        print("⚠️ fastapi.testclient недоступен (нужен httpx) - эндпоинты пропущены")
+        return {}
+
+    import api
+    api.HHParser = bench_parser
+
+    server.vacancies = 200
+    server.employers = 40
+    client = TestClient(api.app)
+
+    calls = {
+        'GET /health': lambda i: client.get("/health"),
+        'POST /api/search': lambda i: client.post("/api/search", json={
+            'keywords': "бенчмарк", 'max_results': 100, 'limit': 20
+        }),
+        'POST /api/contacts/search-quick': lambda i: client.post(
+            "/api/contacts/search-quick",
+            params={'company_name': server.employer(1000 + i % server.employers)['name']}
+        ),
+    }
+
+    results = {}
+    for name, call in calls.items():
+        latencies = []
+        errors = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(requests_count):
+                start = time.perf_counter()
+                response = call(i)
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += response.status_code >= 400
+        latencies.sort()
+        results[name] = {
+            'requests': requests_count,
+            'errors': errors,
+            'p50_ms': round(statistics.median(latencies), 2),
+            'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+        }
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def flatten(report: Dict) -> Dict[str, float]:
+    """Метрики для сравнения: 'размер/этап/per_sec' и 'api/эндпоинт/p95_ms'"""
+    metrics = {}
+    for size, stages in report.get('sizes', {}).items():
+        for stage, row in stages.items():
+            if row.get('per_sec'):
+                metrics[f"{size}/{stage}/per_sec"] = row['per_sec']
+    for endpoint, row in report.get('api', {}).items():
+        if isinstance(row, dict):
+            for key in ('p50_ms', 'p95_ms'):
+                metrics[f"api/{endpoint}/{key}"] = row[key]
+    if report.get('peak_rss_mb'):
+        metrics['peak_rss_mb'] = report['peak_rss_mb']
+    return metrics
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Вывести изменения относительно baseline; вернуть список регрессий"""
+    now = flatten(current)
+    before = flatten(baseline)
+    regressions = []
+
+    print()
+    print("=" * 70)
+    print(f"📊 СРАВНЕНИЕ С {baseline.get('timestamp', 'baseline')} (порог {threshold:.0%})")
+    print("=" * 70)
+    for key in sorted(now.keys() & before.keys()):
+        old, new = before[key], now[key]
+        if not old:
+            continue
+        change = new / old - 1
+        # Для пропускной способности хуже - меньше, для задержки и памяти - больше
+        worse = -change if key.endswith('per_sec') else change
+        mark = '❌' if worse > threshold else '✅' if worse < -threshold else '  '
+        if worse > threshold:
+            regressions.append(key)
+        print(f"{mark} {key:<52}{old:>10.1f} → {new:>10.1f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Сквозной бенчмарк на синтетических данных")
+    arg_parser.add_argument('--sizes', default="1000,10000", help="Размеры корпусов через запятую")
+    arg_parser.add_argument('--max-companies', type=int, default=200, help="Компаний для search_company")
+    arg_parser.add_argument('--api-requests', type=int, default=30, help="Запросов к каждому эндпоинту")
+    arg_parser.add_argument('--latency', type=float, default=0.0, help="Задержка имитации upstream, секунд")
+    arg_parser.add_argument('--output', help="Файл результатов (по умолчанию benchmarks/results/bench_<время>.json)")
+    arg_parser.add_argument('--compare', help="JSON прошлого прогона для сравнения")
+    arg_parser.add_argument('--threshold', type=float, default=0.10, help="Допустимое ухудшение (доля)")
+    args = arg_parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+
+    server, base_url = start_mock_upstreams(latency=args.latency)
+    os.environ['HH_API_URL'] = base_url
+    os.environ['DGIS_API_URL'] = base_url
+    os.environ.pop('HTTP_FIXTURES', None)
+
+    # Кеши и журнал квоты API создаются в текущей директории - уводим их во временную
+    work_dir = tempfile.mkdtemp(prefix="hh_bench_")
+    output = Path(args.output).resolve() if args.output else None
+    baseline_file = Path(args.compare).resolve() if args.compare else None
+    os.chdir(work_dir)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'upstream_latency_s': args.latency,
+        'sizes': {},
+        'api': {}
+    }
+
+    for count in sizes:
+        print("=" * 70)
+        print(f"⏱️  КОРПУС {count} ВАКАНСИЙ")
+        print("=" * 70)
+        stages = bench_size(server, count, args.max_companies)
+        report['sizes'][str(count)] = stages
+        for stage, row in stages.items():
+            print(f"{stage:<24}{row['items']:>8}{row['seconds']:>10.2f} с{row['per_sec'] or 0:>12.0f} /с")
+
+    if args.api_requests:
+        report['api'] = bench_api(server, args.api_requests)
+        print()
+        print("=" * 70)
+        print(f"🌐 ЭНДПОИНТЫ API ({args.api_requests} запросов)")
+        print("=" * 70)
+        for endpoint, row in report['api'].items():
+            if isinstance(row, dict):
+                print(f"{endpoint:<36}p50 {row['p50_ms']:>8.1f} мс   p95 {row['p95_ms']:>8.1f} мс   ошибок {row['errors']}")
+
+    report['peak_rss_mb'] = peak_rss_mb()
+    report['upstream_requests'] = server.stats['requests']
+    print(f"\n💾 Пиковый RSS: {report['peak_rss_mb']} МБ, запросов к имитации: {report['upstream_requests']}")
+
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📄 Результаты: {output}")
+
+    if baseline_file:
+        with open(baseline_file, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ Регрессий: {len(regressions)}")
+            sys.exit(1)
+        print("\n✅ Регрессий нет")
+
+
+if __name__ == "__main__":
+    main()
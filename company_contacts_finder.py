@@ -10,6 +10,7 @@ import requests
 from typing import Dict, List, Optional
 from pathlib import Path
 from datetime import datetime
+from corpus_io import read_vacancies
 
 
 class CompanyContactsFinder:
@@ -197,8 +198,7 @@ class CompanyContactsFinder:
         print(f"📖 Загрузка вакансий из {json_file}...")
         
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                vacancies = json.load(f)
+            vacancies = read_vacancies(json_file)
         except Exception as e:
             print(f"❌ Ошибка чтения файла: {e}")
             return []
@@ -0,0 +1,173 @@
+"""
+НЕЧЕТКОЕ СОПОСТАВЛЕНИЕ НАЗВАНИЙ КОМПАНИЙ
+"Ромашка Групп", "ГК Ромашка" и ООО «Ромашка» - одна компания.
+
+Названия нормализуются (ОПФ, "группа компаний", "холдинг", кавычки),
+затем сравниваются только внутри блоков с общим словом (blocking)
+по сходству символьных триграмм. Похожие пары объединяются через
+union-find. Десятки тысяч названий - секунды, без сравнения всех пар.
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+
+# Организационно-правовые формы
+LEGAL_FORMS = {
+    'ооо', 'оао', 'зао', 'пао', 'ао', 'ип', 'нко', 'ано', 'фгуп', 'гуп', 'муп',
+    'чоп', 'тоо', 'llc', 'ltd', 'inc', 'gmbh', 'corp',
+}
+
+# Слова, обозначающие группу/холдинг: не отличают одну компанию от другой
+GROUP_WORDS = {
+    'гк', 'группа', 'компаний', 'групп', 'груп', 'холдинг', 'group', 'holding',
+    'индивидуальный', 'предприниматель', 'общество', 'ограниченной', 'ответственностью',
+}
+
+TOKEN_PATTERN = re.compile(r'[a-zа-я0-9]+')
+
+DEFAULT_THRESHOLD = 0.75
+
+
+def company_tokens(name: str) -> List[str]:
+    """Значимые слова названия (нижний регистр, ё -> е, без ОПФ и "группа компаний")"""
+    if not name:
+        return []
+    tokens = TOKEN_PATTERN.findall(name.lower().replace('ё', 'е'))
+    return [t for t in tokens if t not in LEGAL_FORMS and t not in GROUP_WORDS]
+
+
+def company_key(name: str) -> str:
+    """
+    Нормализованное название для точного сравнения
+
+    Если после удаления служебных слов ничего не осталось
+    ("Группа компаний"), возвращаются все слова.
+    """
+    tokens = company_tokens(name)
+    if not tokens and name:
+        tokens = TOKEN_PATTERN.findall(name.lower().replace('ё', 'е'))
+    return ' '.join(tokens)
+
+
+def trigrams(key: str) -> frozenset:
+    """Символьные триграммы ключа (с границами слов)"""
+    padded = f" {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class CompanyResolver:
+    """Кластеры названий, обозначающих одну компанию"""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, max_block_size: int = 300):
+        """
+        Args:
+            threshold: Порог сходства триграмм (Жаккар) для объединения
+            max_block_size: Блоки больше этого (слишком частые слова вроде
+                            "сервис") не сравниваются попарно
+        """
+        self.threshold = threshold
+        self.max_block_size = max_block_size
+
+    def cluster(self, names: Iterable[str]) -> Dict[str, str]:
+        """
+        Сопоставить названия
+
+        Args:
+            names: Названия компаний (повторы допустимы)
+
+        Returns:
+            {название: ключ кластера}; у одной компании ключ один -
+            нормализованное название первого встреченного варианта
+        """
+        keys = {}
+        for name in names:
+            if name and name not in keys:
+                keys[name] = company_key(name)
+
+        unique_keys = list(dict.fromkeys(k for k in keys.values() if k))
+        root_of = self._cluster_keys(unique_keys)
+
+        return {name: root_of.get(key, key) for name, key in keys.items()}
+
+    def clusters(self, names: Iterable[str]) -> List[List[str]]:
+        """Группы названий одной компании (только группы из 2+ вариантов)"""
+        groups = defaultdict(list)
+        for name, key in self.cluster(names).items():
+            groups[key].append(name)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def _cluster_keys(self, unique_keys: List[str]) -> Dict[str, str]:
+        """Union-find по нормализованным ключам внутри блоков"""
+        parent = list(range(len(unique_keys)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(a: int, b: int):
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                # Корень - вариант, встреченный раньше
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        # Блоки: общее слово из 3+ символов или общие первые 4 символа слова
+        blocks = defaultdict(list)
+        for i, key in enumerate(unique_keys):
+            for block in self._blocking_keys(key):
+                blocks[block].append(i)
+
+        grams = [None] * len(unique_keys)
+
+        for members in blocks.values():
+            if len(members) < 2 or len(members) > self.max_block_size:
+                continue
+
+            for x in range(len(members)):
+                a = members[x]
+                for y in range(x + 1, len(members)):
+                    b = members[y]
+                    if find(a) == find(b):
+                        continue
+                    if self._similar(a, b, unique_keys, grams):
+                        union(a, b)
+
+        return {key: unique_keys[find(i)] for i, key in enumerate(unique_keys)}
+
+    @staticmethod
+    def _blocking_keys(key: str) -> List[str]:
+        """Ключи блоков названия"""
+        blocks = set()
+        for token in key.split():
+            if len(token) >= 3:
+                blocks.add(f"w:{token}")
+                blocks.add(f"p:{token[:4]}")
+        # Короткие названия ("ВТБ", "X5") блокируются целиком
+        if not blocks:
+            blocks.add(f"k:{key}")
+        return list(blocks)
+
+    def _similar(self, a: int, b: int, keys: List[str], grams: List) -> bool:
+        """Сходство триграмм не ниже порога (триграммы считаются лениво)"""
+        if grams[a] is None:
+            grams[a] = trigrams(keys[a])
+        if grams[b] is None:
+            grams[b] = trigrams(keys[b])
+
+        grams_a, grams_b = grams[a], grams[b]
+        smaller, larger = sorted((len(grams_a), len(grams_b)))
+
+        # Жаккар не больше отношения размеров - не считаем пересечение зря
+        if smaller < self.threshold * larger:
+            return False
+
+        common = len(grams_a & grams_b)
+        return common / (len(grams_a) + len(grams_b) - common) >= self.threshold
+
+
+def resolve_companies(names: Iterable[str], threshold: float = DEFAULT_THRESHOLD) -> Dict[str, str]:
+    """Короткий вызов: {название: ключ кластера}"""
+    return CompanyResolver(threshold).cluster(names)
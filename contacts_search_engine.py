@@ -5,12 +5,20 @@
 """
 
 import json
+import os
+import re
 import time
 import requests
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
 from website_parser import WebsiteParser
+from website_cache import WebsiteCache
+from quota_ledger import QuotaLedger
+from org_index import OrgIndex
+from http_recorder import install_from_env
+from metrics import track_upstream, cache_lookup
+from tracing import traced
 
 
 class ContactsSearchEngine:
@@ -23,9 +31,13 @@ class ContactsSearchEngine:
         self,
         api_key_2gis: Optional[str] = None,
         cache_file: str = "contacts_search_cache.json",
+        employers_cache_file: str = "hh_employers_cache.json",
+        website_cache_file: str = "website_cache.json",
         enable_2gis: bool = True,
         enable_hh: bool = True,
-        enable_website_parsing: bool = True
+        enable_website_parsing: bool = True,
+        quota_ledger: Optional[QuotaLedger] = None,
+        org_index: Optional[OrgIndex] = None
     ):
         """
         Инициализация движка поиска
@@ -33,40 +45,71 @@ class ContactsSearchEngine:
         Args:
             api_key_2gis: API ключ 2GIS (опционально)
             cache_file: Файл для кеширования
+            employers_cache_file: Файл кеша работодателей HH.ru (по employer.id)
+            website_cache_file: Файл кеша страниц сайтов (ETag/Last-Modified/хеш)
             enable_2gis: Использовать 2GIS API
             enable_hh: Использовать HH.ru API
             enable_website_parsing: Парсить сайты компаний
+            quota_ledger: Журнал квоты 2GIS (общий для всех запусков)
+            org_index: Локальный индекс организаций 2GIS
         """
         self.api_key_2gis = api_key_2gis
         self.cache_file = cache_file
         self.cache = self._load_cache()
         
+        # Кеш работодателей HH.ru: employer_id -> контакты из /employers/{id}
+        # Одна запись обслуживает все вакансии компании
+        self.employers_cache_file = employers_cache_file
+        self.employers_cache = self._load_cache(employers_cache_file)
+        
         # Включение/выключение источников
         self.enable_2gis = enable_2gis and api_key_2gis
         self.enable_hh = enable_hh
         self.enable_website_parsing = enable_website_parsing
         
-        # Парсер сайтов
-        self.website_parser = WebsiteParser() if enable_website_parsing else None
+        # Квота 2GIS хранится между запусками
+        self.quota = quota_ledger or QuotaLedger()
+        
+        # Все организации из ответов 2GIS (филиалы, дочерние компании)
+        self.org_index = org_index or OrgIndex()
+        
+        # Парсер сайтов; неизменившиеся страницы не разбираются повторно
+        self.website_parser = (
+            WebsiteParser(cache=WebsiteCache(website_cache_file))
+            if enable_website_parsing else None
+        )
         
         # Статистика
         self.stats = {
             'cache_hits': 0,
             'cache_misses': 0,
             '2gis_calls': 0,
+            '2gis_skipped_quota': 0,
+            '2gis_index_hits': 0,
             'hh_calls': 0,
+            'hh_employer_cache_hits': 0,
             'website_parses': 0
         }
         
         # Настройки
         self.request_delay = 0.5
-        self.base_url_2gis = "https://catalog.api.2gis.com/3.0/items"
+        self.base_url_2gis = os.getenv("DGIS_API_URL", "https://catalog.api.2gis.com") + "/3.0/items"
+        self.page_size_2gis = 10  # Сколько организаций забирать из одного ответа
+        self.base_url_hh = os.getenv("HH_API_URL", "https://api.hh.ru")
+        
+        # Общая сессия для HH.ru и 2GIS (переиспользуем соединения)
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        })
+        install_from_env(self.session)
     
-    def _load_cache(self) -> Dict:
+    def _load_cache(self, cache_file: Optional[str] = None) -> Dict:
         """Загрузить кеш из файла"""
+        cache_file = cache_file or self.cache_file
         try:
-            if Path(self.cache_file).exists():
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
+            if Path(cache_file).exists():
+                with open(cache_file, 'r', encoding='utf-8') as f:
                     return json.load(f)
         except Exception as e:
             print(f"⚠️ Ошибка загрузки кеша: {e}")
@@ -80,33 +123,56 @@ class ContactsSearchEngine:
         except Exception as e:
             print(f"⚠️ Ошибка сохранения кеша: {e}")
     
+    def _save_employers_cache(self):
+        """Сохранить кеш работодателей в файл"""
+        try:
+            with open(self.employers_cache_file, 'w', encoding='utf-8') as f:
+                json.dump(self.employers_cache, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"⚠️ Ошибка сохранения кеша работодателей: {e}")
+    
+    @traced('contacts.search_company')
     def search_company(
         self,
         company_name: str,
-        city: str = "Москва",
-        vacancy_link: Optional[str] = None
+        city: Optional[str] = None,
+        vacancy_link: Optional[str] = None,
+        employer_id: Optional[str] = None,
+        allow_paid: bool = True
     ) -> Dict:
         """
         ГЛАВНЫЙ МЕТОД: Поиск контактов компании
         
         Args:
             company_name: Название компании
-            city: Город поиска
+            city: Город поиска (по умолчанию - регион работодателя или Москва)
             vacancy_link: Ссылка на вакансию HH.ru (опционально)
+            employer_id: ID работодателя HH.ru (employer.id из выдачи, опционально)
+            allow_paid: Разрешить платные источники (2GIS); False - только бесплатные
             
         Returns:
             Словарь с контактами компании
         """
-        # Шаг 1: Проверяем кеш
-        cache_key = f"{company_name.lower().strip()}_{city.lower()}"
-        
-        if cache_key in self.cache:
-            self.stats['cache_hits'] += 1
-            cached_result = self.cache[cache_key]
-            cached_result['from_cache'] = True
-            return cached_result
+        # Шаг 1: Проверяем кеш (сначала по employer_id - одна запись на компанию)
+        for cache_key in self._cache_keys(company_name, city, employer_id):
+            if cache_key in self.cache:
+                self.stats['cache_hits'] += 1
+                cache_lookup('contacts', hit=True)
+                cached_result = self.cache[cache_key]
+                cached_result['from_cache'] = True
+                return cached_result
         
         self.stats['cache_misses'] += 1
+        cache_lookup('contacts', hit=False)
+        
+        # Данные HH.ru получаем заранее: регион работодателя нужен для 2GIS,
+        # а сайт - для парсинга
+        hh_result = None
+        if self.enable_hh:
+            hh_result = self._search_hh(company_name, vacancy_link, employer_id)
+        
+        if not city:
+            city = (hh_result or {}).get('additional_info', {}).get('area') or "Москва"
         
         # Инициализируем результат
         result = {
@@ -125,6 +191,8 @@ class ContactsSearchEngine:
             'additional_info': {
                 'full_name': '',
                 'hh_company_url': '',
+                'hh_employer_id': employer_id or '',
+                'area': '',
                 'vacancies_count': 0
             },
             'search_date': datetime.now().isoformat(),
@@ -132,17 +200,15 @@ class ContactsSearchEngine:
             'api_calls_used': 0
         }
         
-        # Шаг 2: Ищем в 2GIS
+        # Шаг 2: Ищем в 2GIS (индекс бесплатно, запрос - если осталась квота)
         if self.enable_2gis:
-            gis_result = self._search_2gis(company_name, city)
+            gis_result = self._search_2gis(company_name, city, allow_paid)
             if gis_result:
                 result = self._merge_results(result, gis_result, '2gis')
         
-        # Шаг 3: Ищем на HH.ru
-        if self.enable_hh:
-            hh_result = self._search_hh(company_name, vacancy_link)
-            if hh_result:
-                result = self._merge_results(result, hh_result, 'hh.ru')
+        # Шаг 3: Добавляем данные HH.ru
+        if hh_result:
+            result = self._merge_results(result, hh_result, 'hh.ru')
         
         # Шаг 4: Парсим сайты компании
         if self.enable_website_parsing and result['contacts']['websites']:
@@ -161,28 +227,90 @@ class ContactsSearchEngine:
             result['contacts']['websites']
         ])
         
-        # Сохраняем в кеш
-        self.cache[cache_key] = result
+        # Сохраняем в кеш (по employer_id и по названию)
+        employer_id = employer_id or result['additional_info'].get('hh_employer_id')
+        if employer_id:
+            self.cache[f"employer_{employer_id}_{city.lower()}"] = result
+            self.cache[f"employer_{employer_id}_"] = result
+        self.cache[f"{company_name.lower().strip()}_{city.lower()}"] = result
         self._save_cache()
         
         return result
     
-    def _search_2gis(self, company_name: str, city: str) -> Optional[Dict]:
-        """Поиск в 2GIS"""
+    def is_cached(
+        self,
+        company_name: str,
+        city: Optional[str] = None,
+        employer_id: Optional[str] = None
+    ) -> bool:
+        """Есть ли результат в кеше (такой поиск не тратит квоту)"""
+        return any(
+            key in self.cache
+            for key in self._cache_keys(company_name, city, employer_id)
+        )
+    
+    def _cache_keys(
+        self,
+        company_name: str,
+        city: Optional[str],
+        employer_id: Optional[str]
+    ) -> List[str]:
+        """Ключи кеша для поиска: по employer_id и по названию"""
+        keys = []
+        if employer_id:
+            keys.append(f"employer_{employer_id}_{(city or '').lower()}")
+        if city or not employer_id:
+            keys.append(f"{company_name.lower().strip()}_{(city or 'Москва').lower()}")
+        return keys
+    
+    @traced('contacts.2gis')
+    def _search_2gis(
+        self,
+        company_name: str,
+        city: str,
+        allow_paid: bool = True
+    ) -> Optional[Dict]:
+        """
+        Поиск в 2GIS
+        
+        Сначала проверяется локальный индекс организаций. Платный запрос
+        делается только при промахе; все организации из ответа
+        сохраняются в индекс для следующих поисков.
+        """
+        region_id = self._get_region_id(city)
+        
+        item = self.org_index.lookup(company_name, region_id)
+        if item:
+            self.stats['2gis_index_hits'] += 1
+            cache_lookup('2gis_index', hit=True)
+            return self._extract_2gis_contacts(item, company_name)
+        cache_lookup('2gis_index', hit=False)
+        
+        if not allow_paid:
+            return None
+        
+        # Квота списывается до запроса: параллельные процессы не превысят лимит
+        if not self.quota.reserve('2gis'):
+            self.stats['2gis_skipped_quota'] += 1
+            return None
+        
         try:
             params = {
                 'q': company_name,
                 'key': self.api_key_2gis,
                 'locale': 'ru_RU',
-                'fields': 'items.contact_groups,items.address,items.org',
-                'region_id': self._get_region_id(city)
+                'fields': 'items.contact_groups,items.address,items.org,items.name_ex',
+                'region_id': region_id,
+                'page_size': self.page_size_2gis
             }
             
-            response = requests.get(
-                self.base_url_2gis,
-                params=params,
-                timeout=10
-            )
+            with track_upstream('2gis') as call:
+                response = self.session.get(
+                    self.base_url_2gis,
+                    params=params,
+                    timeout=10
+                )
+                call.status = response.status_code
             
             self.stats['2gis_calls'] += 1
             
@@ -190,7 +318,10 @@ class ContactsSearchEngine:
                 data = response.json()
                 
                 if data.get('result') and data['result'].get('items'):
-                    item = data['result']['items'][0]
+                    items = data['result']['items']
+                    self.org_index.add_items(items, region_id)
+                    
+                    item = self.org_index.lookup(company_name, region_id) or items[0]
                     return self._extract_2gis_contacts(item, company_name)
             
             time.sleep(self.request_delay)
@@ -200,37 +331,98 @@ class ContactsSearchEngine:
         
         return None
     
+    @traced('contacts.hh')
     def _search_hh(
         self,
         company_name: str,
-        vacancy_link: Optional[str] = None
+        vacancy_link: Optional[str] = None,
+        employer_id: Optional[str] = None
     ) -> Optional[Dict]:
-        """Поиск на HH.ru"""
+        """
+        Поиск на HH.ru
+        
+        Если известен employer_id, вакансия не запрашивается - данные берутся
+        из /employers/{id} (с кешем). Иначе вакансия запрашивается один раз,
+        чтобы достать из неё employer.id и контакты из описания.
+        """
+        result = None
+        
         try:
-            # Если есть ссылка на вакансию, используем её
-            if vacancy_link:
+            # Вакансию запрашиваем только если работодатель неизвестен
+            if vacancy_link and not employer_id:
                 vacancy_id = vacancy_link.split('/')[-1].split('?')[0]
                 
-                url = f"https://api.hh.ru/vacancies/{vacancy_id}"
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                
-                response = requests.get(url, headers=headers, timeout=10)
+                with track_upstream('hh_detail') as call:
+                    response = self.session.get(
+                        f"{self.base_url_hh}/vacancies/{vacancy_id}",
+                        timeout=10
+                    )
+                    call.status = response.status_code
                 
                 self.stats['hh_calls'] += 1
                 
                 if response.status_code == 200:
                     data = response.json()
-                    return self._extract_hh_contacts(data, company_name)
+                    result = self._extract_hh_contacts(data, company_name)
+                    employer_id = (data.get('employer') or {}).get('id')
                 
                 time.sleep(self.request_delay)
             
+            if employer_id:
+                employer_result = self._get_employer(employer_id)
+                if employer_result:
+                    result = self._merge_results(
+                        result or self._empty_source_result(),
+                        employer_result,
+                        'hh.ru'
+                    )
+            
         except Exception as e:
             print(f"⚠️ Ошибка HH.ru для {company_name}: {e}")
         
-        return None
+        if result:
+            result.pop('sources', None)
+        
+        return result
     
+    def _get_employer(self, employer_id: str) -> Optional[Dict]:
+        """
+        Получить контакты работодателя из /employers/{id}
+        
+        Результат кешируется по employer_id, поэтому все вакансии
+        одной компании обслуживаются одним запросом.
+        """
+        employer_id = str(employer_id)
+        
+        if employer_id in self.employers_cache:
+            self.stats['hh_employer_cache_hits'] += 1
+            cache_lookup('hh_employers', hit=True)
+            return self.employers_cache[employer_id]
+        
+        cache_lookup('hh_employers', hit=False)
+        with track_upstream('hh_employer') as call:
+            response = self.session.get(
+                f"{self.base_url_hh}/employers/{employer_id}",
+                timeout=10
+            )
+            call.status = response.status_code
+        
+        self.stats['hh_calls'] += 1
+        
+        if response.status_code != 200:
+            time.sleep(self.request_delay)
+            return None
+        
+        employer_result = self._extract_hh_employer_contacts(response.json())
+        
+        self.employers_cache[employer_id] = employer_result
+        self._save_employers_cache()
+        
+        time.sleep(self.request_delay)
+        
+        return employer_result
+    
+    @traced('contacts.website')
     def _parse_website(self, url: str) -> Optional[Dict]:
         """Парсинг сайта компании"""
         try:
@@ -300,11 +492,10 @@ class ContactsSearchEngine:
         
         return result
     
-    def _extract_hh_contacts(self, data: Dict, company_name: str) -> Dict:
-        """Извлечь контакты из HH.ru"""
-        import re
-        
-        result = {
+    def _empty_source_result(self) -> Dict:
+        """Пустой результат одного источника"""
+        return {
+            'sources': [],
             'contacts': {
                 'phones': [],
                 'emails': [],
@@ -313,36 +504,41 @@ class ContactsSearchEngine:
                 'websites': [],
                 'address': ''
             },
-            'additional_info': {
-                'hh_company_url': ''
-            }
+            'additional_info': {}
         }
+    
+    def _find_text_contacts(self, text: str) -> Tuple[List[str], List[str]]:
+        """Найти email и телефоны в тексте (описание вакансии/компании)"""
+        emails = re.findall(
+            r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+            text
+        )
+        phones = re.findall(
+            r'(?:\+7|8)[\s-]?\(?[0-9]{3}\)?[\s-]?[0-9]{3}[\s-]?[0-9]{2}[\s-]?[0-9]{2}',
+            text
+        )
+        return emails, phones
+    
+    def _extract_hh_contacts(self, data: Dict, company_name: str) -> Dict:
+        """Извлечь контакты из вакансии HH.ru"""
+        result = self._empty_source_result()
         
-        employer = data.get('employer', {})
+        employer = data.get('employer') or {}
         
         # URL компании на HH.ru
         if employer.get('alternate_url'):
             result['additional_info']['hh_company_url'] = employer['alternate_url']
         
+        if employer.get('id'):
+            result['additional_info']['hh_employer_id'] = str(employer['id'])
+        
         # Сайт компании
         if employer.get('site_url'):
             result['contacts']['websites'].append(employer['site_url'])
         
         # Описание вакансии
-        description = data.get('description', '')
-        
-        # Ищем email
-        emails = re.findall(
-            r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-            description
-        )
+        emails, phones = self._find_text_contacts(data.get('description', ''))
         result['contacts']['emails'].extend(emails)
-        
-        # Ищем телефоны
-        phones = re.findall(
-            r'(?:\+7|8)[\s-]?\(?[0-9]{3}\)?[\s-]?[0-9]{3}[\s-]?[0-9]{2}[\s-]?[0-9]{2}',
-            description
-        )
         result['contacts']['phones'].extend(phones)
         
         # Адрес
@@ -358,6 +554,28 @@ class ContactsSearchEngine:
         
         return result
     
+    def _extract_hh_employer_contacts(self, employer: Dict) -> Dict:
+        """Извлечь контакты из карточки работодателя HH.ru (/employers/{id})"""
+        result = self._empty_source_result()
+        del result['sources']
+        
+        result['additional_info'] = {
+            'full_name': employer.get('name', ''),
+            'hh_company_url': employer.get('alternate_url', ''),
+            'hh_employer_id': str(employer.get('id', '')),
+            'area': (employer.get('area') or {}).get('name', '')
+        }
+        
+        if employer.get('site_url'):
+            result['contacts']['websites'].append(employer['site_url'])
+        
+        # В описании компании иногда есть email и телефоны
+        emails, phones = self._find_text_contacts(employer.get('description') or '')
+        result['contacts']['emails'].extend(emails)
+        result['contacts']['phones'].extend(phones)
+        
+        return result
+    
     def _merge_results(
         self,
         main_result: Dict,
@@ -434,7 +652,17 @@ class ContactsSearchEngine:
                 'hh_ru': self.stats['hh_calls'],
                 'website_parses': self.stats['website_parses']
             },
-            'cache_size': len(self.cache)
+            '2gis_skipped_quota': self.stats['2gis_skipped_quota'],
+            '2gis_index_hits': self.stats['2gis_index_hits'],
+            'org_index': self.org_index.get_stats(),
+            'quota': self.quota.get_stats(),
+            'hh_employer_cache_hits': self.stats['hh_employer_cache_hits'],
+            'website_cache': (
+                self.website_parser.cache.get_stats()
+                if self.website_parser and self.website_parser.cache else None
+            ),
+            'cache_size': len(self.cache),
+            'employers_cache_size': len(self.employers_cache)
         }
     
     def clear_cache(self):
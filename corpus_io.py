@@ -0,0 +1,224 @@
+"""
+ФОРМАТЫ ФАЙЛОВ С ВАКАНСИЯМИ
+Кроме прежнего JSON (один список на файл) поддерживается JSONL - по
+вакансии на строку, можно сжатый (.jsonl.gz). JSONL читается и пишется
+потоково: скрипты обрабатывают корпус по одной вакансии, не загружая
+весь файл в память. Формат определяется по расширению.
+
+Для аналитики корпус выгружается в Parquet (если установлен pyarrow).
+
+Использование:
+    python corpus_io.py convert vacancies_all.json vacancies_all.jsonl.gz
+    python corpus_io.py parquet vacancies_all.jsonl.gz vacancies_all.parquet
+"""
+
+import argparse
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+# Длинные расширения проверяются первыми
+CORPUS_SUFFIXES = ('.jsonl.gz', '.jsonl', '.json')
+
+# Колонки Parquet - поля HHParser.get_vacancy_details; остальные поля - JSON в extra
+PARQUET_FIELDS = (
+    'id', 'название', 'компания', 'employer_id', 'оплата', 'опыт',
+    'тип_занятости', 'дата_публикации', 'ссылка', 'описание'
+)
+
+
+def corpus_suffix(path) -> str:
+    """Расширение формата ('.json', '.jsonl', '.jsonl.gz')"""
+    name = str(path).lower()
+    for suffix in CORPUS_SUFFIXES:
+        if name.endswith(suffix):
+            return suffix
+    raise ValueError(f"Неизвестный формат файла вакансий: {path} (нужен {', '.join(CORPUS_SUFFIXES)})")
+
+
+def corpus_stem(path) -> str:
+    """Имя файла без расширения формата (filtered_batch_0001.jsonl.gz -> filtered_batch_0001)"""
+    name = Path(path).name
+    return name[:-len(corpus_suffix(name))]
+
+
+def find_batches(directory, prefix: str = 'batch') -> List[Path]:
+    """Файлы батчей prefix_*.json / .jsonl / .jsonl.gz, отсортированные по имени"""
+    files = []
+    for path in Path(directory).glob(f'{prefix}_*'):
+        try:
+            corpus_suffix(path)
+        except ValueError:
+            continue
+        files.append(path)
+    return sorted(files)
+
+
+def _open_text(path, mode: str):
+    if str(path).lower().endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def iter_vacancies(path) -> Iterator[Dict]:
+    """
+    Вакансии из файла по одной
+
+    JSONL читается построчно; JSON-список целиком (формат этого не позволяет иначе).
+    """
+    if corpus_suffix(path) == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+        return
+
+    with _open_text(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_vacancies(path) -> List[Dict]:
+    """Все вакансии файла списком"""
+    return list(iter_vacancies(path))
+
+
+class CorpusWriter:
+    """
+    Потоковая запись вакансий в файл любого формата
+
+    Пишется во временный файл, который заменяет целевой при закрытии
+    (прерванный запуск не оставляет полузаписанный корпус).
+    JSON пишется в том же виде, что json.dump(..., indent=2).
+
+        with CorpusWriter('vacancies.jsonl.gz') as writer:
+            for vacancy in vacancies:
+                writer.write(vacancy)
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.suffix = corpus_suffix(self.path)
+        self.count = 0
+        self._tmp_file = f"{self.path}.tmp"
+        if self.suffix == '.jsonl.gz':
+            self._file = gzip.open(self._tmp_file, 'wt', encoding='utf-8')
+        else:
+            self._file = open(self._tmp_file, 'w', encoding='utf-8')
+        if self.suffix == '.json':
+            self._file.write('[')
+
+    def write(self, vacancy: Dict):
+        if self.suffix == '.json':
+            text = json.dumps(vacancy, ensure_ascii=False, indent=2)
+            self._file.write((',\n  ' if self.count else '\n  ') + text.replace('\n', '\n  '))
+        else:
+            self._file.write(json.dumps(vacancy, ensure_ascii=False) + '\n')
+        self.count += 1
+
+    def write_many(self, vacancies: Iterable[Dict]) -> int:
+        for vacancy in vacancies:
+            self.write(vacancy)
+        return self.count
+
+    def close(self):
+        if self._file is None:
+            return
+        if self.suffix == '.json':
+            self._file.write('\n]' if self.count else ']')
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp_file, self.path)
+
+    def abort(self):
+        """Закрыть без замены целевого файла"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self._tmp_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_vacancies(path, vacancies: Iterable[Dict]) -> int:
+    """Записать вакансии (формат по расширению); возвращает их число"""
+    with CorpusWriter(path) as writer:
+        return writer.write_many(vacancies)
+
+
+def export_parquet(source, parquet_file, row_group_size: int = 10_000) -> int:
+    """
+    Выгрузить корпус в Parquet потоково, группами по row_group_size строк
+
+    Колонки - PARQUET_FIELDS (строки), остальные поля вакансии - JSON в колонке extra.
+    """
+    if pa is None:
+        raise RuntimeError("Для выгрузки в Parquet установите pyarrow: pip install pyarrow")
+
+    columns = PARQUET_FIELDS + ('extra',)
+    schema = pa.schema([(name, pa.string()) for name in columns])
+    rows = {name: [] for name in columns}
+    total = 0
+
+    def flush(writer):
+        writer.write_table(pa.table(rows, schema=schema))
+        for values in rows.values():
+            values.clear()
+
+    with pq.ParquetWriter(str(parquet_file), schema) as writer:
+        for vacancy in iter_vacancies(source):
+            for name in PARQUET_FIELDS:
+                value = vacancy.get(name)
+                rows[name].append(None if value is None else str(value))
+            extra = {k: v for k, v in vacancy.items() if k not in PARQUET_FIELDS}
+            rows['extra'].append(json.dumps(extra, ensure_ascii=False) if extra else None)
+            total += 1
+            if len(rows['id']) >= row_group_size:
+                flush(writer)
+        if rows['id']:
+            flush(writer)
+
+    return total
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Конвертация файлов с вакансиями")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help="JSON <-> JSONL / JSONL.GZ")
+    convert.add_argument('source', help="Исходный файл")
+    convert.add_argument('target', help="Файл результата (формат по расширению)")
+
+    parquet = commands.add_parser('parquet', help="Выгрузка в Parquet (нужен pyarrow)")
+    parquet.add_argument('source', help="Исходный файл")
+    parquet.add_argument('target', help="Файл .parquet")
+
+    args = arg_parser.parse_args()
+
+    if args.command == 'convert':
+        count = write_vacancies(args.target, iter_vacancies(args.source))
+    else:
+        count = export_parquet(args.source, args.target)
+
+    size = os.path.getsize(args.target) / 1024 / 1024
+    print(f"✅ {count} вакансий → {args.target} ({size:.1f} МБ)")
+
+
+if __name__ == "__main__":
+    main()
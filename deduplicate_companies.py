@@ -4,19 +4,148 @@
 """
 
 import json
+import os
+import sqlite3
+import tempfile
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 from collections import defaultdict
 
+from near_duplicates import NearDuplicateDetector, remove_near_duplicates
+from company_resolution import CompanyResolver
+from corpus_io import CorpusWriter, find_batches, iter_vacancies, read_vacancies, write_vacancies
+
+
+class CompanyIndex:
+    """
+    Индекс компания -> лучшая вакансия для глобальной дедупликации
+    
+    Хранит только оценку и положение лучшей вакансии (номер файла,
+    позиция в файле), а не сами вакансии. Пока компаний меньше
+    spill_threshold, индекс живет в словаре, дальше переносится в SQLite
+    во временном файле.
+    """
+    
+    def __init__(self, spill_threshold: int = 500_000):
+        """
+        Args:
+            spill_threshold: Сколько компаний держать в памяти до переноса на диск
+        """
+        self.spill_threshold = spill_threshold
+        self.entries = {}
+        self.db = None
+        self.db_path = None
+    
+    def offer(self, key: str, score: int, location: Tuple[int, int], vacancy_id: str, title: str):
+        """
+        Учесть вакансию компании
+        
+        Лучшей остается вакансия с наибольшей оценкой, при равенстве - первая.
+        """
+        if self.db is not None:
+            self.db.execute(
+                """
+                INSERT INTO companies (key, score, file_index, position, vacancy_id, title, count)
+                VALUES (?, ?, ?, ?, ?, ?, 1)
+                ON CONFLICT(key) DO UPDATE SET
+                    count = count + 1,
+                    file_index = CASE WHEN excluded.score > score THEN excluded.file_index ELSE file_index END,
+                    position = CASE WHEN excluded.score > score THEN excluded.position ELSE position END,
+                    vacancy_id = CASE WHEN excluded.score > score THEN excluded.vacancy_id ELSE vacancy_id END,
+                    title = CASE WHEN excluded.score > score THEN excluded.title ELSE title END,
+                    score = MAX(score, excluded.score)
+                """,
+                (key, score, location[0], location[1], vacancy_id, title)
+            )
+            return
+        
+        entry = self.entries.get(key)
+        if entry is None:
+            self.entries[key] = [score, location[0], location[1], vacancy_id, title, 1]
+            if len(self.entries) > self.spill_threshold:
+                self._spill()
+            return
+        
+        entry[5] += 1
+        if score > entry[0]:
+            entry[:5] = [score, location[0], location[1], vacancy_id, title]
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Лучшая вакансия компании: {'score', 'location', 'vacancy_id', 'title', 'count'}"""
+        if self.db is not None:
+            row = self.db.execute(
+                "SELECT score, file_index, position, vacancy_id, title, count FROM companies WHERE key = ?",
+                (key,)
+            ).fetchone()
+        else:
+            row = self.entries.get(key)
+        
+        if row is None:
+            return None
+        
+        return {
+            'score': row[0],
+            'location': (row[1], row[2]),
+            'vacancy_id': row[3],
+            'title': row[4],
+            'count': row[5]
+        }
+    
+    def _spill(self):
+        """Перенести индекс из памяти в SQLite"""
+        fd, self.db_path = tempfile.mkstemp(prefix='dedup_index_', suffix='.sqlite')
+        os.close(fd)
+        
+        self.db = sqlite3.connect(self.db_path)
+        self.db.execute("PRAGMA journal_mode = OFF")
+        self.db.execute("PRAGMA synchronous = OFF")
+        self.db.execute(
+            """
+            CREATE TABLE companies (
+                key TEXT PRIMARY KEY, score INTEGER, file_index INTEGER,
+                position INTEGER, vacancy_id TEXT, title TEXT, count INTEGER
+            )
+            """
+        )
+        self.db.executemany(
+            "INSERT INTO companies VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((key, *entry) for key, entry in self.entries.items())
+        )
+        self.entries = {}
+        print(f"💽 Индекс компаний перенесен на диск: {self.db_path}")
+    
+    def __len__(self) -> int:
+        if self.db is not None:
+            return self.db.execute("SELECT COUNT(*) FROM companies").fetchone()[0]
+        return len(self.entries)
+    
+    def close(self):
+        """Удалить временную базу"""
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+            os.remove(self.db_path)
+
 
 class CompanyDeduplicator:
     """Удаление дубликатов вакансий от одной компании"""
     
-    def __init__(self):
+    def __init__(self, near_duplicate_threshold: Optional[float] = None, fuzzy_threshold: Optional[float] = 0.75):
+        """
+        Args:
+            near_duplicate_threshold: Порог схожести описаний (0.5-1.0) для удаления
+                                      почти одинаковых вакансий разных компаний; None = выключено
+            fuzzy_threshold: Порог сходства названий ("ГК Ромашка" = "Ромашка Групп");
+                             None = только точное совпадение после нормализации
+        """
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.resolver = CompanyResolver(fuzzy_threshold) if fuzzy_threshold else None
+        self.company_keys = {}  # название -> ключ кластера компании
         self.stats = {
             'total_vacancies': 0,
             'unique_companies': 0,
             'duplicates_removed': 0,
+            'near_duplicates_removed': 0,
             'kept_vacancies': 0
         }
         
@@ -65,6 +194,60 @@ class CompanyDeduplicator:
         
         return company_lower.strip()
     
+    def resolve_companies(self, names):
+        """Сопоставить варианты названий одной компании (результат в company_keys)"""
+        if self.resolver:
+            self.company_keys.update(self.resolver.cluster(names))
+    
+    def company_key(self, company: str) -> str:
+        """Ключ компании для дедупликации"""
+        return self.company_keys.get(company) or self.normalize_company_name(company)
+    
+    def offer_vacancy(self, index: CompanyIndex, vacancy: Dict, location: Tuple[int, int], score: Optional[int] = None):
+        """
+        Учесть вакансию в индексе компаний (вакансии без компании не учитываются)
+        
+        Args:
+            score: Оценка, если уже посчитана (иначе calculate_vacancy_score)
+        """
+        company = vacancy.get('компания', '')
+        if company:
+            index.offer(
+                self.company_key(company),
+                self.calculate_vacancy_score(vacancy) if score is None else score,
+                location,
+                vacancy.get('id', ''),
+                vacancy.get('название', '')
+            )
+    
+    def company_duplicate(self, index: CompanyIndex, vacancy: Dict, location: Tuple[int, int]) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        Проверить вакансию по индексу компаний
+        
+        Returns:
+            (лучшая вакансия компании из индекса или None,
+             запись об удалении или None, если вакансия остается)
+        """
+        company = vacancy.get('компания', '')
+        best = index.get(self.company_key(company)) if company else None
+        
+        if best is None or best['location'] == location:
+            return best, None
+        
+        return best, {
+            'vacancy': vacancy,
+            'reason': f"Дубликат компании '{company}' (оставлена лучшая)",
+            'kept_vacancy_id': best['vacancy_id'],
+            'kept_vacancy_title': best['title']
+        }
+    
+    @staticmethod
+    def mark_duplicates(vacancy: Dict, best: Optional[Dict]):
+        """Пометить оставленную вакансию числом удаленных дубликатов ее компании"""
+        if best and best['count'] > 1:
+            vacancy['_duplicates_count'] = best['count'] - 1
+            vacancy['_dedup_score'] = best['score']
+    
     def calculate_vacancy_score(self, vacancy: Dict) -> int:
         """
         Рассчитывает оценку вакансии для выбора лучшей
@@ -146,6 +329,7 @@ class CompanyDeduplicator:
         """
         # Группируем по компаниям
         companies = defaultdict(list)
+        self.resolve_companies(v.get('компания', '') for v in vacancies)
         
         for vacancy in vacancies:
             company = vacancy.get('компания', '')
@@ -153,8 +337,7 @@ class CompanyDeduplicator:
                 # Вакансии без компании оставляем как есть
                 companies['_no_company_' + str(id(vacancy))].append(vacancy)
             else:
-                normalized = self.normalize_company_name(company)
-                companies[normalized].append(vacancy)
+                companies[self.company_key(company)].append(vacancy)
         
         kept = []
         removed = []
@@ -178,6 +361,14 @@ class CompanyDeduplicator:
                             'kept_vacancy_title': best.get('название', '')
                         })
         
+        # Один текст под разными работодателями
+        if self.near_duplicate_threshold:
+            kept, near_removed = remove_near_duplicates(
+                kept, self.near_duplicate_threshold, self.calculate_vacancy_score
+            )
+            removed.extend(near_removed)
+            self.stats['near_duplicates_removed'] += len(near_removed)
+        
         return kept, removed
     
     def process_directory(self, input_dir: str, output_dir: str = None):
@@ -197,10 +388,10 @@ class CompanyDeduplicator:
             output_path = input_path
         
         # Находим все filtered_batch файлы
-        filtered_files = sorted(input_path.glob('filtered_batch_*.json'))
+        filtered_files = find_batches(input_path, 'filtered_batch')
         
         if not filtered_files:
-            print(f"❌ Не найдено файлов filtered_batch_*.json в {input_dir}")
+            print(f"❌ Не найдено файлов filtered_batch_* (.json, .jsonl, .jsonl.gz) в {input_dir}")
             return
         
         print("=" * 70)
@@ -222,8 +413,7 @@ class CompanyDeduplicator:
         print("🧪 Тестовая проверка на первом батче...")
         test_file = filtered_files[0]
         
-        with open(test_file, 'r', encoding='utf-8') as f:
-            test_data = json.load(f)
+        test_data = read_vacancies(test_file)
         
         test_kept, test_removed = self.deduplicate_batch(test_data)
         
@@ -254,8 +444,7 @@ class CompanyDeduplicator:
         for i, file_path in enumerate(filtered_files, 1):
             # Читаем файл
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    batch_data = json.load(f)
+                batch_data = read_vacancies(file_path)
             except Exception as e:
                 print(f"⚠️ [{i}/{len(filtered_files)}] Ошибка чтения {file_path.name}: {e}")
                 continue
@@ -268,9 +457,7 @@ class CompanyDeduplicator:
             self.stats['duplicates_removed'] += len(removed)
             
             # Сохраняем дедуплицированный батч
-            output_file = output_path / file_path.name
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(kept, f, ensure_ascii=False, indent=2)
+            write_vacancies(output_path / file_path.name, kept)
             
             # Добавляем в общий список удаленных
             all_removed.extend(removed)
@@ -287,12 +474,10 @@ class CompanyDeduplicator:
         # Подсчитываем уникальные компании
         all_companies = set()
         for file_path in filtered_files:
-            with open(output_path / file_path.name, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for vac in data:
-                    company = vac.get('компания', '')
-                    if company:
-                        all_companies.add(self.normalize_company_name(company))
+            for vac in iter_vacancies(output_path / file_path.name):
+                company = vac.get('компания', '')
+                if company:
+                    all_companies.add(self.company_key(company))
         
         self.stats['unique_companies'] = len(all_companies)
         
@@ -303,7 +488,173 @@ class CompanyDeduplicator:
                 json.dump(all_removed, f, ensure_ascii=False, indent=2)
             print(f"💾 Удаленные дубликаты сохранены: {removed_file}")
         
-        # Обновляем статистику
+        self._update_stats_file(output_path)
+        self._print_stats()
+
+    def process_directory_global(
+        self,
+        input_dir: str,
+        output_dir: str = None,
+        spill_threshold: int = 500_000
+    ):
+        """
+        Дедупликация по компаниям сразу по всем filtered_batch файлам
+        
+        Компания из батча 3 и батча 40 остается один раз. Два потоковых
+        прохода: первый строит индекс компания -> лучшая вакансия (в памяти
+        держится только индекс, не вакансии), второй переписывает батчи.
+        Без подтверждения в консоли - подходит для автоматического запуска.
+        
+        Args:
+            input_dir: Директория с filtered_batch файлами
+            output_dir: Директория для сохранения результатов (если None, перезаписываем)
+            spill_threshold: Сколько компаний держать в памяти до переноса индекса на диск
+        """
+        input_path = Path(input_dir)
+        
+        if output_dir:
+            output_path = Path(output_dir)
+            output_path.mkdir(exist_ok=True)
+        else:
+            output_path = input_path
+        
+        filtered_files = find_batches(input_path, 'filtered_batch')
+        
+        if not filtered_files:
+            print(f"❌ Не найдено файлов filtered_batch_* (.json, .jsonl, .jsonl.gz) в {input_dir}")
+            return
+        
+        print("=" * 70)
+        print("🔄 ГЛОБАЛЬНОЕ УДАЛЕНИЕ ДУБЛИКАТОВ ПО КОМПАНИЯМ")
+        print("=" * 70)
+        print(f"📁 Найдено файлов: {len(filtered_files)}")
+        print()
+        
+        index = CompanyIndex(spill_threshold)
+        
+        try:
+            readable = []
+            
+            # Проход 0: варианты названий одной компании по всем батчам
+            if self.resolver:
+                print("🔍 Проход 0: сопоставление названий компаний...")
+                names = set()
+                for file_path in filtered_files:
+                    batch_data = self._read_batch(file_path) or []
+                    names.update(v.get('компания', '') for v in batch_data)
+                self.resolve_companies(sorted(names))
+                print(f"   Названий: {len(names)}, компаний: {len(set(self.company_keys.values()))}")
+            
+            # Проход 1: лучшая вакансия каждой компании по всем батчам
+            print("🔍 Проход 1: индекс компаний...")
+            for file_index, file_path in enumerate(filtered_files):
+                batch_data = self._read_batch(file_path)
+                if batch_data is None:
+                    continue
+                readable.append((file_index, file_path))
+                
+                for position, vacancy in enumerate(batch_data):
+                    self.offer_vacancy(index, vacancy, (file_index, position))
+            
+            self.stats['unique_companies'] = len(index)
+            print(f"   Уникальных компаний: {self.stats['unique_companies']}")
+            
+            # Проход 1б: почти одинаковые описания среди оставшихся вакансий
+            near = {}
+            if self.near_duplicate_threshold:
+                print("🔍 Проход 1б: почти одинаковые описания...")
+                near = self._find_near_duplicates_global(readable, index)
+                print(f"   Найдено копий: {len(near)}")
+            
+            # Проход 2: переписываем батчи, удаленные пишем потоком
+            print("✍️  Проход 2: запись батчей...")
+            removed_file = output_path / 'removed_duplicates.json'
+            
+            with CorpusWriter(removed_file) as removed_out:
+                for i, (file_index, file_path) in enumerate(readable, 1):
+                    batch_data = self._read_batch(file_path)
+                    if batch_data is None:
+                        continue
+                    
+                    kept = []
+                    for position, vacancy in enumerate(batch_data):
+                        location = (file_index, position)
+                        
+                        if location in near:
+                            kept_id, kept_title = near[location]
+                            entry = {
+                                'vacancy': vacancy,
+                                'reason': f"Почти одинаковое описание с вакансией '{kept_title}'",
+                                'kept_vacancy_id': kept_id,
+                                'kept_vacancy_title': kept_title
+                            }
+                            self.stats['near_duplicates_removed'] += 1
+                        else:
+                            best, entry = self.company_duplicate(index, vacancy, location)
+                            if entry is None:
+                                self.mark_duplicates(vacancy, best)
+                                kept.append(vacancy)
+                                continue
+                        
+                        removed_out.write(entry)
+                    
+                    self.stats['total_vacancies'] += len(batch_data)
+                    self.stats['kept_vacancies'] += len(kept)
+                    self.stats['duplicates_removed'] += len(batch_data) - len(kept)
+                    
+                    write_vacancies(output_path / file_path.name, kept)
+                    
+                    print(f"[{i}/{len(readable)}] {file_path.name}: было {len(batch_data)}, осталось {len(kept)}", end='\r')
+        finally:
+            index.close()
+        
+        print()
+        print(f"💾 Удаленные дубликаты сохранены: {removed_file}")
+        
+        self._update_stats_file(output_path)
+        self._print_stats()
+    
+    def _find_near_duplicates_global(self, readable: List[Tuple[int, Path]], index: CompanyIndex) -> Dict:
+        """
+        Почти одинаковые описания среди вакансий, оставшихся после дедупликации по компаниям
+        
+        В памяти - только MinHash-подписи и id/название оставшихся вакансий.
+        
+        Returns:
+            {(номер файла, позиция): (id, название) оставленной вакансии}
+        """
+        detector = NearDuplicateDetector(self.near_duplicate_threshold)
+        titles = {}
+        
+        for file_index, file_path in readable:
+            batch_data = self._read_batch(file_path)
+            if batch_data is None:
+                continue
+            
+            for position, vacancy in enumerate(batch_data):
+                company = vacancy.get('компания', '')
+                best = index.get(self.company_key(company)) if company else None
+                location = (file_index, position)
+                
+                if best is None or best['location'] == location:
+                    detector.add(location, vacancy.get('описание', ''), self.calculate_vacancy_score(vacancy))
+                    titles[location] = (vacancy.get('id', ''), vacancy.get('название', ''))
+        
+        return {
+            location: titles[kept_location]
+            for location, kept_location in detector.duplicates().items()
+        }
+    
+    def _read_batch(self, file_path: Path) -> Optional[List[Dict]]:
+        """Прочитать батч (None при ошибке)"""
+        try:
+            return read_vacancies(file_path)
+        except Exception as e:
+            print(f"⚠️ Ошибка чтения {file_path.name}: {e}")
+            return None
+    
+    def _update_stats_file(self, output_path: Path):
+        """Обновить filtering_stats.json после дедупликации"""
         stats_file = output_path / 'filtering_stats.json'
         if stats_file.exists():
             with open(stats_file, 'r', encoding='utf-8') as f:
@@ -323,18 +674,23 @@ class CompanyDeduplicator:
             
             with open(stats_file, 'w', encoding='utf-8') as f:
                 json.dump(new_stats, f, ensure_ascii=False, indent=2)
-        
-        # Показываем статистику
+    
+    def _print_stats(self):
+        """Показать статистику дедупликации"""
         print()
         print("=" * 70)
         print("📊 СТАТИСТИКА ДЕДУПЛИКАЦИИ")
         print("=" * 70)
-        print(f"Обработано вакансий: {self.stats['total_vacancies']}")
-        print(f"Удалено дубликатов: {self.stats['duplicates_removed']} ({self.stats['duplicates_removed']/self.stats['total_vacancies']*100:.1f}%)")
+        total = self.stats['total_vacancies']
+        companies = self.stats['unique_companies']
+        print(f"Обработано вакансий: {total}")
+        print(f"Удалено дубликатов: {self.stats['duplicates_removed']} ({self.stats['duplicates_removed']/total*100 if total else 0:.1f}%)")
         print(f"Осталось вакансий: {self.stats['kept_vacancies']}")
         print(f"Уникальных компаний: {self.stats['unique_companies']}")
+        if self.near_duplicate_threshold:
+            print(f"Из них почти одинаковых описаний: {self.stats['near_duplicates_removed']}")
         print()
-        print(f"Среднее дубликатов на компанию: {self.stats['total_vacancies']/self.stats['unique_companies']:.2f}")
+        print(f"Среднее дубликатов на компанию: {total/companies if companies else 0:.2f}")
         print("=" * 70)
         print()
         print("✅ ГОТОВО!")
@@ -349,11 +705,11 @@ def main():
     # Можно указать отдельную директорию для вывода или оставить None для перезаписи
     OUTPUT_DIR = None  # None = перезаписываем те же файлы
     
-    # Создаем дедупликатор
-    deduplicator = CompanyDeduplicator()
+    # Создаем дедупликатор (+ почти одинаковые описания до отправки в GPT)
+    deduplicator = CompanyDeduplicator(near_duplicate_threshold=0.8)
     
-    # Обрабатываем
-    deduplicator.process_directory(INPUT_DIR, OUTPUT_DIR)
+    # Обрабатываем все батчи разом: компания остается одна на весь набор
+    deduplicator.process_directory_global(INPUT_DIR, OUTPUT_DIR)
     
     print()
     print("💡 Совет: Проверьте файл 'removed_duplicates.json' - там все удаленные дубликаты")
@@ -0,0 +1,221 @@
+"""
+ЛОКАЛЬНЫЙ OPENAI-СОВМЕСТИМЫЙ СЕРВЕР ДЛЯ ТЕСТОВ РАНЖИРОВАНИЯ
+Отвечает на POST /v1/chat/completions правдоподобными результатами
+для каждой вакансии из запроса. Задержка, лимит запросов в минуту,
+доля случайных 429 и шаблонных ответов настраиваются - можно проверить
+планировщик process_vacancies_with_gpt.py без ключа и без расходов.
+
+Использование:
+    python fake_openai_server.py --port 8787 --latency 1.5 --rpm 300 --error-rate 0.05 --bad-rate 0.1
+
+    $env:OPENAI_BASE_URL="http://127.0.0.1:8787/v1"
+    python process_vacancies_with_gpt.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+from prompt_encoding import decode_vacancies
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """HTTP-сервер с настройками имитации"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        latency: float = 0.5,
+        rpm: int = 0,
+        error_rate: float = 0.0,
+        bad_rate: float = 0.0
+    ):
+        """
+        Args:
+            address: (хост, порт)
+            latency: Задержка ответа, секунд (+-30%)
+            rpm: Лимит запросов в минуту, сверх него - 429 (0 = без лимита)
+            error_rate: Доля случайных 429
+            bad_rate: Доля шаблонных результатов (не проходят валидацию)
+        """
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency = latency
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.bad_rate = bad_rate
+        self.recent = deque()
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'rate_limited': 0}
+
+    def over_limit(self) -> bool:
+        """Запрос превышает лимит (скользящее окно 60 секунд) или случайный 429"""
+        with self.lock:
+            self.stats['requests'] += 1
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+
+            if (self.rpm and len(self.recent) >= self.rpm) or random.random() < self.error_rate:
+                self.stats['rate_limited'] += 1
+                return True
+
+            self.recent.append(now)
+            return False
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Обработчик /v1/chat/completions"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, data: Dict, headers: Dict = None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+        if self.server.over_limit():
+            self._send_json(
+                429,
+                {'error': {'message': 'Rate limit reached (fake)', 'type': 'requests', 'code': 'rate_limit_exceeded'}},
+                {'retry-after-ms': '500'}
+            )
+            return
+
+        time.sleep(self.server.latency * random.uniform(0.7, 1.3))
+
+        messages = request.get('messages', [])
+        vacancies = extract_vacancies(messages)
+        results = [
+            template_result(v) if random.random() < self.server.bad_rate else fake_result(v)
+            for v in vacancies
+        ]
+        content = json.dumps({'results': results}, ensure_ascii=False)
+
+        prompt_tokens = sum(len(m.get('content', '')) for m in messages) // 3
+        completion_tokens = len(content) // 3
+
+        self._send_json(200, {
+            'id': f"chatcmpl-fake-{int(time.time() * 1000)}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'fake'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        })
+
+
+def extract_vacancies(messages: List[Dict]) -> List[Dict]:
+    """Вакансии из последнего пользовательского сообщения (любой PROMPT_ENCODING)"""
+    for message in reversed(messages):
+        if message.get('role') == 'user':
+            try:
+                return decode_vacancies(message.get('content', ''))
+            except (json.JSONDecodeError, AttributeError):
+                return []
+    return []
+
+
+def fake_result(vacancy: Dict) -> Dict:
+    """Правдоподобный результат ранжирования, проходящий валидацию"""
+    title = vacancy.get('название', 'вакансия')
+    company = vacancy.get('компания', 'компания')
+    score = random.randint(2, 9)
+
+    return {
+        'vacancy_id': vacancy.get('id', ''),
+        'score': score,
+        'category': 'Высокий потенциал' if score >= 7 else 'Средний потенциал' if score >= 4 else 'Низкий потенциал',
+        'reasoning': (
+            f"В вакансии '{title}' компании {company} описана регулярная обработка однотипных "
+            f"обращений и документов; часть операций повторяется ежедневно и поддается автоматизации."
+        ),
+        'automation_opportunities': [
+            f"Автоматическая обработка входящих заявок для должности '{title}'",
+            f"Интеграция учетной системы {company} с формами на сайте"
+        ],
+        'pain_points': ['Ручной ввод данных', 'Большой поток обращений'],
+        'estimated_automation_percentage': score * 10,
+        'priority': 'high' if score >= 7 else 'medium' if score >= 4 else 'low'
+    }
+
+
+def template_result(vacancy: Dict) -> Dict:
+    """Шаблонный результат, который валидация должна отклонить"""
+    return {
+        'vacancy_id': vacancy.get('id', ''),
+        'score': 5,
+        'category': 'Средний потенциал',
+        'reasoning': 'Автоматическая оценка на основе ключевых индикаторов в описании.',
+        'automation_opportunities': ['Автоответ на заявки'],
+        'pain_points': [],
+        'estimated_automation_percentage': 50,
+        'priority': 'medium'
+    }
+
+
+def start_fake_server(
+    port: int = 0,
+    latency: float = 0.5,
+    rpm: int = 0,
+    error_rate: float = 0.0,
+    bad_rate: float = 0.0
+) -> Tuple[FakeOpenAIServer, str]:
+    """
+    Запустить сервер в фоновом потоке
+
+    Returns:
+        (server, base_url) - base_url подходит для OPENAI_BASE_URL
+    """
+    server = FakeOpenAIServer(('127.0.0.1', port), latency, rpm, error_rate, bad_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Локальный OpenAI-совместимый сервер для тестов")
+    arg_parser.add_argument('--port', type=int, default=8787, help="Порт")
+    arg_parser.add_argument('--latency', type=float, default=0.5, help="Задержка ответа, секунд")
+    arg_parser.add_argument('--rpm', type=int, default=0, help="Лимит запросов в минуту (0 - без лимита)")
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help="Доля случайных 429")
+    arg_parser.add_argument('--bad-rate', type=float, default=0.0, help="Доля шаблонных результатов")
+    args = arg_parser.parse_args()
+
+    server = FakeOpenAIServer(('127.0.0.1', args.port), args.latency, args.rpm, args.error_rate, args.bad_rate)
+    print(f"🤖 Fake OpenAI: http://127.0.0.1:{args.port}/v1 (задержка {args.latency} с, RPM {args.rpm or '∞'}, 429 {args.error_rate:.0%})")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 Запросов: {server.stats['requests']}, 429: {server.stats['rate_limited']}")
+
+
+if __name__ == "__main__":
+    main()
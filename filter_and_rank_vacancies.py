@@ -5,8 +5,24 @@
 
 import json
 import re
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+
+from corpus_io import find_batches, read_vacancies, write_vacancies
+
+# Внутренний парсер re нужен только для префильтра по литералам; его API
+# может меняться между версиями Python - тогда префильтр выключается,
+# а паттерны проверяются целиком (медленнее, но с тем же результатом)
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+    try:  # Python < 3.11
+        import sre_parse
+        import sre_constants
+    except ImportError:
+        sre_parse = None
+        sre_constants = None
 
 # ============================================
 # КОНФИГУРАЦИЯ ФИЛЬТРАЦИИ
@@ -80,36 +96,153 @@ HIGH_POTENTIAL_PATTERNS = {
 }
 
 
+# ============================================
+# СКОМПИЛИРОВАННЫЕ ПРАВИЛА
+# ============================================
+
+class RuleEngine:
+    """
+    Группы паттернов, скомпилированные один раз
+    
+    Текст поля приводится к нижнему регистру один раз на все группы.
+    У каждого паттерна заранее выделены обязательные литералы (например,
+    'холодн' и 'звонк' из r'холодн(ые|ых)\\s+звонк'): паттерн запускается,
+    только если все его литералы есть в тексте (проверка через `in`).
+    Большинство паттернов на большинстве вакансий отсекается без regex.
+    
+    Одной регуляркой на все паттерны посчитать совпадения нельзя:
+    альтернатива в re находит одну ветку на позицию, а паттерны с .*
+    пересекаются. Поэтому счетчики считаются по паттернам, но после фильтра.
+    """
+    
+    def __init__(self, groups: Dict[str, List[str]]):
+        """
+        Args:
+            groups: Имя группы -> список паттернов
+        """
+        self.groups = {
+            name: [self._compile_rule(pattern) for pattern in patterns]
+            for name, patterns in groups.items()
+        }
+    
+    @staticmethod
+    def _compile_rule(pattern: str) -> Tuple[re.Pattern, Tuple[str, ...]]:
+        """Скомпилировать паттерн и выделить обязательные литералы"""
+        return re.compile(pattern, re.IGNORECASE), required_literals(pattern)
+    
+    def count(self, group: str, text_lower: str, stop_at: Optional[int] = None) -> int:
+        """
+        Сколько паттернов группы совпало с текстом
+        
+        Args:
+            group: Имя группы
+            text_lower: Текст в нижнем регистре
+            stop_at: Прекратить подсчет, набрав столько совпадений
+        """
+        hits = 0
+        if not text_lower:
+            return hits
+        
+        for compiled, literals in self.groups[group]:
+            if all(literal in text_lower for literal in literals) and compiled.search(text_lower):
+                hits += 1
+                if stop_at is not None and hits >= stop_at:
+                    break
+        
+        return hits
+    
+    def scan(self, text: str, groups: List[str]) -> Dict[str, int]:
+        """Счетчики совпадений по группам для одного поля (lower один раз)"""
+        text_lower = text.lower() if text else ''
+        return {group: self.count(group, text_lower) for group in groups}
+
+
+def required_literals(pattern: str) -> Tuple[str, ...]:
+    """
+    Литералы, без которых паттерн не может совпасть
+    
+    Берутся подряд идущие символы верхнего уровня разобранного паттерна
+    (внутри групп, повторов и альтернатив ничего не берется). Если паттерн
+    не разбирается или парсер re устроен иначе, литералов нет и паттерн
+    проверяется всегда.
+    """
+    if sre_parse is None:
+        return ()
+    
+    try:
+        literals = []
+        run = []
+        for op, value in list(sre_parse.parse(pattern).data) + [(None, None)]:
+            if op == sre_constants.LITERAL:
+                run.append(chr(value))
+                continue
+            if len(run) >= 2:
+                literals.append(''.join(run).lower())
+            run = []
+    except Exception:
+        return ()
+    
+    return tuple(literals)
+
+
+RULES = RuleEngine({
+    'exclude_title': SALES_EXCLUDE_PATTERNS['название'],
+    'exclude_description': SALES_EXCLUDE_PATTERNS['описание'],
+    'reduce_description': SALES_REDUCE_PATTERNS['описание'],
+    'high_potential_description': HIGH_POTENTIAL_PATTERNS['описание'],
+})
+
+
+@lru_cache(maxsize=64)
+def _compiled_rules(patterns: Tuple[str, ...]) -> RuleEngine:
+    """RuleEngine для произвольного списка паттернов (для check_patterns)"""
+    return RuleEngine({'patterns': list(patterns)})
+
+
+def analyze_vacancy(vacancy: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Счетчики совпадений всех групп правил за один проход по каждому полю
+    
+    Returns:
+        {'exclude_title', 'exclude_description', 'reduce_description',
+         'high_potential_description'} -> количество совпавших паттернов
+    """
+    counts = RULES.scan(vacancy.get('название', ''), ['exclude_title'])
+    counts.update(RULES.scan(
+        vacancy.get('описание', ''),
+        ['exclude_description', 'reduce_description', 'high_potential_description']
+    ))
+    return counts
+
+
 def check_patterns(text: str, patterns: List[str]) -> bool:
     """Проверяет, совпадает ли текст с хотя бы одним паттерном"""
     if not text:
         return False
-    text_lower = text.lower()
-    for pattern in patterns:
-        if re.search(pattern, text_lower, re.IGNORECASE):
-            return True
-    return False
+    return _compiled_rules(tuple(patterns)).count('patterns', text.lower(), stop_at=1) > 0
 
 
-def should_exclude_vacancy(vacancy: Dict[str, Any]) -> tuple[bool, str]:
+def should_exclude_vacancy(vacancy: Dict[str, Any], counts: Optional[Dict[str, int]] = None) -> tuple[bool, str]:
     """
     Определяет, нужно ли полностью исключить вакансию
     
+    Args:
+        vacancy: Вакансия
+        counts: Результат analyze_vacancy (если уже посчитан)
+    
     Returns:
         (should_exclude, reason)
     """
     название = vacancy.get('название', '')
-    описание = vacancy.get('описание', '')
+    if counts is None:
+        counts = analyze_vacancy(vacancy)
     
     # Проверка по названию
-    if check_patterns(название, SALES_EXCLUDE_PATTERNS['название']):
+    if counts['exclude_title']:
         return True, f"Исключено по названию: '{название[:100]}...'"
     
     # Проверка по описанию (более строгая)
-    desc_matches = sum(
-        1 for pattern in SALES_EXCLUDE_PATTERNS['описание']
-        if re.search(pattern, описание.lower(), re.IGNORECASE)
-    )
+    desc_matches = counts['exclude_description']
     
     # Если 2+ маркера продажника в описании - исключаем
     if desc_matches >= 2:
@@ -118,24 +251,25 @@ def should_exclude_vacancy(vacancy: Dict[str, Any]) -> tuple[bool, str]:
     return False, ""
 
 
-def calculate_pre_score(vacancy: Dict[str, Any]) -> int:
+def calculate_pre_score(vacancy: Dict[str, Any], counts: Optional[Dict[str, int]] = None) -> int:
     """
     Рассчитывает предварительную оценку потенциала (0-10)
     Помогает определить приоритет обработки
+    
+    Args:
+        vacancy: Вакансия
+        counts: Результат analyze_vacancy (если уже посчитан)
     """
-    описание = vacancy.get('описание', '')
+    if counts is None:
+        counts = analyze_vacancy(vacancy)
     score = 5  # базовая оценка
     
     # Снижаем за признаки продажника
-    reduce_matches = check_patterns(описание, SALES_REDUCE_PATTERNS['описание'])
-    if reduce_matches:
+    if counts['reduce_description']:
         score -= 2
     
     # Повышаем за признаки высокого потенциала
-    high_potential_matches = sum(
-        1 for pattern in HIGH_POTENTIAL_PATTERNS['описание']
-        if re.search(pattern, описание.lower(), re.IGNORECASE)
-    )
+    high_potential_matches = counts['high_potential_description']
     
     if high_potential_matches >= 5:
         score += 3
@@ -154,8 +288,7 @@ def filter_batch(batch_file: Path) -> tuple[List[Dict], List[Dict], Dict]:
     Returns:
         (to_process, excluded, stats)
     """
-    with open(batch_file, 'r', encoding='utf-8') as f:
-        vacancies = json.load(f)
+    vacancies = read_vacancies(batch_file)
     
     to_process = []
     excluded = []
@@ -169,7 +302,8 @@ def filter_batch(batch_file: Path) -> tuple[List[Dict], List[Dict], Dict]:
     }
     
     for vacancy in vacancies:
-        should_exclude, reason = should_exclude_vacancy(vacancy)
+        counts = analyze_vacancy(vacancy)
+        should_exclude, reason = should_exclude_vacancy(vacancy, counts)
         
         if should_exclude:
             excluded.append({
@@ -180,7 +314,7 @@ def filter_batch(batch_file: Path) -> tuple[List[Dict], List[Dict], Dict]:
             })
             stats['excluded'] += 1
         else:
-            pre_score = calculate_pre_score(vacancy)
+            pre_score = calculate_pre_score(vacancy, counts)
             vacancy['_pre_score'] = pre_score
             to_process.append(vacancy)
             stats['to_process'] += 1
@@ -212,7 +346,7 @@ def process_all_batches(batches_dir: Path, output_dir: Path):
         'total_low_priority': 0,
     }
     
-    batch_files = sorted(batches_dir.glob('batch_*.json'))
+    batch_files = find_batches(batches_dir, 'batch')
     
     print(f"Найдено {len(batch_files)} батчей\n")
     
@@ -222,14 +356,10 @@ def process_all_batches(batches_dir: Path, output_dir: Path):
         to_process, excluded, stats = filter_batch(batch_file)
         
         # Сохраняем отфильтрованный батч
-        filtered_file = output_dir / f"filtered_{batch_file.name}"
-        with open(filtered_file, 'w', encoding='utf-8') as f:
-            json.dump(to_process, f, ensure_ascii=False, indent=2)
+        write_vacancies(output_dir / f"filtered_{batch_file.name}", to_process)
         
         # Сохраняем исключенные
-        excluded_file = output_dir / f"excluded_{batch_file.name}"
-        with open(excluded_file, 'w', encoding='utf-8') as f:
-            json.dump(excluded, f, ensure_ascii=False, indent=2)
+        write_vacancies(output_dir / f"excluded_{batch_file.name}", excluded)
         
         # Обновляем общую статистику
         all_stats['total_batches'] += 1
@@ -8,7 +8,9 @@
 import json
 import re
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Set
+
+from corpus_io import find_batches, read_vacancies, write_vacancies
 
 
 class UnwantedVacanciesFilter:
@@ -73,6 +75,112 @@ class UnwantedVacanciesFilter:
             'filtered_out': 0,
             'reasons': {}
         }
+        
+        self._build_matchers()
+    
+    def _build_matchers(self):
+        """
+        Скомпилировать ключевые слова и исключения один раз
+        
+        Вызывать заново после изменения unwanted_keywords или exceptions.
+        
+        - исключения: одна регулярка-альтернатива (любое вхождение подстроки)
+        - название: альтернатива в lookahead, чтобы находить пересекающиеся
+          вхождения; из фраз, начинающихся в одной позиции, регулярка
+          возвращает самую длинную, более короткие берутся из таблицы префиксов
+        - описание: то же с границами слов (\\b), только фразы до 3 слов
+        """
+        # Порядок ключевых слов в конфиге определяет причину фильтрации
+        self._keyword_order = {}
+        for category_index, (category, keywords) in enumerate(self.unwanted_keywords.items()):
+            for keyword_index, keyword in enumerate(keywords):
+                self._keyword_order.setdefault(keyword, []).append(
+                    ((category_index, keyword_index), category)
+                )
+        
+        keywords = sorted(self._keyword_order, key=len, reverse=True)
+        short_keywords = [k for k in keywords if len(k.split()) <= 3]
+        
+        self._exceptions_pattern = self._alternation(
+            [e.lower() for e in self.exceptions], r'(?:{})'
+        )
+        self._title_pattern = self._alternation(keywords, r'(?=({}))')
+        self._description_pattern = self._alternation(short_keywords, r'\b(?=({})\b)')
+        
+        # Ключевые слова, которые являются началом более длинных
+        self._keyword_prefixes = {
+            keyword: [k for k in keywords if k != keyword and keyword.startswith(k)]
+            for keyword in keywords
+        }
+        self._word_patterns = {
+            keyword: re.compile(re.escape(keyword) + r'\b')
+            for keyword in short_keywords
+        }
+    
+    @staticmethod
+    def _alternation(phrases: List[str], template: str):
+        """Одна регулярка из списка фраз (None, если фраз нет)"""
+        if not phrases:
+            return None
+        return re.compile(template.format('|'.join(re.escape(p) for p in phrases)))
+    
+    def _title_hits(self, title: str) -> Set[str]:
+        """Ключевые слова, входящие в название как подстрока"""
+        hits = set()
+        if self._title_pattern:
+            for match in self._title_pattern.finditer(title):
+                keyword = match.group(1)
+                hits.add(keyword)
+                hits.update(self._keyword_prefixes[keyword])
+        return hits
+    
+    def _description_hits(self, description: str) -> Set[str]:
+        """Ключевые слова (до 3 слов), входящие в описание целыми словами"""
+        hits = set()
+        if self._description_pattern:
+            for match in self._description_pattern.finditer(description):
+                keyword = match.group(1)
+                hits.add(keyword)
+                for prefix in self._keyword_prefixes[keyword]:
+                    word_pattern = self._word_patterns.get(prefix)
+                    if word_pattern and word_pattern.match(description, match.start()):
+                        hits.add(prefix)
+        return hits
+    
+    def find_matches(self, vacancy: Dict) -> Dict[str, List]:
+        """
+        Найти все совпадения за один проход по названию и описанию
+        
+        Returns:
+            {'exceptions': найденные исключения,
+             'hits': [{'category', 'keyword', 'field'}] в порядке конфига}
+        """
+        title = vacancy.get('название', '').lower()
+        description = vacancy.get('описание', '').lower()
+        
+        exceptions = []
+        if self._exceptions_pattern:
+            for text in (title, description):
+                for match in self._exceptions_pattern.finditer(text):
+                    if match.group(0) not in exceptions:
+                        exceptions.append(match.group(0))
+        
+        return {
+            'exceptions': exceptions,
+            'hits': self._ordered_hits(self._title_hits(title), self._description_hits(description))
+        }
+    
+    def _ordered_hits(self, title_hits: Set[str], description_hits: Set[str]) -> List[Dict]:
+        """Совпадения в порядке категорий и ключевых слов конфига (название раньше описания)"""
+        hits = []
+        for keyword in title_hits | description_hits:
+            for order, category in self._keyword_order[keyword]:
+                if keyword in title_hits:
+                    hits.append((order, 0, {'category': category, 'keyword': keyword, 'field': 'название'}))
+                if keyword in description_hits:
+                    hits.append((order, 1, {'category': category, 'keyword': keyword, 'field': 'описание'}))
+        
+        return [hit for _, _, hit in sorted(hits, key=lambda h: (h[0], h[1]))]
     
     def is_unwanted(self, vacancy: Dict) -> Tuple[bool, str]:
         """
@@ -85,25 +193,18 @@ class UnwantedVacanciesFilter:
         description = vacancy.get('описание', '').lower()
         
         # Проверяем исключения - если есть, то НЕ фильтруем
-        for exception in self.exceptions:
-            if exception.lower() in title or exception.lower() in description:
-                return False, ""
-        
-        # Проверяем нежелательные ключевые слова
-        for category, keywords in self.unwanted_keywords.items():
-            for keyword in keywords:
-                # Проверяем название
-                if keyword in title:
-                    reason = f"Категория: {category}, найдено в названии: '{keyword}'"
-                    return True, reason
-                
-                # Проверяем описание (только для коротких фраз)
-                if len(keyword.split()) <= 3:  # Короткие фразы
-                    # Используем регулярные выражения для точного поиска
-                    pattern = r'\b' + re.escape(keyword) + r'\b'
-                    if re.search(pattern, description):
-                        reason = f"Категория: {category}, найдено в описании: '{keyword}'"
-                        return True, reason
+        if self._exceptions_pattern and (
+            self._exceptions_pattern.search(title)
+            or self._exceptions_pattern.search(description)
+        ):
+            return False, ""
+        
+        # Первое по порядку конфига ключевое слово определяет причину
+        hits = self._ordered_hits(self._title_hits(title), self._description_hits(description))
+        if hits:
+            hit = hits[0]
+            place = 'в названии' if hit['field'] == 'название' else 'в описании'
+            return True, f"Категория: {hit['category']}, найдено {place}: '{hit['keyword']}'"
         
         return False, ""
     
@@ -151,10 +252,10 @@ class UnwantedVacanciesFilter:
             output_path = input_path
         
         # Находим все filtered_batch файлы
-        filtered_files = sorted(input_path.glob('filtered_batch_*.json'))
+        filtered_files = find_batches(input_path, 'filtered_batch')
         
         if not filtered_files:
-            print(f"❌ Не найдено файлов filtered_batch_*.json в {input_dir}")
+            print(f"❌ Не найдено файлов filtered_batch_* (.json, .jsonl, .jsonl.gz) в {input_dir}")
             return
         
         print("=" * 70)
@@ -189,8 +290,7 @@ class UnwantedVacanciesFilter:
         for i, file_path in enumerate(filtered_files, 1):
             # Читаем файл
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    batch_data = json.load(f)
+                batch_data = read_vacancies(file_path)
             except Exception as e:
                 print(f"⚠️ [{i}/{len(filtered_files)}] Ошибка чтения {file_path.name}: {e}")
                 continue
@@ -204,9 +304,7 @@ class UnwantedVacanciesFilter:
             
             # Сохраняем отфильтрованный батч
             if kept:
-                output_file = output_path / file_path.name
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(kept, f, ensure_ascii=False, indent=2)
+                write_vacancies(output_path / file_path.name, kept)
             
             # Добавляем в общий список отфильтрованных
             all_filtered.extend(filtered)
@@ -11,6 +11,7 @@ import re
 from typing import Dict, List, Optional
 from pathlib import Path
 from datetime import datetime
+from corpus_io import read_vacancies
 
 
 class FreeContactsFinder:
@@ -203,8 +204,7 @@ class FreeContactsFinder:
         print()
         
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                vacancies = json.load(f)
+            vacancies = read_vacancies(json_file)
         except Exception as e:
             print(f"❌ Ошибка чтения файла: {e}")
             return []
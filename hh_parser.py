@@ -3,6 +3,8 @@
 Быстрая реализация для получения данных о вакансиях
 """
 
+import os
+import sqlite3
 import requests
 import json
 import time
@@ -10,22 +12,31 @@ import re
 from typing import List, Dict, Optional
 from datetime import datetime
 
+from http_recorder import install_from_env
+from metrics import track_upstream, cache_lookup, UPSTREAM_RETRIES
+from tracing import span, traced
+from corpus_io import write_vacancies
+from vacancy_store import VacancyStore, default_store
+
 
 class HHParser:
     """Класс для парсинга вакансий с hh.ru"""
     
-    BASE_URL = "https://api.hh.ru"
+    BASE_URL = os.getenv("HH_API_URL", "https://api.hh.ru")  # Локально: mock_upstreams.py
     
-    def __init__(self, delay: float = 0.3):
+    def __init__(self, delay: float = 0.3, store: Optional[VacancyStore] = None):
         """
         Инициализация парсера
         
         Args:
             delay: Задержка между запросами в секундах (для избежания блокировок)
                    По умолчанию 0.3 сек, так как запрашиваем полные описания
+            store: Локальное хранилище вакансий (None - общее из VACANCY_STORE_FILE,
+                   False - не сохранять и всегда запрашивать детали)
         """
         self.session = requests.Session()
         self.delay = delay
+        self.store = default_store() if store is None else (store or None)
         # Правильные заголовки для API hh.ru
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -36,7 +47,10 @@ class HHParser:
             'Referer': 'https://hh.ru/',
             'Origin': 'https://hh.ru'
         })
+        # Запись/воспроизведение ответов (HTTP_FIXTURES, HTTP_MODE)
+        install_from_env(self.session)
     
+    @traced('hh.search_vacancies')
     def search_vacancies(
         self, 
         keywords: str, 
@@ -68,6 +82,7 @@ class HHParser:
             Список словарей с данными вакансий (отсортированных по дате публикации)
         """
         all_vacancies = []
+        reused = 0
         page = 0
         total_pages = None
         
@@ -106,11 +121,13 @@ class HHParser:
                 params['excluded_text'] = excluded_text
             
             try:
-                response = self.session.get(
-                    f"{self.BASE_URL}/vacancies",
-                    params=params,
-                    timeout=15
-                )
+                with span('hh.list_page', page=page), track_upstream('hh_list') as call:
+                    response = self.session.get(
+                        f"{self.BASE_URL}/vacancies",
+                        params=params,
+                        timeout=15
+                    )
+                    call.status = response.status_code
                 
                 # Проверка статуса ответа
                 if response.status_code == 403:
@@ -119,6 +136,7 @@ class HHParser:
                     break
                 elif response.status_code == 429:
                     print("Слишком много запросов. Ожидание 60 секунд...")
+                    UPSTREAM_RETRIES.inc(upstream='hh_list')
                     time.sleep(60)
                     continue
                 
@@ -147,15 +165,21 @@ class HHParser:
                 else:
                     print(f"Обрабатываю страницу {current_page}...", end='\r')
                 
+                # Вакансии, которые уже есть в хранилище с той же датой публикации,
+                # не запрашиваем повторно - детали только для новых и перевыложенных
+                stored = self._stored_vacancies(data['items'])
+                reused += len(stored)
+                
                 # Получаем полную информацию о каждой вакансии (включая полное описание)
                 for item in data['items']:
                     vacancy_id = item['id']
-                    full_vacancy = self.get_vacancy_details(vacancy_id)
+                    full_vacancy = stored.get(str(vacancy_id)) or self.get_vacancy_details(vacancy_id)
                     if full_vacancy:
                         all_vacancies.append(full_vacancy)
                 
                 # Задержка между запросами
-                time.sleep(self.delay)
+                with span('hh.sleep'):
+                    time.sleep(self.delay)
                 
                 # Проверяем, есть ли еще страницы
                 pages = data.get('pages', 0)
@@ -178,9 +202,27 @@ class HHParser:
                 print(f"Ошибка при запросе: {e}")
                 break
         
+        if reused:
+            print(f"Из локального хранилища (без запроса деталей): {reused} из {len(all_vacancies)}")
+        
         return all_vacancies
     
+    def _stored_vacancies(self, items: List[Dict]) -> Dict[str, Dict]:
+        """Неизменившиеся вакансии страницы поиска из хранилища"""
+        if self.store is None:
+            return {}
+        try:
+            with span('store.lookup'):
+                stored = self.store.unchanged(items)
+        except sqlite3.Error as e:
+            print(f"⚠️ Хранилище вакансий недоступно: {e}")
+            return {}
+        for item in items:
+            cache_lookup('vacancy_store', str(item['id']) in stored)
+        return stored
     
+    
+    @traced('hh.detail')
     def get_vacancy_details(self, vacancy_id: str) -> Optional[Dict]:
         """
         Получение полной информации о вакансии (дополнительный запрос)
@@ -192,12 +234,15 @@ class HHParser:
             Словарь с данными вакансии или None при ошибке
         """
         try:
-            time.sleep(self.delay)  # Задержка перед запросом
+            with span('hh.sleep'):
+                time.sleep(self.delay)  # Задержка перед запросом
             
-            response = self.session.get(
-                f"{self.BASE_URL}/vacancies/{vacancy_id}",
-                timeout=15
-            )
+            with track_upstream('hh_detail') as call:
+                response = self.session.get(
+                    f"{self.BASE_URL}/vacancies/{vacancy_id}",
+                    timeout=15
+                )
+                call.status = response.status_code
             
             if response.status_code == 403:
                 print(f"Ошибка 403 при получении вакансии {vacancy_id}")
@@ -213,11 +258,14 @@ class HHParser:
             description = self._clean_html(data.get('description', ''))
             
             # Извлекаем нужные данные
+            employer = data.get('employer') or {}
             vacancy = {
                 'название': data.get('name', ''),
                 'описание': description,
                 'оплата': salary,
-                'компания': data.get('employer', {}).get('name', ''),
+                'компания': employer.get('name', ''),
+                'employer_id': employer.get('id', ''),
+                'area_id': (data.get('area') or {}).get('id', ''),
                 'ссылка': data.get('alternate_url', ''),
                 'id': vacancy_id,
                 'опыт': data.get('experience', {}).get('name', ''),
@@ -225,6 +273,12 @@ class HHParser:
                 'дата_публикации': data.get('published_at', '')
             }
             
+            if self.store is not None:
+                try:
+                    self.store.save(vacancy, data)
+                except sqlite3.Error as e:
+                    print(f"⚠️ Не удалось сохранить вакансию {vacancy_id} в хранилище: {e}")
+            
             return vacancy
             
         except requests.exceptions.RequestException as e:
@@ -296,6 +350,11 @@ class HHParser:
             json.dump(vacancies, f, ensure_ascii=False, indent=2)
         print(f"Сохранено {len(vacancies)} вакансий в {filename}")
     
+    def save_to_jsonl(self, vacancies: List[Dict], filename: str = 'vacancies.jsonl.gz'):
+        """Сохранение вакансий в JSONL (.jsonl или сжатый .jsonl.gz)"""
+        count = write_vacancies(filename, vacancies)
+        print(f"Сохранено {count} вакансий в {filename}")
+    
     def save_to_txt(self, vacancies: List[Dict], filename: str = 'vacancies.txt'):
         """Сохранение вакансий в текстовый файл"""
         with open(filename, 'w', encoding='utf-8') as f:
@@ -0,0 +1,159 @@
+"""
+ЗАПИСЬ И ВОСПРОИЗВЕДЕНИЕ HTTP-ОБМЕНОВ
+Адаптер для requests.Session: в режиме record реальные ответы HH.ru,
+2GIS и сайтов сохраняются в JSONL-файл, в режиме replay ответы берутся
+из файла без сети. Так парсер, движок контактов и парсер сайтов можно
+прогонять и измерять воспроизводимо.
+
+Включение через переменные окружения (подключается в HHParser,
+ContactsSearchEngine и WebsiteParser):
+    HTTP_FIXTURES=fixtures/hh_run.jsonl HTTP_MODE=record python test_api.py
+    HTTP_FIXTURES=fixtures/hh_run.jsonl HTTP_MODE=replay python test_api.py
+
+Асинхронная загрузка сайтов (aiohttp) адаптер не использует -
+для нее есть mock_upstreams.py.
+"""
+
+import base64
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+# Параметры с ключами API не пишутся в файл и не входят в ключ записи
+SECRET_PARAMS = {'key', 'api_key', 'access_token', 'token'}
+
+# Заголовки ответа, которые сохраняются
+KEPT_HEADERS = {'content-type', 'etag', 'last-modified', 'location', 'retry-after'}
+
+
+def normalize_url(url: str) -> str:
+    """URL без секретных параметров, с отсортированными параметрами запроса"""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter с записью (record) или воспроизведением (replay) ответов
+
+    В replay несколько записей одного запроса отдаются по очереди
+    (повторные запросы страницы - как при записи), последняя - повторяется.
+    Запрос без записи - requests.ConnectionError, как при недоступной сети.
+    """
+
+    def __init__(self, fixtures_file: str, mode: str = 'replay', **kwargs):
+        """
+        Args:
+            fixtures_file: JSONL-файл обменов
+            mode: 'record' или 'replay'
+            **kwargs: Параметры HTTPAdapter (pool_connections, pool_maxsize)
+        """
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Неизвестный режим записи HTTP: {mode}")
+
+        super().__init__(**kwargs)
+        self.fixtures_file = fixtures_file
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._served = defaultdict(int)
+        self.exchanges = self._load_fixtures() if mode == 'replay' else {}
+
+        self.stats = {'recorded': 0, 'replayed': 0, 'missing': 0}
+
+    def _load_fixtures(self) -> Dict[str, List[Dict]]:
+        """Записи из файла: ключ запроса -> ответы по порядку"""
+        exchanges = defaultdict(list)
+        try:
+            with open(self.fixtures_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        exchange = json.loads(line)
+                        exchanges[f"{exchange['method']} {exchange['url']}"].append(exchange)
+        except FileNotFoundError:
+            print(f"⚠️ Нет файла записей HTTP: {self.fixtures_file}")
+        return exchanges
+
+    def send(self, request, **kwargs):
+        key = f"{request.method} {normalize_url(request.url)}"
+
+        if self.mode == 'replay':
+            return self._replay(request, key)
+
+        response = super().send(request, **kwargs)
+        self._record(key, response)
+        return response
+
+    def _record(self, key: str, response: requests.Response):
+        """Дописать обмен в файл (тело читается целиком - stream для записи не важен)"""
+        body = response.content
+        try:
+            text, encoding = body.decode('utf-8'), 'utf-8'
+        except UnicodeDecodeError:
+            text, encoding = base64.b64encode(body).decode('ascii'), 'base64'
+
+        method, url = key.split(' ', 1)
+        exchange = {
+            'method': method,
+            'url': url,
+            'status': response.status_code,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS},
+            'encoding': encoding,
+            'body': text
+        }
+
+        with self._lock:
+            with open(self.fixtures_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(exchange, ensure_ascii=False) + '\n')
+            self.stats['recorded'] += 1
+
+    def _replay(self, request, key: str) -> requests.Response:
+        """Ответ из записи"""
+        with self._lock:
+            recorded = self.exchanges.get(key)
+            if not recorded:
+                self.stats['missing'] += 1
+                raise requests.ConnectionError(f"Нет записи для {key}", request=request)
+
+            index = min(self._served[key], len(recorded) - 1)
+            self._served[key] += 1
+            self.stats['replayed'] += 1
+
+        exchange = recorded[index]
+        body = exchange['body']
+        content = base64.b64decode(body) if exchange.get('encoding') == 'base64' else body.encode('utf-8')
+
+        response = requests.Response()
+        response.status_code = exchange['status']
+        response.headers = CaseInsensitiveDict(exchange.get('headers', {}))
+        response._content = content
+        response._content_consumed = True
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.reason = 'OK' if response.status_code < 400 else 'Error'
+        return response
+
+
+def install(session: requests.Session, fixtures_file: str, mode: str = 'replay', **adapter_kwargs) -> RecordingAdapter:
+    """Подключить запись/воспроизведение к сессии"""
+    adapter = RecordingAdapter(fixtures_file, mode, **adapter_kwargs)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return adapter
+
+
+def install_from_env(session: requests.Session, **adapter_kwargs) -> Optional[RecordingAdapter]:
+    """Подключить адаптер, если заданы HTTP_FIXTURES и HTTP_MODE"""
+    fixtures_file = os.getenv('HTTP_FIXTURES')
+    if not fixtures_file:
+        return None
+    return install(session, fixtures_file, os.getenv('HTTP_MODE', 'replay'), **adapter_kwargs)
@@ -5,16 +5,24 @@
 
 import json
 import csv
-from typing import Dict, List
+from typing import Dict, List, Optional
 from pathlib import Path
 from datetime import datetime
 
+from company_resolution import CompanyResolver
+
 
 class ContactsMerger:
     """Объединение контактов из разных источников"""
     
-    def __init__(self):
+    def __init__(self, fuzzy_threshold: Optional[float] = 0.75):
+        """
+        Args:
+            fuzzy_threshold: Порог сходства названий для объединения вариантов
+                             ("ГК Ромашка" = "Ромашка Групп"); None = точное совпадение
+        """
         self.merged_contacts = {}
+        self.resolver = CompanyResolver(fuzzy_threshold) if fuzzy_threshold else None
     
     def load_json(self, file_path: str) -> List[Dict]:
         """Загрузить контакты из JSON"""
@@ -85,7 +93,7 @@ class ContactsMerger:
         print("🔄 Объединение контактов из разных источников...")
         print()
         
-        all_contacts = {}
+        loaded = []
         
         for file_path in file_paths:
             if not Path(file_path).exists():
@@ -94,23 +102,33 @@ class ContactsMerger:
             
             print(f"📖 Загружаем: {file_path}")
             contacts_list = self.load_json(file_path)
-            
-            for contact in contacts_list:
-                company_name = contact.get('company_name', '').strip()
-                if not company_name:
-                    continue
-                
-                if company_name not in all_contacts:
-                    all_contacts[company_name] = contact
-                else:
-                    # Объединяем с существующими
-                    all_contacts[company_name] = self.merge_company_contacts(
-                        all_contacts[company_name],
-                        contact
-                    )
+            loaded.extend(contacts_list)
             
             print(f"   ✓ Загружено: {len(contacts_list)} компаний")
         
+        # Варианты написания одной компании сводятся к первому встреченному
+        names = [contact.get('company_name', '').strip() for contact in loaded]
+        company_keys = self.resolver.cluster(names) if self.resolver else {}
+        display_names = {}
+        
+        all_contacts = {}
+        
+        for company_name, contact in zip(names, loaded):
+            if not company_name:
+                continue
+            
+            key = company_keys.get(company_name) or company_name
+            company_name = display_names.setdefault(key, company_name)
+            
+            if company_name not in all_contacts:
+                all_contacts[company_name] = contact
+            else:
+                # Объединяем с существующими
+                all_contacts[company_name] = self.merge_company_contacts(
+                    all_contacts[company_name],
+                    contact
+                )
+        
         print()
         print(f"✅ Всего уникальных компаний: {len(all_contacts)}")
         
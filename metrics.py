@@ -0,0 +1,287 @@
+"""
+МЕТРИКИ В ТЕКСТОВОМ ФОРМАТЕ PROMETHEUS
+Счетчики, гистограммы и gauge без внешних зависимостей. API отдает их
+на GET /metrics: сколько запросов ушло в HH.ru, 2GIS и на сайты, сколько
+они длились, сколько было 429 и повторов, как работают кеши и сколько
+задач ждет в очередях.
+
+Использование:
+    with track_upstream('hh_detail') as call:
+        response = session.get(url)
+        call.status = response.status_code
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Границы гистограмм, секунды: от локального кеша до медленного сайта
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    """Экранирование значения метки"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    """Набор метрик, которые отдаются на /metrics"""
+
+    def __init__(self):
+        self.metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: '_Metric'):
+        with self._lock:
+            if any(m.name == metric.name for m in self.metrics):
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+            self.metrics.append(metric)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in list(self.metrics):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    """Общая часть: имя, описание, метки и значения по набору меток"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        unknown = set(labels) - set(self.labelnames)
+        if unknown:
+            raise ValueError(f"Неизвестные метки {self.name}: {', '.join(sorted(unknown))}")
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _labels(self, key: Tuple, extra: Tuple = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def _samples(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for key, value in sorted(self._samples().items()):
+            lines.append(f"{self.name}{self._labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Только растущий счетчик"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("Счетчик не может уменьшаться")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Текущее значение (глубина очереди, запросы в процессе)"""
+
+    kind = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._function = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._samples().get(self._key(labels), 0)
+
+    def set_function(self, function: Callable[[], Dict[Tuple, float]]):
+        """Значения вычисляются при каждом чтении: {(значения меток): число}"""
+        self._function = function
+
+    def _samples(self) -> Dict[Tuple, float]:
+        if self._function is not None:
+            return self._function()
+        return super()._samples()
+
+
+class Histogram(_Metric):
+    """Распределение длительностей по корзинам"""
+
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Замерить длительность блока"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+            return sum(counts)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            samples = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+        for key, (counts, total) in sorted(samples.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._labels(key, (('le', _format_value(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+# ================================================================
+# МЕТРИКИ ПРОЕКТА
+# ================================================================
+
+UPSTREAM_REQUESTS = Counter(
+    'hh_upstream_requests_total', 'Запросы к внешним сервисам по статусу ответа', ('upstream', 'status')
+)
+UPSTREAM_LATENCY = Histogram(
+    'hh_upstream_request_seconds', 'Длительность запроса к внешнему сервису', ('upstream',)
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    'hh_upstream_in_flight', 'Запросы к внешнему сервису, ожидающие ответа', ('upstream',)
+)
+UPSTREAM_RATE_LIMITED = Counter(
+    'hh_upstream_rate_limited_total', 'Ответы 429 от внешних сервисов', ('upstream',)
+)
+UPSTREAM_RETRIES = Counter(
+    'hh_upstream_retries_total', 'Повторные запросы к внешним сервисам', ('upstream',)
+)
+
+CACHE_LOOKUPS = Counter(
+    'hh_cache_lookups_total', 'Обращения к кешам (result = hit или miss)', ('cache', 'result')
+)
+CACHE_HIT_RATIO = Gauge(
+    'hh_cache_hit_ratio', 'Доля попаданий в кеш с начала работы процесса', ('cache',)
+)
+
+QUEUE_DEPTH = Gauge(
+    'hh_queue_depth', 'Задачи, ожидающие обработки', ('queue',)
+)
+
+API_REQUESTS = Counter(
+    'hh_api_requests_total', 'Запросы к API', ('method', 'endpoint', 'status')
+)
+API_LATENCY = Histogram(
+    'hh_api_request_seconds', 'Длительность обработки запроса к API', ('method', 'endpoint')
+)
+API_IN_PROGRESS = Gauge(
+    'hh_api_requests_in_progress', 'Запросы к API в обработке', ('method',)
+)
+
+
+def _cache_hit_ratios() -> Dict[Tuple, float]:
+    """hits / (hits + misses) по каждому кешу"""
+    totals = {}
+    for (cache, result), count in CACHE_LOOKUPS._samples().items():
+        hits, lookups = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (count if result == 'hit' else 0), lookups + count)
+    return {(cache,): hits / lookups for cache, (hits, lookups) in totals.items() if lookups}
+
+
+CACHE_HIT_RATIO.set_function(_cache_hit_ratios)
+
+
+def cache_lookup(cache: str, hit: bool):
+    """Учесть обращение к кешу"""
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+class _UpstreamCall:
+    """Статус ответа для track_upstream ('error', если ответа не было)"""
+
+    def __init__(self):
+        self.status = 'error'
+
+
+@contextmanager
+def track_upstream(upstream: str):
+    """
+    Замерить запрос к внешнему сервису
+
+    Считает запрос по статусу, длительность, запросы в процессе и 429.
+    Статус выставляется внутри блока: call.status = response.status_code
+    """
+    call = _UpstreamCall()
+    UPSTREAM_IN_FLIGHT.inc(upstream=upstream)
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        UPSTREAM_IN_FLIGHT.dec(upstream=upstream)
+        UPSTREAM_LATENCY.observe(time.perf_counter() - start, upstream=upstream)
+        UPSTREAM_REQUESTS.inc(upstream=upstream, status=call.status)
+        if call.status == 429:
+            UPSTREAM_RATE_LIMITED.inc(upstream=upstream)
@@ -0,0 +1,331 @@
+"""
+ЛОКАЛЬНЫЙ СЕРВЕР-ИМИТАЦИЯ HH.ru, 2GIS И САЙТОВ КОМПАНИЙ
+Отдает детерминированные ответы в форме настоящих API: поиск и детали
+вакансий, работодатели, организации 2GIS, сайты со страницей контактов.
+Задержка и доля 429 настраиваются - парсер, движок контактов и парсер
+сайтов можно прогонять и измерять без сети и без квоты.
+
+Маршруты:
+    GET /vacancies                   - поиск (page, per_page; found/pages/items)
+    GET /vacancies/{id}              - детали вакансии
+    GET /employers/{id}              - работодатель (site_url ведет на /sites/...)
+    GET /3.0/items                   - поиск организаций 2GIS (q, page_size)
+    GET /sites/{slug}/               - главная страница сайта
+    GET /sites/{slug}/kontakty/      - страница контактов (Telegram, WhatsApp, телефон, email)
+
+Использование:
+    python mock_upstreams.py --port 8790 --vacancies 500 --latency 0.02
+
+    $env:HH_API_URL="http://127.0.0.1:8790"
+    $env:DGIS_API_URL="http://127.0.0.1:8790"
+    python test_api.py
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+
+TITLES = [
+    'Менеджер по продажам', 'Оператор call-центра', 'Бухгалтер', 'Специалист по документообороту',
+    'Администратор', 'Логист', 'Менеджер по работе с клиентами', 'Офис-менеджер'
+]
+COMPANIES = ['Ромашка', 'Техпром', 'Логистик Групп', 'Северный ветер', 'Альфа Сервис', 'СтройМаркет']
+CITIES = ['Москва', 'Санкт-Петербург', 'Казань', 'Новосибирск']
+
+DESCRIPTION = (
+    "<p><strong>Обязанности:</strong></p><ul>"
+    "<li>обработка входящих заявок и звонков клиентов</li>"
+    "<li>ведение базы в 1С и CRM, подготовка документов</li>"
+    "<li>еженедельная отчетность в Excel</li></ul>"
+    "<p><strong>Требования:</strong></p><ul><li>опыт работы от {years} лет</li>"
+    "<li>грамотная речь</li></ul>"
+    "<p><strong>Условия:</strong></p><ul><li>оформление по ТК РФ</li>"
+    "<li>офис в {city}</li></ul><p>Пишите: hr@{slug}.ru</p>"
+)
+
+
+class MockUpstreamsServer(ThreadingHTTPServer):
+    """HTTP-сервер с данными и настройками имитации"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        vacancies: int = 200,
+        employers: int = 50,
+        latency: float = 0.0,
+        rate_429: float = 0.0,
+        seed: int = 42
+    ):
+        """
+        Args:
+            address: (хост, порт)
+            vacancies: Сколько вакансий отдает поиск
+            employers: Сколько разных работодателей
+            latency: Задержка ответа, секунд (+-30%)
+            rate_429: Доля ответов 429 с Retry-After
+            seed: Зерно генератора данных
+        """
+        super().__init__(address, MockUpstreamsHandler)
+        self.vacancies = vacancies
+        self.employers = max(1, employers)
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.seed = seed
+        self.base_url = f"http://{address[0]}:{self.server_address[1]}"
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'rate_limited': 0, 'not_modified': 0}
+
+    def _random(self, key) -> random.Random:
+        """Генератор, зависящий только от seed и ключа - ответы одинаковы между запусками"""
+        return random.Random(f"{self.seed}:{key}")
+
+    def employer(self, employer_id: int) -> Dict:
+        """Работодатель в форме /employers/{id}"""
+        rnd = self._random(f"employer:{employer_id}")
+        slug = f"company{employer_id}"
+        name = f"ООО {rnd.choice(COMPANIES)} {employer_id}"
+        return {
+            'id': str(employer_id),
+            'name': name,
+            'alternate_url': f"https://hh.ru/employer/{employer_id}",
+            'site_url': f"{self.base_url}/sites/{slug}/",
+            'description': f"<p>{name} - надежный работодатель. Телефон: +7 (495) {rnd.randint(100, 999)}-{rnd.randint(10, 99)}-{rnd.randint(10, 99)}</p>",
+            'area': {'id': '1', 'name': rnd.choice(CITIES)}
+        }
+
+    def vacancy(self, vacancy_id: int) -> Dict:
+        """Вакансия в форме /vacancies/{id}"""
+        rnd = self._random(f"vacancy:{vacancy_id}")
+        employer_id = 1000 + vacancy_id % self.employers
+        employer = self.employer(employer_id)
+        salary_from = rnd.choice([None, 50_000, 60_000, 80_000])
+        return {
+            'id': str(vacancy_id),
+            'name': rnd.choice(TITLES),
+            'description': DESCRIPTION.format(
+                years=rnd.randint(1, 3), city=employer['area']['name'], slug=f"company{employer_id}"
+            ),
+            'salary': {'from': salary_from, 'to': salary_from + 30_000, 'currency': 'RUR', 'gross': False}
+            if salary_from else None,
+            'employer': {key: employer[key] for key in ('id', 'name', 'alternate_url')},
+            'area': employer['area'],
+            'alternate_url': f"https://hh.ru/vacancy/{vacancy_id}",
+            'experience': {'id': 'between1And3', 'name': 'От 1 года до 3 лет'},
+            'employment': {'id': 'full', 'name': 'Полная занятость'},
+            'published_at': f"2025-12-{rnd.randint(1, 28):02d}T10:00:00+0300",
+            'address': None
+        }
+
+    def search(self, page: int, per_page: int) -> Dict:
+        """Страница поиска; как HH.ru, не глубже 2000 результатов"""
+        per_page = max(1, min(per_page, 100))
+        available = min(self.vacancies, 2000)
+        start = page * per_page
+        items = []
+        for index in range(start, min(start + per_page, available)):
+            vacancy = self.vacancy(100_000_000 + index)
+            items.append({
+                key: vacancy[key] for key in ('id', 'name', 'salary', 'employer', 'area', 'alternate_url', 'published_at')
+            })
+        return {
+            'found': self.vacancies,
+            'pages': -(-available // per_page),
+            'page': page,
+            'per_page': per_page,
+            'items': items
+        }
+
+    def organizations(self, query: str, page_size: int) -> Dict:
+        """Ответ 2GIS /3.0/items: филиалы организации с контактами"""
+        match = re.search(r'(\d+)', query)
+        employer_id = int(match.group(1)) if match else sum(query.encode('utf-8')) % self.employers + 1000
+        employer = self.employer(employer_id)
+        rnd = self._random(f"2gis:{employer_id}")
+
+        items = []
+        for branch in range(min(page_size, rnd.randint(1, 3))):
+            items.append({
+                'id': f"{employer_id}{branch:03d}",
+                'type': 'branch',
+                'name': employer['name'],
+                'name_ex': {'primary': employer['name']},
+                'org': {'id': str(employer_id), 'name': employer['name']},
+                'address_name': f"ул. Ленина, {rnd.randint(1, 120)}",
+                'contact_groups': [{'contacts': [
+                    {'type': 'phone', 'text': f"+7 (495) {rnd.randint(100, 999)}-{rnd.randint(10, 99)}-{rnd.randint(10, 99)}"},
+                    {'type': 'email', 'text': f"info@company{employer_id}.ru"},
+                    {'type': 'website', 'url': employer['site_url']}
+                ]}]
+            })
+        return {'meta': {'code': 200}, 'result': {'total': len(items), 'items': items}}
+
+    def site_page(self, slug: str, page: str) -> Optional[str]:
+        """HTML главной страницы или страницы контактов"""
+        match = re.fullmatch(r'company(\d+)', slug)
+        if not match:
+            return None
+        employer_id = int(match.group(1))
+        name = self.employer(employer_id)['name']
+
+        if page == '':
+            return (
+                f"<html><head><title>{name}</title></head><body><h1>{name}</h1>"
+                f"<p>Мы работаем с 2010 года.</p>"
+                f"<a href=\"/sites/{slug}/kontakty/\">Контакты</a> <a href=\"/sites/{slug}/price.pdf\">Прайс</a>"
+                f"</body></html>"
+            )
+        if page == 'kontakty':
+            rnd = self._random(f"site:{employer_id}")
+            phone = f"+7 (495) {rnd.randint(100, 999)}-{rnd.randint(10, 99)}-{rnd.randint(10, 99)}"
+            return (
+                f"<html><body><h1>Контакты</h1>"
+                f"<a href=\"https://t.me/company{employer_id}\">Telegram</a> "
+                f"<a href=\"https://wa.me/7495{rnd.randint(1_000_000, 9_999_999)}\">WhatsApp</a> "
+                f"<a href=\"tel:{phone}\">{phone}</a> "
+                f"<a href=\"mailto:sales@company{employer_id}.ru\">sales@company{employer_id}.ru</a>"
+                f"</body></html>"
+            )
+        return None
+
+    def rate_limited(self) -> bool:
+        """Посчитать запрос и решить, отвечать ли 429"""
+        with self.lock:
+            self.stats['requests'] += 1
+            if random.random() < self.rate_429:
+                self.stats['rate_limited'] += 1
+                return True
+            return False
+
+
+class MockUpstreamsHandler(BaseHTTPRequestHandler):
+    """Обработчик маршрутов HH.ru, 2GIS и сайтов"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Dict = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data: Dict, headers: Dict = None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self._send(status, body, 'application/json; charset=utf-8', headers)
+
+    def _send_html(self, html: str):
+        """HTML с ETag; при совпадении If-None-Match - 304"""
+        body = html.encode('utf-8')
+        etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.server.stats['not_modified'] += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self._send(200, body, 'text/html; charset=utf-8', {'ETag': etag})
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        path = parts.path
+
+        if server.rate_limited():
+            self._send_json(429, {'errors': [{'type': 'too_many_requests'}]}, {'Retry-After': '1'})
+            return
+
+        if server.latency:
+            time.sleep(server.latency * random.uniform(0.7, 1.3))
+
+        if path == '/vacancies':
+            self._send_json(200, server.search(int(query.get('page', 0)), int(query.get('per_page', 20))))
+            return
+
+        match = re.fullmatch(r'/vacancies/(\d+)', path)
+        if match:
+            vacancy_id = int(match.group(1))
+            if vacancy_id - 100_000_000 >= server.vacancies or vacancy_id < 100_000_000:
+                self._send_json(404, {'errors': [{'type': 'not_found'}]})
+            else:
+                self._send_json(200, server.vacancy(vacancy_id))
+            return
+
+        match = re.fullmatch(r'/employers/(\d+)', path)
+        if match:
+            self._send_json(200, server.employer(int(match.group(1))))
+            return
+
+        if path == '/3.0/items':
+            self._send_json(200, server.organizations(query.get('q', ''), int(query.get('page_size', 10))))
+            return
+
+        match = re.fullmatch(r'/sites/([\w-]+)/(?:([\w-]+)/?)?', path)
+        if match:
+            html = server.site_page(match.group(1), match.group(2) or '')
+            if html is not None:
+                self._send_html(html)
+                return
+
+        self._send(404, b'<html><body>Not found</body></html>', 'text/html; charset=utf-8')
+
+
+def start_mock_upstreams(
+    port: int = 0,
+    vacancies: int = 200,
+    employers: int = 50,
+    latency: float = 0.0,
+    rate_429: float = 0.0,
+    seed: int = 42
+) -> Tuple[MockUpstreamsServer, str]:
+    """
+    Запустить сервер в фоновом потоке
+
+    Returns:
+        (server, base_url) - base_url подходит для HH_API_URL и DGIS_API_URL
+    """
+    server = MockUpstreamsServer(('127.0.0.1', port), vacancies, employers, latency, rate_429, seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.base_url
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Локальная имитация HH.ru, 2GIS и сайтов компаний")
+    arg_parser.add_argument('--port', type=int, default=8790, help="Порт")
+    arg_parser.add_argument('--vacancies', type=int, default=200, help="Вакансий в поиске")
+    arg_parser.add_argument('--employers', type=int, default=50, help="Разных работодателей")
+    arg_parser.add_argument('--latency', type=float, default=0.0, help="Задержка ответа, секунд")
+    arg_parser.add_argument('--rate-429', type=float, default=0.0, help="Доля ответов 429")
+    arg_parser.add_argument('--seed', type=int, default=42, help="Зерно генератора данных")
+    args = arg_parser.parse_args()
+
+    server = MockUpstreamsServer(
+        ('127.0.0.1', args.port), args.vacancies, args.employers, args.latency, args.rate_429, args.seed
+    )
+    print(f"🧪 Имитация HH.ru / 2GIS / сайтов: {server.base_url} "
+          f"({args.vacancies} вакансий, задержка {args.latency} с, 429 {args.rate_429:.0%})")
+    print(f"   HH_API_URL={server.base_url}")
+    print(f"   DGIS_API_URL={server.base_url}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 Запросов: {server.stats['requests']}, 429: {server.stats['rate_limited']}, "
+              f"304: {server.stats['not_modified']}")
+
+
+if __name__ == "__main__":
+    main()
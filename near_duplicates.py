@@ -0,0 +1,247 @@
+"""
+ПОИСК ПОЧТИ ОДИНАКОВЫХ ВАКАНСИЙ (MinHash + LSH)
+Агентства публикуют один текст от разных работодателей, сети - одно
+описание на каждый филиал. Дедупликация по компании такие копии не видит.
+
+Описание режется на шинглы (тройки слов), по ним строится MinHash-подпись,
+подписи раскладываются по LSH-корзинам. Сравниваются только вакансии из
+одной корзины, поэтому время растет почти линейно, а не квадратично.
+"""
+
+import operator
+import re
+import zlib
+from array import array
+from collections import defaultdict
+from itertools import repeat
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+
+DEFAULT_THRESHOLD = 0.8
+
+WORD_PATTERN = re.compile(r'\w+')
+
+MASK_64 = 0xFFFFFFFFFFFFFFFF
+MASK_32 = 0xFFFFFFFF
+EMPTY = MASK_32  # пустая ячейка подписи
+
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Подобрать число LSH-полос и строк в полосе
+
+    Порог срабатывания LSH примерно (1/bands)^(1/rows). Берется вариант
+    с порогом не выше заданного (чтобы не терять пары), ближайший к нему.
+    Кандидаты затем проверяются по подписи.
+    """
+    options = [
+        (num_perm // rows, rows)
+        for rows in range(1, num_perm + 1)
+        if num_perm % rows == 0
+    ]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= threshold]
+    return max(below or options[:1], key=lambda br: (1 / br[0]) ** (1 / br[1]))
+
+
+class NearDuplicateDetector:
+    """
+    Кластеры почти одинаковых текстов
+
+    Подпись - one-permutation MinHash: хеш шингла выбирает ячейку подписи,
+    в ячейке хранится минимум. Одна проверка на шингл вместо num_perm
+    (пустые ячейки заполняются из соседних). В памяти - только подписи
+    (num_perm * 4 байта на текст), тексты не хранятся.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = 128, shingle_size: int = 3):
+        """
+        Args:
+            threshold: Порог сходства Жаккара по шинглам (0.8 = 80% общих троек слов)
+            num_perm: Длина подписи
+            shingle_size: Слов в шингле
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+
+        self.keys = []
+        self.scores = []
+        self.signatures = []
+        self.buckets = [defaultdict(list) for _ in range(self.bands)]
+
+    def signature(self, text: str) -> Optional[array]:
+        """MinHash-подпись текста (None для пустого текста)"""
+        words = WORD_PATTERN.findall(text.lower()) if text else []
+        if not words:
+            return None
+
+        # Хеш шингла - хеш кортежа хешей слов (для кортежа int он не зависит
+        # от PYTHONHASHSEED). Все шаги - map/zip/sorted без цикла на Python.
+        word_hashes = list(map(zlib.crc32, map(str.encode, words)))
+        size = min(self.shingle_size, len(words))
+        shingles = zip(*(word_hashes[i:] for i in range(size)))
+        hashes = list(map(MASK_64.__and__, map(hash, shingles)))
+
+        # Ключ = ячейка << 32 | значение: сортировка чисел быстрее кортежей
+        num_perm = self.num_perm
+        cells = map(operator.lshift, map(num_perm.__rmod__, hashes), repeat(32))
+        values = map(MASK_32.__and__, map(operator.rshift, hashes, repeat(16)))
+        keys = sorted(map(operator.or_, cells, values), reverse=True)
+
+        # По убыванию значения: в словаре для ячейки останется минимум
+        minimums = dict(zip(
+            map(operator.rshift, keys, repeat(32)),
+            map(MASK_32.__and__, keys)
+        ))
+        signature = array('I', map(minimums.get, range(num_perm), repeat(EMPTY)))
+
+        # Пустые ячейки берут значение ближайшей заполненной справа
+        # (по кругу) со сдвигом на расстояние - densification
+        if EMPTY in signature:
+            source = next(i for i in range(num_perm) if signature[i] != EMPTY) + num_perm
+            for i in range(num_perm - 1, -1, -1):
+                if signature[i] != EMPTY:
+                    source = i
+                else:
+                    signature[i] = signature[source % num_perm] ^ (source - i)
+
+        return signature
+
+    def add(self, key: Hashable, text: str, score: float = 0):
+        """
+        Добавить текст
+
+        Args:
+            key: Идентификатор (индекс, id вакансии, положение в файле)
+            text: Текст для сравнения
+            score: Оценка - в кластере остается текст с наибольшей
+        """
+        self.add_signature(key, self.signature(text), score)
+
+    def add_signature(self, key: Hashable, signature: Optional[array], score: float = 0):
+        """Добавить готовую подпись (например, посчитанную в другом процессе)"""
+        if signature is None:
+            return
+
+        index = len(self.keys)
+        self.keys.append(key)
+        self.scores.append(score)
+        self.signatures.append(signature)
+
+        rows = self.rows
+        for band in range(self.bands):
+            self.buckets[band][signature[band * rows:(band + 1) * rows].tobytes()].append(index)
+
+    def similarity(self, a: int, b: int) -> float:
+        """Оценка сходства Жаккара по подписям"""
+        sig_a = self.signatures[a]
+        sig_b = self.signatures[b]
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / self.num_perm
+
+    def clusters(self) -> List[List[Hashable]]:
+        """
+        Кластеры из 2+ похожих текстов
+
+        В каждой корзине тексты сравниваются с первым текстом корзины
+        (а не попарно), поэтому большая корзина одинаковых текстов
+        не дает квадратичного числа сравнений.
+        """
+        parent = list(range(len(self.keys)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for buckets in self.buckets:
+            for members in buckets.values():
+                if len(members) < 2:
+                    continue
+                head = members[0]
+                for other in members[1:]:
+                    root_head, root_other = find(head), find(other)
+                    if root_head != root_other and self.similarity(head, other) >= self.threshold:
+                        parent[root_other] = root_head
+
+        groups = defaultdict(list)
+        for i in range(len(self.keys)):
+            groups[find(i)].append(i)
+
+        return [
+            [self.keys[i] for i in members]
+            for members in groups.values()
+            if len(members) > 1
+        ]
+
+    def duplicates(self) -> Dict[Hashable, Hashable]:
+        """
+        Что удалить
+
+        Returns:
+            {ключ копии: ключ оставленного текста}; в кластере остается
+            текст с наибольшей оценкой, при равенстве - добавленный первым
+        """
+        position = {key: i for i, key in enumerate(self.keys)}
+        removed = {}
+
+        for cluster in self.clusters():
+            best = max(cluster, key=lambda key: (self.scores[position[key]], -position[key]))
+            for key in cluster:
+                if key != best:
+                    removed[key] = best
+
+        return removed
+
+
+def remove_near_duplicates(
+    vacancies: List[Dict],
+    threshold: float = DEFAULT_THRESHOLD,
+    score_fn: Optional[Callable[[Dict], float]] = None,
+    field: str = 'описание'
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Удалить вакансии с почти одинаковым описанием
+
+    Args:
+        vacancies: Вакансии
+        threshold: Порог сходства Жаккара
+        score_fn: Оценка вакансии (остается лучшая в кластере), по умолчанию первая
+        field: Поле с текстом
+
+    Returns:
+        (kept_vacancies, removed_duplicates) - kept в исходном порядке
+    """
+    detector = NearDuplicateDetector(threshold)
+
+    for i, vacancy in enumerate(vacancies):
+        detector.add(i, vacancy.get(field, ''), score_fn(vacancy) if score_fn else 0)
+
+    duplicates = detector.duplicates()
+    if not duplicates:
+        return list(vacancies), []
+
+    copies = defaultdict(int)
+    for kept_index in duplicates.values():
+        copies[kept_index] += 1
+
+    kept = []
+    removed = []
+
+    for i, vacancy in enumerate(vacancies):
+        if i not in duplicates:
+            if copies[i]:
+                vacancy['_near_duplicates_count'] = copies[i]
+            kept.append(vacancy)
+            continue
+
+        best = vacancies[duplicates[i]]
+        removed.append({
+            'vacancy': vacancy,
+            'reason': f"Почти одинаковое описание с вакансией '{best.get('название', '')}' ({best.get('компания', '')})",
+            'kept_vacancy_id': best.get('id', ''),
+            'kept_vacancy_title': best.get('название', '')
+        })
+
+    return kept, removed
@@ -0,0 +1,154 @@
+"""
+ЛОКАЛЬНЫЙ ИНДЕКС ОРГАНИЗАЦИЙ 2GIS
+Сохраняет ВСЕ организации из ответов 2GIS, а не только первую.
+Повторные поиски (филиалы, дочерние компании) отвечаются из индекса
+без платного запроса.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+from pathlib import Path
+
+from company_resolution import company_key
+
+
+def normalize_org_name(name: str) -> str:
+    """
+    Нормализация названия организации для индекса
+
+    Та же, что при дедупликации (см. company_resolution.company_key):
+    без ОПФ, "группа компаний", кавычек и пунктуации.
+    Часть после запятой (рубрика 2GIS: "Яндекс, IT-компания") отбрасывается.
+    """
+    if not name:
+        return ""
+    return company_key(name.split(',')[0])
+
+
+class OrgIndex:
+    """Индекс организаций 2GIS: (регион, нормализованное название) -> организация"""
+
+    def __init__(self, index_file: str = "2gis_org_index.json"):
+        """
+        Args:
+            index_file: Файл для хранения индекса
+        """
+        self.index_file = index_file
+        self.items = self._load_index()
+        self.names = {}
+        for item_id, item in self.items.items():
+            self._index_item(item_id, item)
+
+        self.stats = {
+            'lookups': 0,
+            'hits': 0,
+            'items_added': 0
+        }
+
+    def _load_index(self) -> Dict:
+        """Загрузить индекс из файла"""
+        try:
+            if Path(self.index_file).exists():
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки индекса 2GIS: {e}")
+        return {}
+
+    def save(self):
+        """Сохранить индекс (атомарно, через временный файл)"""
+        try:
+            tmp_file = f"{self.index_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.items, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+        except Exception as e:
+            print(f"⚠️ Ошибка сохранения индекса 2GIS: {e}")
+
+    def _index_item(self, item_id: str, item: Dict):
+        """Добавить организацию в индекс названий"""
+        for name in {item.get('name', ''), item.get('primary_name', ''), item.get('org_name', '')}:
+            normalized = normalize_org_name(name)
+            if normalized:
+                key = f"{item.get('region_id', '')}:{normalized}"
+                ids = self.names.setdefault(key, [])
+                if item_id not in ids:
+                    ids.append(item_id)
+
+    def add_items(self, items: List[Dict], region_id: int) -> int:
+        """
+        Добавить все организации из ответа 2GIS
+
+        Args:
+            items: result.items из ответа /3.0/items
+            region_id: Регион запроса
+
+        Returns:
+            Сколько организаций добавлено
+        """
+        added = 0
+
+        for item in items:
+            item_id = str(item.get('id', ''))
+            if not item_id or item.get('type', 'branch') != 'branch':
+                continue
+
+            stored = {
+                'id': item_id,
+                'region_id': region_id,
+                'name': item.get('name', ''),
+                'primary_name': (item.get('name_ex') or {}).get('primary', ''),
+                'org_name': (item.get('org') or {}).get('name', ''),
+                'address_name': item.get('address_name', ''),
+                'contact_groups': item.get('contact_groups', [])
+            }
+
+            if item_id not in self.items:
+                added += 1
+            self.items[item_id] = stored
+            self._index_item(item_id, stored)
+
+        if added:
+            self.stats['items_added'] += added
+            self.save()
+
+        return added
+
+    def lookup(self, company_name: str, region_id: int) -> Optional[Dict]:
+        """
+        Найти организацию в индексе по точному нормализованному названию
+
+        Из нескольких филиалов выбирается тот, у которого больше контактов.
+
+        Returns:
+            Организация в формате item 2GIS или None
+        """
+        self.stats['lookups'] += 1
+
+        normalized = normalize_org_name(company_name)
+        if not normalized:
+            return None
+
+        ids = self.names.get(f"{region_id}:{normalized}", [])
+        candidates = [self.items[i] for i in ids if i in self.items]
+
+        if not candidates:
+            return None
+
+        self.stats['hits'] += 1
+
+        return max(
+            candidates,
+            key=lambda item: sum(
+                len(group.get('contacts', []))
+                for group in item.get('contact_groups', [])
+            )
+        )
+
+    def get_stats(self) -> Dict:
+        """Статистика индекса"""
+        return {
+            **self.stats,
+            'size': len(self.items)
+        }
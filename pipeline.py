@@ -0,0 +1,340 @@
+"""
+ПАЙПЛАЙН ОБРАБОТКИ ВАКАНСИЙ ОДНОЙ КОМАНДОЙ
+разбивка -> фильтр продажников -> нежелательные вакансии -> дедупликация
+
+Вместо цепочки split_to_batches.py / filter_and_rank_vacancies.py /
+filter_unwanted_vacancies.py / deduplicate_companies.py с промежуточными
+файлами: вакансии режутся на куски в памяти, фильтры идут параллельно
+в пуле процессов (по процессу на ядро), дедупликация по компаниям и
+почти одинаковым описаниям - в основном процессе по всему набору сразу.
+На диск пишутся только итоговые файлы для process_vacancies_with_gpt.py.
+
+Использование:
+    python pipeline.py                                   # vacancies_all.json -> filtered_batches
+    python pipeline.py --input vacancy_batches --workers 4
+    python pipeline.py --near-duplicates 0 --fuzzy 0     # без нечетких сравнений
+    python pipeline.py --rank                            # + ранжирование GPT (параллельно)
+    python pipeline.py --input vacancies_all.jsonl.gz --format .jsonl.gz
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from filter_and_rank_vacancies import analyze_vacancy, should_exclude_vacancy, calculate_pre_score
+from filter_unwanted_vacancies import UnwantedVacanciesFilter
+from deduplicate_companies import CompanyDeduplicator, CompanyIndex
+from near_duplicates import NearDuplicateDetector
+from corpus_io import CORPUS_SUFFIXES, find_batches, read_vacancies, write_vacancies
+
+
+# Состояние процесса-воркера (создается один раз в initializer)
+_unwanted_filter = None
+_scorer = None
+_detector = None
+
+
+def _init_worker(near_duplicate_threshold: Optional[float]):
+    """Собрать фильтры один раз на процесс, а не на каждый кусок"""
+    global _unwanted_filter, _scorer, _detector
+    _unwanted_filter = UnwantedVacanciesFilter()
+    _scorer = CompanyDeduplicator(fuzzy_threshold=None)
+    _detector = NearDuplicateDetector(near_duplicate_threshold) if near_duplicate_threshold else None
+
+
+def _filter_chunk(chunk: List[Dict]) -> Dict:
+    """
+    Фильтры для куска вакансий (выполняется в воркере)
+
+    Returns:
+        {'kept': [(вакансия, оценка, MinHash-подпись)], 'excluded': [...],
+         'unwanted': [...], 'reasons': {категория: количество}}
+    """
+    kept = []
+    excluded = []
+    passed = []
+
+    # Фильтр продажников + предварительная оценка
+    for vacancy in chunk:
+        counts = analyze_vacancy(vacancy)
+        should_exclude, reason = should_exclude_vacancy(vacancy, counts)
+
+        if should_exclude:
+            excluded.append({
+                'vacancy': vacancy,
+                'reason': reason,
+                'auto_score': 0,
+                'auto_category': 'Низкий потенциал (автофильтр)',
+            })
+        else:
+            vacancy['_pre_score'] = calculate_pre_score(vacancy, counts)
+            passed.append(vacancy)
+
+    # Нежелательные вакансии (агенты, брокеры, продажи)
+    _unwanted_filter.stats['reasons'] = {}
+    passed, unwanted = _unwanted_filter.filter_batch(passed)
+
+    # Оценка для дедупликации и подпись описания считаются здесь,
+    # чтобы основной процесс только сравнивал
+    for vacancy in passed:
+        signature = _detector.signature(vacancy.get('описание', '')) if _detector else None
+        kept.append((vacancy, _scorer.calculate_vacancy_score(vacancy), signature))
+
+    return {
+        'kept': kept,
+        'excluded': excluded,
+        'unwanted': unwanted,
+        'reasons': dict(_unwanted_filter.stats['reasons'])
+    }
+
+
+def load_vacancies(input_path: str) -> List[Dict]:
+    """Вакансии из файла (.json, .jsonl, .jsonl.gz) или из директории с batch_*"""
+    path = Path(input_path)
+
+    if path.is_dir():
+        vacancies = []
+        for batch_file in find_batches(path, 'batch'):
+            vacancies.extend(read_vacancies(batch_file))
+        return vacancies
+
+    return read_vacancies(path)
+
+
+def deduplicate(
+    kept: List[tuple],
+    near_duplicate_threshold: Optional[float],
+    fuzzy_threshold: Optional[float]
+) -> tuple:
+    """
+    Дедупликация по компаниям и почти одинаковым описаниям по всему набору
+
+    Args:
+        kept: [(вакансия, оценка, подпись)] в исходном порядке
+
+    Returns:
+        (оставленные вакансии, удаленные записи, уникальных компаний, почти одинаковых удалено)
+    """
+    deduplicator = CompanyDeduplicator(fuzzy_threshold=fuzzy_threshold)
+    deduplicator.resolve_companies(sorted({v.get('компания', '') for v, _, _ in kept}))
+
+    # Лучшая вакансия компании - тем же индексом, что и deduplicate_companies.py
+    # (весь набор - один "файл", позиция - номер вакансии)
+    index = CompanyIndex()
+    try:
+        for i, (vacancy, score, _) in enumerate(kept):
+            deduplicator.offer_vacancy(index, vacancy, (0, i), score)
+        unique_companies = len(index)
+
+        best = {}
+        removed = {}
+        for i, (vacancy, _, _) in enumerate(kept):
+            best[i], entry = deduplicator.company_duplicate(index, vacancy, (0, i))
+            if entry is not None:
+                removed[i] = entry
+    finally:
+        index.close()
+
+    # Один текст под разными работодателями - среди оставшихся
+    near_removed = 0
+    if near_duplicate_threshold:
+        detector = NearDuplicateDetector(near_duplicate_threshold)
+        for i, (_, score, signature) in enumerate(kept):
+            if i not in removed:
+                detector.add_signature(i, signature, score)
+
+        for i, kept_index in detector.duplicates().items():
+            kept_vacancy = kept[kept_index][0]
+            removed[i] = {
+                'vacancy': kept[i][0],
+                'reason': f"Почти одинаковое описание с вакансией '{kept_vacancy.get('название', '')}' ({kept_vacancy.get('компания', '')})",
+                'kept_vacancy_id': kept_vacancy.get('id', ''),
+                'kept_vacancy_title': kept_vacancy.get('название', '')
+            }
+            near_removed += 1
+
+    result = []
+    for i, (vacancy, _, _) in enumerate(kept):
+        if i in removed:
+            continue
+        deduplicator.mark_duplicates(vacancy, best[i])
+        result.append(vacancy)
+
+    return result, [removed[i] for i in sorted(removed)], unique_companies, near_removed
+
+
+def _write_json(path: Path, data):
+    """Записать итоговый файл (атомарно, через временный файл)"""
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, path)
+
+
+def run_pipeline(
+    input_path: str = "vacancies_all.json",
+    output_dir: str = "filtered_batches",
+    batch_size: int = 50,
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+    near_duplicate_threshold: Optional[float] = 0.8,
+    fuzzy_threshold: Optional[float] = 0.75,
+    batch_format: str = '.json'
+) -> Dict:
+    """
+    Полный офлайн-прогон без вопросов в консоли
+
+    Args:
+        input_path: Файл со всеми вакансиями (.json, .jsonl, .jsonl.gz) или директория с batch_*
+        output_dir: Куда писать filtered_batch_XXXX и отчеты
+        batch_size: Вакансий в итоговом батче (для GPT)
+        workers: Процессов-фильтров (None = все ядра, 1 = без пула)
+        chunk_size: Вакансий в куске, отдаваемом воркеру
+        near_duplicate_threshold: Порог почти одинаковых описаний (None/0 - не искать)
+        fuzzy_threshold: Порог сходства названий компаний (None/0 - только точное)
+        batch_format: Формат итоговых батчей ('.json', '.jsonl', '.jsonl.gz')
+
+    Returns:
+        Статистика (она же в filtering_stats.json)
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+
+    print("=" * 70)
+    print("🚀 ПАЙПЛАЙН: разбивка -> фильтры -> дедупликация")
+    print("=" * 70)
+
+    vacancies = load_vacancies(input_path)
+    print(f"📂 Загружено вакансий: {len(vacancies)} ({input_path})")
+
+    chunks = [vacancies[i:i + chunk_size] for i in range(0, len(vacancies), chunk_size)]
+    print(f"⚙️  Фильтрация: {len(chunks)} кусков, процессов: {workers}")
+
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(near_duplicate_threshold,)
+        ) as executor:
+            results = list(executor.map(_filter_chunk, chunks))
+    else:
+        _init_worker(near_duplicate_threshold)
+        results = [_filter_chunk(chunk) for chunk in chunks]
+
+    kept = []
+    excluded = []
+    unwanted = []
+    reasons = defaultdict(int)
+    for result in results:
+        kept.extend(result['kept'])
+        excluded.extend(result['excluded'])
+        unwanted.extend(result['unwanted'])
+        for category, count in result['reasons'].items():
+            reasons[category] += count
+
+    print(f"   Продажники: {len(excluded)}, нежелательные: {len(unwanted)}, прошли: {len(kept)}")
+
+    print("🔄 Дедупликация по всему набору...")
+    final, removed, unique_companies, near_removed = deduplicate(
+        kept, near_duplicate_threshold, fuzzy_threshold or None
+    )
+    print(f"   Уникальных компаний: {unique_companies}, удалено дубликатов: {len(removed)}"
+          f" (почти одинаковых описаний: {near_removed})")
+
+    # Итоговые файлы
+    output_path = Path(output_dir)
+    output_path.mkdir(exist_ok=True)
+
+    # Батчи прошлых прогонов иначе попадут в GPT
+    for old_file in find_batches(output_path, 'filtered_batch'):
+        old_file.unlink()
+
+    total_batches = 0
+    for i in range(0, len(final), batch_size):
+        total_batches += 1
+        write_vacancies(output_path / f"filtered_batch_{total_batches:04d}{batch_format}", final[i:i + batch_size])
+
+    _write_json(output_path / 'excluded_vacancies.json', excluded)
+    _write_json(output_path / 'removed_unwanted.json', unwanted)
+    _write_json(output_path / 'removed_duplicates.json', removed)
+
+    pre_scores = [v.get('_pre_score', 0) for v in final]
+    stats = {
+        'total_batches': total_batches,
+        'total_vacancies': len(vacancies),
+        'total_excluded': len(vacancies) - len(final),
+        'total_to_process': len(final),
+        'sales_excluded': len(excluded),
+        'unwanted_removed': len(unwanted),
+        'unwanted_reasons': dict(reasons),
+        'unique_companies': unique_companies,
+        'duplicates_removed': len(removed),
+        'near_duplicates_removed': near_removed,
+        'total_high_priority': sum(1 for s in pre_scores if s >= 7),
+        'total_medium_priority': sum(1 for s in pre_scores if 4 <= s < 7),
+        'total_low_priority': sum(1 for s in pre_scores if s < 4),
+        'elapsed_seconds': round(time.perf_counter() - started, 2),
+        'workers': workers
+    }
+    _write_json(output_path / 'filtering_stats.json', stats)
+
+    print()
+    print("=" * 70)
+    print("📊 ИТОГО")
+    print("=" * 70)
+    print(f"Всего вакансий:         {stats['total_vacancies']}")
+    print(f"Исключено продажников:  {stats['sales_excluded']}")
+    print(f"Нежелательных:          {stats['unwanted_removed']}")
+    print(f"Дубликатов:             {stats['duplicates_removed']}")
+    print(f"К обработке GPT:        {stats['total_to_process']} в {total_batches} батчах")
+    print(f"  - Высокий приоритет:  {stats['total_high_priority']}")
+    print(f"  - Средний приоритет:  {stats['total_medium_priority']}")
+    print(f"  - Низкий приоритет:   {stats['total_low_priority']}")
+    print(f"Время:                  {stats['elapsed_seconds']} с")
+    print("=" * 70)
+    print(f"💾 Результаты: {output_path}")
+
+    return stats
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Фильтрация и дедупликация вакансий одной командой")
+    arg_parser.add_argument('--input', default="vacancies_all.json",
+                            help="Файл со всеми вакансиями (.json, .jsonl, .jsonl.gz) или директория с batch_*")
+    arg_parser.add_argument('--output', default="filtered_batches", help="Директория для итоговых батчей")
+    arg_parser.add_argument('--batch-size', type=int, default=50, help="Вакансий в итоговом батче")
+    arg_parser.add_argument('--format', default='.json', choices=CORPUS_SUFFIXES, help="Формат итоговых батчей")
+    arg_parser.add_argument('--workers', type=int, default=None, help="Процессов (по умолчанию все ядра)")
+    arg_parser.add_argument('--chunk-size', type=int, default=500, help="Вакансий в куске для воркера")
+    arg_parser.add_argument('--near-duplicates', type=float, default=0.8,
+                            help="Порог почти одинаковых описаний (0 - отключить)")
+    arg_parser.add_argument('--fuzzy', type=float, default=0.75,
+                            help="Порог сходства названий компаний (0 - только точное совпадение)")
+    arg_parser.add_argument('--rank', action='store_true', help="Сразу ранжировать итоговые батчи через GPT")
+    arg_parser.add_argument('--results', default="ranked_results", help="Директория для результатов GPT")
+    args = arg_parser.parse_args()
+
+    run_pipeline(
+        input_path=args.input,
+        output_dir=args.output,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        near_duplicate_threshold=args.near_duplicates or None,
+        fuzzy_threshold=args.fuzzy or None,
+        batch_format=args.format
+    )
+
+    if args.rank:
+        # Импорт здесь: фильтрам не нужен пакет openai
+        from process_vacancies_with_gpt import process_all_batches
+        process_all_batches(Path(args.output), Path(args.results))
+
+
+if __name__ == "__main__":
+    main()
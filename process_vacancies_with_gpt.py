@@ -3,13 +3,20 @@
 С защитой от шаблонных ответов и валидацией качества
 """
 
+import asyncio
 import json
 import os
 import time
+from collections import deque
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+from ranking_cache import RankingCache, prompt_version
+from corpus_io import corpus_stem, find_batches, read_vacancies
+from token_budget import estimate_tokens, trim_text
+from prompt_encoding import encode_vacancies, legend, DEFAULT_ENCODING
 
 # ============================================
 # КОНФИГУРАЦИЯ
@@ -17,24 +24,40 @@ from openai import OpenAI
 
 # API настройки
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")  # Установите через переменную окружения
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # Локальный сервер для тестов: fake_openai_server.py
 MODEL = "gpt-4o"  # или "gpt-4o-mini" для экономии
-BATCH_SIZE = 15  # Обрабатываем по 15 вакансий за раз (оптимально для качества)
+BATCH_SIZE = 25  # Максимум вакансий в запросе (фактически - сколько влезет в BATCH_INPUT_TOKENS)
+
+# Размер запроса в токенах (описания отличаются по длине в 10 раз)
+BATCH_INPUT_TOKENS = 12000  # Вакансии в одном запросе (без промпта)
+MAX_DESCRIPTION_TOKENS = 1200  # Длиннее - описание сокращается
+OUTPUT_TOKENS_PER_VACANCY = 400  # Ответ на одну вакансию с запасом
+
+# Формат вакансий в запросе: json (по умолчанию), compact (короткие ключи) или table (таблица)
+PROMPT_ENCODING = os.getenv("PROMPT_ENCODING", DEFAULT_ENCODING)
 
 # Параметры генерации (КРИТИЧНО для качества!)
 TEMPERATURE = 0.7  # Не 0! Нужна вариативность
-MAX_TOKENS = 6000  # Достаточно для 15 вакансий с детальным анализом
+MAX_TOKENS = 16000  # Верхняя граница ответа; в запросе - по OUTPUT_TOKENS_PER_VACANCY на вакансию
 PRESENCE_PENALTY = 0.3  # Против повторений
 FREQUENCY_PENALTY = 0.3  # Против шаблонных фраз
 
 # Параметры повторных попыток
 MAX_RETRIES = 3
 RETRY_DELAY = 2  # секунд
+MAX_RATE_LIMIT_RETRIES = 8  # 429 не считаются попытками, но и не бесконечны
+
+# Параллельная обработка (лимиты аккаунта OpenAI: https://platform.openai.com/account/limits)
+CONCURRENCY = int(os.getenv("GPT_CONCURRENCY", "8"))  # Одновременных запросов (1 - последовательно)
+RPM_LIMIT = int(os.getenv("GPT_RPM_LIMIT", "500"))  # Запросов в минуту
+TPM_LIMIT = int(os.getenv("GPT_TPM_LIMIT", "450000"))  # Токенов в минуту (вход + max_tokens)
 
 # Пути
 FILTERED_BATCHES_DIR = Path("filtered_batches")
 RESULTS_DIR = Path("ranked_results")
 PROMPT_FILE = Path("vacancy_ranking_prompt.txt")
 PROGRESS_FILE = RESULTS_DIR / "progress.json"
+CACHE_FILE_NAME = "ranking_cache.json"  # В директории результатов
 
 # ============================================
 # ВАЛИДАЦИЯ КАЧЕСТВА ОТВЕТОВ
@@ -84,44 +107,39 @@ def is_template_response(result: Dict[str, Any]) -> tuple[bool, str]:
     return False, ""
 
 
-def validate_batch_results(results: List[Dict], vacancies: List[Dict]) -> tuple[bool, List[str]]:
+def validate_results(results: List[Dict], vacancies: List[Dict]) -> tuple[Dict[int, Dict], List[str]]:
     """
-    Валидирует качество результатов для батча
+    Валидирует каждый результат отдельно
+    
+    Результаты сопоставляются с вакансиями по vacancy_id; шаблонные
+    и отсутствующие не принимаются, но не отменяют остальные.
     
     Returns:
-        (is_valid, issues)
+        ({позиция вакансии: принятый результат}, issues)
     """
+    accepted = {}
     issues = []
     
-    # Проверка количества
     if len(results) != len(vacancies):
         issues.append(f"Количество результатов ({len(results)}) != количеству вакансий ({len(vacancies)})")
-        return False, issues
     
-    # Проверка каждого результата
-    template_count = 0
-    for i, result in enumerate(results):
-        vacancy_id = result.get("vacancy_id")
+    for position, (vacancy, result) in enumerate(zip(vacancies, match_results(results, vacancies))):
+        vacancy_id = vacancy.get("id", "")
         
-        # Проверка наличия vacancy_id
-        if not vacancy_id:
-            issues.append(f"Результат #{i}: отсутствует vacancy_id")
+        if result is None:
+            issues.append(f"Вакансия {vacancy_id}: нет результата")
             continue
         
         # Проверка на шаблонность
         is_template, reason = is_template_response(result)
         if is_template:
-            template_count += 1
-            if template_count <= 3:  # Показываем первые 3
-                issues.append(f"Вакансия {vacancy_id}: шаблонный ответ - {reason}")
-    
-    # Если больше 30% шаблонных - отклоняем весь батч
-    template_percentage = (template_count / len(results)) * 100
-    if template_percentage > 30:
-        issues.append(f"Слишком много шаблонных ответов: {template_percentage:.1f}% ({template_count}/{len(results)})")
-        return False, issues
+            issues.append(f"Вакансия {vacancy_id}: шаблонный ответ - {reason}")
+            continue
+        
+        result["vacancy_id"] = result.get("vacancy_id") or vacancy_id
+        accepted[position] = result
     
-    return True, issues
+    return accepted, issues
 
 
 # ============================================
@@ -135,141 +153,320 @@ def load_prompt() -> str:
 
 
 def prepare_batch_for_api(vacancies: List[Dict]) -> List[Dict]:
-    """Подготавливает батч вакансий для API (убирает служебные поля)"""
+    """Подготавливает батч вакансий для API (убирает служебные поля, сокращает длинные описания)"""
     clean_vacancies = []
     for v in vacancies:
         clean_v = {k: v for k, v in v.items() if not k.startswith('_')}
+        if clean_v.get('описание'):
+            clean_v['описание'] = trim_text(clean_v['описание'], MAX_DESCRIPTION_TOKENS)
         clean_vacancies.append(clean_v)
     return clean_vacancies
 
 
-def call_gpt_api(client: OpenAI, prompt: str, vacancies: List[Dict], attempt: int = 1) -> tuple[List[Dict] | None, str]:
+def serialize_vacancies(vacancies: List[Dict]) -> str:
+    """Текст вакансий для пользовательского сообщения (в формате PROMPT_ENCODING)"""
+    return encode_vacancies(vacancies, PROMPT_ENCODING)
+
+
+def system_prompt(prompt: str) -> str:
+    """Промпт + описание формата входных данных (одинаковый префикс всех запросов)"""
+    return prompt + legend(PROMPT_ENCODING)
+
+
+def vacancy_tokens(vacancy: Dict) -> int:
+    """Токенов занимает вакансия в запросе (после подготовки)"""
+    return estimate_tokens(serialize_vacancies(prepare_batch_for_api([vacancy])))
+
+
+def output_tokens(count: int) -> int:
+    """max_tokens для ответа на count вакансий"""
+    return min(MAX_TOKENS, count * OUTPUT_TOKENS_PER_VACANCY + 200)
+
+
+def build_messages(prompt: str, vacancies: List[Dict], attempt: int = 1) -> List[Dict]:
     """
-    Вызывает GPT API для ранжирования вакансий
+    Сообщения для запроса ранжирования
+    
+    Неизменная часть (промпт и формат) идет первой - OpenAI кеширует
+    одинаковый префикс запросов, меняющиеся вакансии - после нее.
+    """
+    messages = [
+        {
+            "role": "system",
+            "content": system_prompt(prompt)
+        },
+        {
+            "role": "user",
+            "content": serialize_vacancies(vacancies)
+        }
+    ]
+    
+    # Добавляем дополнительное напоминание при повторной попытке
+    if attempt > 1:
+        messages.append({
+            "role": "system",
+            "content": "⚠️ ВНИМАНИЕ: Предыдущий ответ был отклонен из-за шаблонных фраз. "
+                      "Ты ОБЯЗАН написать УНИКАЛЬНЫЙ анализ для КАЖДОЙ вакансии, "
+                      "основываясь на РЕАЛЬНЫХ деталях из описания. "
+                      "НИКАКИХ общих фраз типа 'автоматическая оценка на основе ключевых индикаторов'!"
+        })
+    
+    return messages
+
+
+def completion_params(messages: List[Dict], max_tokens: int = MAX_TOKENS) -> Dict:
+    """Параметры chat.completions.create"""
+    return {
+        "model": MODEL,
+        "messages": messages,
+        "temperature": TEMPERATURE,
+        "max_tokens": max_tokens,
+        "presence_penalty": PRESENCE_PENALTY,
+        "frequency_penalty": FREQUENCY_PENALTY,
+        "response_format": {"type": "json_object"} if MODEL.startswith("gpt-4") else None
+    }
+
+
+def parse_results(content: str) -> tuple[List[Dict] | None, str]:
+    """
+    Извлекает массив результатов из ответа модели
     
     Returns:
         (results, error_message)
     """
     try:
-        # Формируем сообщения
-        messages = [
-            {
-                "role": "system",
-                "content": prompt
-            },
-            {
-                "role": "user",
-                "content": json.dumps(vacancies, ensure_ascii=False, indent=2)
-            }
-        ]
+        # Если ответ - это объект с массивом
+        parsed = json.loads(content)
+        if isinstance(parsed, dict) and "results" in parsed:
+            results = parsed["results"]
+        elif isinstance(parsed, dict) and "rankings" in parsed:
+            results = parsed["rankings"]
+        elif isinstance(parsed, list):
+            results = parsed
+        else:
+            # Ищем первый ключ, который содержит массив
+            for key, value in parsed.items():
+                if isinstance(value, list):
+                    results = value
+                    break
+            else:
+                return None, f"Не найден массив результатов в ответе: {list(parsed.keys())}"
         
-        # Добавляем дополнительное напоминание при повторной попытке
-        if attempt > 1:
-            messages.append({
-                "role": "system",
-                "content": "⚠️ ВНИМАНИЕ: Предыдущий ответ был отклонен из-за шаблонных фраз. "
-                          "Ты ОБЯЗАН написать УНИКАЛЬНЫЙ анализ для КАЖДОЙ вакансии, "
-                          "основываясь на РЕАЛЬНЫХ деталях из описания. "
-                          "НИКАКИХ общих фраз типа 'автоматическая оценка на основе ключевых индикаторов'!"
-            })
+        return results, ""
         
-        # Вызов API
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=TEMPERATURE,
-            max_tokens=MAX_TOKENS,
-            presence_penalty=PRESENCE_PENALTY,
-            frequency_penalty=FREQUENCY_PENALTY,
-            response_format={"type": "json_object"} if MODEL.startswith("gpt-4") else None
-        )
+    except json.JSONDecodeError as e:
+        return None, f"Ошибка парсинга JSON: {e}\n\nОтвет:\n{content[:500]}"
+
+
+def response_results(response) -> tuple[List[Dict] | None, str]:
+    """Результаты из ответа API (обрезанный по max_tokens ответ - ошибка)"""
+    choice = response.choices[0]
+    if choice.finish_reason == "length":
+        return None, "Ответ обрезан по max_tokens"
+    return parse_results(choice.message.content)
+
+
+def match_results(results: List[Dict], vacancies: List[Dict]) -> List[Dict | None]:
+    """
+    Результаты в порядке вакансий: по vacancy_id, без него - по позиции
+    """
+    by_id = {str(r.get("vacancy_id")): r for r in results if r.get("vacancy_id")}
+    matched = []
+    for position, vacancy in enumerate(vacancies):
+        result = by_id.get(str(vacancy.get("id", "")))
+        if result is None and position < len(results) and not results[position].get("vacancy_id"):
+            result = results[position]
+        matched.append(result)
+    return matched
+
+
+# ============================================
+# ПАРАЛЛЕЛЬНАЯ ОБРАБОТКА С УЧЕТОМ ЛИМИТОВ
+# ============================================
+
+class RateLimiter:
+    """
+    Бюджеты запросов и токенов в минуту (token bucket)
+    
+    Перед запросом резервируется оценка токенов, после ответа
+    разница с фактическим usage возвращается в бюджет. На 429 доля
+    бюджета уменьшается вдвое, на каждый успех - растет на 5% (AIMD):
+    скорость сама подстраивается под реальный лимит аккаунта.
+    """
+    
+    def __init__(self, rpm: int = RPM_LIMIT, tpm: int = TPM_LIMIT):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.rate = 1.0  # Доля бюджета, доступная сейчас
+        self.requests = float(rpm)
+        self.tokens = float(tpm)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self._lock = asyncio.Lock()
+        
+        self.stats = {
+            'requests': 0,
+            'tokens': 0,
+            'rate_limited': 0,
+            'waited_seconds': 0.0
+        }
+    
+    def _refill(self):
+        """Пополнить бюджеты за прошедшее время"""
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        self.requests = min(self.rpm * self.rate, self.requests + elapsed * self.rpm * self.rate / 60)
+        self.tokens = min(self.tpm * self.rate, self.tokens + elapsed * self.tpm * self.rate / 60)
+    
+    async def acquire(self, tokens: int):
+        """Дождаться бюджета на один запрос с оценкой tokens токенов"""
+        # Ожидающие обслуживаются по очереди: большой запрос не голодает
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self.paused_until - time.monotonic()
+                
+                if wait <= 0:
+                    # Запрос больше всего бюджета ждал бы вечно
+                    needed = min(tokens, self.tpm * self.rate)
+                    if self.requests >= 1 and self.tokens >= needed:
+                        self.requests -= 1
+                        self.tokens -= tokens
+                        self.stats['requests'] += 1
+                        return
+                    
+                    wait = max(
+                        (1 - self.requests) * 60 / (self.rpm * self.rate),
+                        (needed - self.tokens) * 60 / (self.tpm * self.rate),
+                        0.05
+                    )
+                
+                self.stats['waited_seconds'] += wait
+                await asyncio.sleep(wait)
+    
+    def settle(self, reserved: int, used: int):
+        """Вернуть в бюджет разницу между резервом и фактическим расходом"""
+        self._refill()
+        self.tokens = min(self.tpm * self.rate, self.tokens + reserved - used)
+        self.stats['tokens'] += used
+    
+    def on_success(self):
+        """Аддитивное восстановление скорости"""
+        self.rate = min(1.0, self.rate + 0.05)
+    
+    def on_rate_limit(self, retry_after: Optional[float] = None):
+        """Мультипликативное снижение скорости и пауза для всех запросов"""
+        self.stats['rate_limited'] += 1
+        now = time.monotonic()
         
-        # Парсинг ответа
-        content = response.choices[0].message.content
+        # Пачка одновременных 429 - это одно превышение, а не несколько
+        if now - self.last_decrease > 1:
+            self.rate = max(0.1, self.rate / 2)
+            self.last_decrease = now
         
-        # Пробуем извлечь JSON
-        try:
-            # Если ответ - это объект с массивом
-            parsed = json.loads(content)
-            if isinstance(parsed, dict) and "results" in parsed:
-                results = parsed["results"]
-            elif isinstance(parsed, dict) and "rankings" in parsed:
-                results = parsed["rankings"]
-            elif isinstance(parsed, list):
-                results = parsed
-            else:
-                # Ищем первый ключ, который содержит массив
-                for key, value in parsed.items():
-                    if isinstance(value, list):
-                        results = value
-                        break
-                else:
-                    return None, f"Не найден массив результатов в ответе: {list(parsed.keys())}"
-            
-            return results, ""
-            
-        except json.JSONDecodeError as e:
-            return None, f"Ошибка парсинга JSON: {e}\n\nОтвет:\n{content[:500]}"
+        self.paused_until = max(self.paused_until, now + (retry_after or RETRY_DELAY))
     
-    except Exception as e:
-        return None, f"Ошибка API: {str(e)}"
+    def get_stats(self) -> Dict:
+        """Статистика лимитера"""
+        return {
+            **self.stats,
+            'waited_seconds': round(self.stats['waited_seconds'], 1),
+            'rate': round(self.rate, 2)
+        }
+
 
+def estimate_request_tokens(messages: List[Dict], max_tokens: int) -> int:
+    """Оценка токенов запроса (вход + max_tokens), как считает лимит OpenAI"""
+    return sum(estimate_tokens(m["content"]) for m in messages) + max_tokens
 
-def process_batch(client: OpenAI, prompt: str, vacancies: List[Dict], batch_name: str) -> tuple[List[Dict] | None, str]:
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Пауза из заголовков ответа 429 (retry-after-ms / retry-after)"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+async def call_gpt_api_async(
+    client: AsyncOpenAI,
+    prompt: str,
+    vacancies: List[Dict],
+    limiter: RateLimiter,
+    attempt: int = 1
+) -> tuple[List[Dict] | None, str]:
     """
-    Обрабатывает один батч с повторными попытками и валидацией
+    Вызывает GPT API для ранжирования вакансий с бюджетом RPM/TPM
+    
+    429 повторяется после паузы лимитера и не расходует попытки валидации.
     
     Returns:
         (results, error_message)
     """
-    clean_vacancies = prepare_batch_for_api(vacancies)
+    messages = build_messages(prompt, vacancies, attempt)
+    max_tokens = output_tokens(len(vacancies))
+    reserved = estimate_request_tokens(messages, max_tokens)
     
-    for attempt in range(1, MAX_RETRIES + 1):
-        print(f"    Попытка {attempt}/{MAX_RETRIES}...", end=" ")
-        
-        # Вызов API
-        results, error = call_gpt_api(client, prompt, clean_vacancies, attempt)
+    for _ in range(MAX_RATE_LIMIT_RETRIES):
+        await limiter.acquire(reserved)
         
-        if error:
-            print(f"❌ Ошибка: {error}")
-            if attempt < MAX_RETRIES:
-                time.sleep(RETRY_DELAY)
-                continue
-            return None, error
+        try:
+            response = await client.chat.completions.create(**completion_params(messages, max_tokens))
+        except openai.RateLimitError as e:
+            limiter.settle(reserved, 0)
+            limiter.on_rate_limit(retry_after_seconds(e))
+            continue
+        except Exception as e:
+            limiter.settle(reserved, 0)
+            return None, f"Ошибка API: {str(e)}"
         
-        # Валидация результатов
-        is_valid, issues = validate_batch_results(results, vacancies)
+        usage = getattr(response, "usage", None)
+        limiter.settle(reserved, usage.total_tokens if usage else reserved)
+        limiter.on_success()
         
-        if is_valid:
-            if issues:
-                print(f"⚠️  OK (с замечаниями: {len(issues)})")
-                for issue in issues[:3]:
-                    print(f"        - {issue}")
-            else:
-                print("✓ OK")
-            return results, ""
-        else:
-            print(f"❌ Невалидный результат:")
-            for issue in issues[:5]:
-                print(f"        - {issue}")
-            
-            if attempt < MAX_RETRIES:
-                time.sleep(RETRY_DELAY)
-                continue
-            
-            return None, f"Не удалось получить валидный результат после {MAX_RETRIES} попыток"
+        return response_results(response)
+    
+    return None, f"Лимит запросов (429) не снят после {MAX_RATE_LIMIT_RETRIES} попыток"
+
+
+async def rank_vacancies_async(
+    client: AsyncOpenAI,
+    prompt: str,
+    vacancies: List[Dict],
+    limiter: RateLimiter,
+    attempt: int = 1
+) -> tuple[Dict[int, Dict], List[str]]:
+    """
+    Один запрос ранжирования с валидацией каждого результата
     
-    return None, "Неожиданная ошибка"
+    Returns:
+        ({позиция вакансии: принятый результат}, issues)
+    """
+    results, error = await call_gpt_api_async(client, prompt, prepare_batch_for_api(vacancies), limiter, attempt)
+    if error:
+        return {}, [error[:200]]
+    return validate_results(results, vacancies)
 
 
 # ============================================
 # УПРАВЛЕНИЕ ПРОГРЕССОМ
 # ============================================
 
-def load_progress() -> Dict:
+def load_progress(progress_file: Path = PROGRESS_FILE) -> Dict:
     """Загружает прогресс обработки"""
-    if PROGRESS_FILE.exists():
-        with open(PROGRESS_FILE, 'r', encoding='utf-8') as f:
+    if progress_file.exists():
+        with open(progress_file, 'r', encoding='utf-8') as f:
             return json.load(f)
     return {
         "processed_batches": [],
@@ -281,104 +478,240 @@ def load_progress() -> Dict:
     }
 
 
-def save_progress(progress: Dict):
-    """Сохраняет прогресс обработки"""
+def save_progress(progress: Dict, progress_file: Path = PROGRESS_FILE):
+    """Сохраняет прогресс обработки (атомарно: прерванная запись не портит файл)"""
     progress["last_update"] = time.strftime("%Y-%m-%d %H:%M:%S")
-    with open(PROGRESS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(progress, f, ensure_ascii=False, indent=2)
+    save_json_atomic(progress_file, progress)
+
+
+def save_json_atomic(path: Path, data):
+    """Записать JSON через временный файл"""
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, path)
 
 
 # ============================================
 # ОСНОВНОЙ ПРОЦЕСС
 # ============================================
 
-def process_all_batches():
+def process_all_batches(
+    batches_dir: Path = FILTERED_BATCHES_DIR,
+    results_dir: Path = RESULTS_DIR,
+    concurrency: int = CONCURRENCY
+):
     """Обрабатывает все отфильтрованные батчи"""
     
-    # Проверка API ключа
-    if not OPENAI_API_KEY:
+    # Проверка API ключа (локальному серверу ключ не нужен)
+    if not OPENAI_API_KEY and not OPENAI_BASE_URL:
         print("❌ Ошибка: не установлен OPENAI_API_KEY")
         print("Установите через: $env:OPENAI_API_KEY='your-key-here'")
         return
     
-    # Инициализация
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    RESULTS_DIR.mkdir(exist_ok=True)
+    asyncio.run(process_all_batches_async(Path(batches_dir), Path(results_dir), concurrency))
+
+
+async def process_all_batches_async(batches_dir: Path, results_dir: Path, concurrency: int):
+    """
+    Параллельная обработка под-батчей из очереди
+    
+    В очереди - отдельные вакансии всех необработанных батчей; воркер
+    набирает из нее запрос на BATCH_INPUT_TOKENS токенов (не больше
+    BATCH_SIZE вакансий), частоту запросов ограничивает RateLimiter.
+    Вакансии с результатом в кеше в запросы не попадают. Отклоненные
+    вакансии возвращаются в конец очереди и уходят в следующие запросы
+    вместе с другими (до MAX_RETRIES попыток на вакансию). Батч
+    сохраняется, как только готовы все его вакансии.
+    """
+    results_dir.mkdir(exist_ok=True)
+    progress_file = results_dir / "progress.json"
     
     # Загрузка промпта
     print("Загрузка промпта...")
     prompt = load_prompt()
-    print(f"✓ Промпт загружен ({len(prompt)} символов)")
+    version = prompt_version(system_prompt(prompt))
+    print(f"✓ Промпт загружен ({len(prompt)} символов, формат {PROMPT_ENCODING}, версия {version})")
+    
+    cache = RankingCache(str(results_dir / CACHE_FILE_NAME))
     
     # Загрузка прогресса
-    progress = load_progress()
+    progress = load_progress(progress_file)
     if not progress["started_at"]:
         progress["started_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
     
     # Поиск батчей
-    batch_files = sorted(FILTERED_BATCHES_DIR.glob("filtered_batch_*.json"))
+    batch_files = find_batches(batches_dir, "filtered_batch")
     print(f"\nНайдено {len(batch_files)} отфильтрованных батчей")
     print(f"Уже обработано: {len(progress['processed_batches'])}")
     print(f"Провалено: {len(progress['failed_batches'])}\n")
     
-    # Обработка батчей
+    # Очередь вакансий всех необработанных батчей: (батч, позиция, попытка).
+    # Воркеры работают в одном потоке и не ждут очередь - хватает deque
+    queue = deque()
+    batches = {}
+    
+    def save_batch(batch_name: str, batch: Dict):
+        """Все вакансии батча оценены - сохраняем результаты"""
+        result_file = results_dir / f"ranked_{batch_name}.json"
+        save_json_atomic(result_file, batch["slots"])
+        
+        progress["processed_batches"].append(batch_name)
+        progress["total_processed"] += len(batch["slots"])
+        print(f"  ✓ {batch_name}: сохранено в {result_file.name}")
+    
     for batch_file in batch_files:
-        batch_name = batch_file.stem.replace("filtered_", "")
+        batch_name = corpus_stem(batch_file).replace("filtered_", "")
         
         # Пропускаем уже обработанные
         if batch_name in progress["processed_batches"]:
             continue
         
-        print(f"Обработка {batch_name}...")
-        
         # Загрузка вакансий
-        with open(batch_file, 'r', encoding='utf-8') as f:
-            vacancies = json.load(f)
+        vacancies = read_vacancies(batch_file)
         
         if not vacancies:
-            print(f"  ⚠️ Пустой батч, пропускаем")
+            print(f"  ⚠️ {batch_name}: пустой батч, пропускаем")
             progress["processed_batches"].append(batch_name)
             continue
         
-        print(f"  Вакансий: {len(vacancies)}")
+        # Оценки из кеша сразу на место, в запросы - только остальные
+        cached, missing = cache.split(version, MODEL, vacancies)
+        batch = {
+            "vacancies": vacancies,
+            "tokens": {position: vacancy_tokens(vacancies[position]) for position in missing},
+            "slots": [cached.get(position) for position in range(len(vacancies))],
+            "remaining": len(missing),
+            "failed": False
+        }
+        batches[batch_name] = batch
         
-        # Разбиваем на под-батчи если нужно
-        sub_batches = [vacancies[i:i + BATCH_SIZE] for i in range(0, len(vacancies), BATCH_SIZE)]
-        all_results = []
+        if not missing:
+            save_batch(batch_name, batch)
+            continue
         
-        for sub_idx, sub_batch in enumerate(sub_batches, 1):
-            if len(sub_batches) > 1:
-                print(f"  Под-батч {sub_idx}/{len(sub_batches)} ({len(sub_batch)} вакансий):")
-            
-            results, error = process_batch(client, prompt, sub_batch, batch_name)
+        for position in missing:
+            queue.append((batch_name, position, 1))
+    
+    save_progress(progress, progress_file)
+    cache_stats = cache.get_stats()
+    print(f"Из кеша: {cache_stats['hits']} вакансий, к запросу: {cache_stats['misses']}")
+    print(f"Параллельно запросов: {concurrency}\n")
+    
+    limiter = RateLimiter()
+    started = time.monotonic()
+    
+    # Вакансии, еще не принятые и не проваленные окончательно
+    state = {"outstanding": len(queue), "requests": 0}
+    
+    def fail_batch(batch_name: str, batch: Dict, error: str):
+        if batch["failed"]:
+            return
+        batch["failed"] = True
+        print(f"  ❌ {batch_name} провален: {error}")
+        progress["failed_batches"].append({
+            "batch": batch_name,
+            "error": error,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+        })
+        progress["total_failed"] += len(batch["slots"])
+    
+    def take_items() -> List[tuple]:
+        """
+        Вакансии для одного запроса
+        
+        Первая вакансия очереди берется всегда, следующие - если влезают
+        в оставшийся бюджет токенов (first-fit по окну из 4 * BATCH_SIZE
+        вакансий, не влезшие остаются в начале очереди). Вакансии
+        проваленных батчей пропускаются.
+        """
+        items = []
+        skipped = []
+        budget = BATCH_INPUT_TOKENS
+        scanned = 0
+        
+        while queue and len(items) < BATCH_SIZE and scanned < 4 * BATCH_SIZE:
+            item = queue.popleft()
+            scanned += 1
+            batch = batches[item[0]]
             
-            if error:
-                print(f"  ❌ Провален: {error}")
-                progress["failed_batches"].append({
-                    "batch": batch_name,
-                    "error": error,
-                    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-                })
-                progress["total_failed"] += len(sub_batch)
-                break
+            if batch["failed"]:
+                state["outstanding"] -= 1
+                continue
             
-            all_results.extend(results)
-        else:
-            # Все под-батчи успешны
-            # Сохраняем результаты
-            result_file = RESULTS_DIR / f"ranked_{batch_name}.json"
-            with open(result_file, 'w', encoding='utf-8') as f:
-                json.dump(all_results, f, ensure_ascii=False, indent=2)
+            tokens = batch["tokens"][item[1]]
+            if items and tokens > budget:
+                skipped.append(item)
+                continue
             
-            progress["processed_batches"].append(batch_name)
-            progress["total_processed"] += len(vacancies)
-            print(f"  ✓ Сохранено в {result_file.name}")
+            items.append(item)
+            budget -= tokens
         
-        # Сохраняем прогресс
-        save_progress(progress)
-        
-        # Небольшая пауза между батчами
-        time.sleep(1)
+        queue.extendleft(reversed(skipped))
+        return items
+    
+    async def worker(client: AsyncOpenAI):
+        while True:
+            items = take_items()
+            if not items:
+                if state["outstanding"] == 0:
+                    return
+                # Запросы в полете могут вернуть вакансии в очередь
+                await asyncio.sleep(0.1)
+                continue
+            
+            state["requests"] += 1
+            label = f"запрос #{state['requests']}"
+            vacancies = [batches[batch_name]["vacancies"][position] for batch_name, position, _ in items]
+            attempt = max(item_attempt for _, _, item_attempt in items)
+            
+            accepted, issues = await rank_vacancies_async(client, prompt, vacancies, limiter, attempt)
+            
+            # Дальше до сохранения нет await: прогресс меняет один воркер за раз
+            retry = []
+            for index, (batch_name, position, item_attempt) in enumerate(items):
+                batch = batches[batch_name]
+                
+                if index in accepted:
+                    # Принятая оценка - в кеш (пригодится при перезапуске) и в батч
+                    cache.put(version, MODEL, vacancies[index], accepted[index])
+                    state["outstanding"] -= 1
+                    if not batch["failed"]:
+                        batch["slots"][position] = accepted[index]
+                        batch["remaining"] -= 1
+                        if batch["remaining"] == 0:
+                            save_batch(batch_name, batch)
+                elif item_attempt < MAX_RETRIES and not batch["failed"]:
+                    retry.append((batch_name, position, item_attempt + 1))
+                else:
+                    state["outstanding"] -= 1
+                    fail_batch(
+                        batch_name, batch,
+                        f"Не удалось получить валидный результат после {MAX_RETRIES} попыток"
+                    )
+            
+            if retry:
+                print(f"  ⚠️  {label}: принято {len(accepted)}/{len(items)}, на повтор {len(retry)}")
+                for issue in issues[:3]:
+                    print(f"        - {issue}")
+            
+            # Сохраняем прогресс
+            save_progress(progress, progress_file)
+            
+            # Отклоненные - в конец очереди, к другим вакансиям
+            if retry:
+                await asyncio.sleep(RETRY_DELAY)
+                queue.extend(retry)
+    
+    client = AsyncOpenAI(api_key=OPENAI_API_KEY or "local", base_url=OPENAI_BASE_URL, max_retries=0)
+    try:
+        await asyncio.gather(*(worker(client) for _ in range(max(1, concurrency))))
+    finally:
+        await client.close()
+        cache.save()
+    
+    elapsed = time.monotonic() - started
+    limiter_stats = limiter.get_stats()
     
     # Финальная статистика
     print(f"\n{'='*60}")
@@ -387,7 +720,13 @@ def process_all_batches():
     print(f"Успешно обработано: {progress['total_processed']} вакансий")
     print(f"Провалено:          {progress['total_failed']} вакансий")
     print(f"Батчей обработано:  {len(progress['processed_batches'])}/{len(batch_files)}")
-    print(f"Результаты в:       {RESULTS_DIR}")
+    if state["requests"]:
+        print(f"Вакансий на запрос: {cache_stats['misses'] / state['requests']:.1f} (в среднем, с повторами)")
+    print(f"Запросов:           {limiter_stats['requests']} за {elapsed:.1f} с "
+          f"(429: {limiter_stats['rate_limited']}, ожидание лимитов: {limiter_stats['waited_seconds']} с)")
+    print(f"Токенов:            {limiter_stats['tokens']}")
+    print(f"Кеш оценок:         {cache_stats['hits']} из кеша, {cache.stats['stored']} добавлено")
+    print(f"Результаты в:       {results_dir}")
     print(f"{'='*60}")
 
 
@@ -0,0 +1,145 @@
+"""
+КОМПАКТНОЕ ПРЕДСТАВЛЕНИЕ ВАКАНСИЙ ДЛЯ GPT
+Вакансии уходят в модель без отступов, с короткими ключами и без полей,
+которые не нужны для оценки (ссылка, дата, employer_id, area_id). Поля с
+одинаковым значением у всех вакансий запроса выносятся в "общее".
+Расшифровка ключей дописывается к системному промпту: он одинаковый во
+всех запросах, поэтому OpenAI кеширует его как префикс.
+
+Режимы (PROMPT_ENCODING):
+    json    - прежний формат: JSON с отступами и полными названиями полей (по умолчанию)
+    compact - минифицированный JSON с короткими ключами
+    table   - таблица: строка заголовков и по строке на вакансию через табуляцию
+"""
+
+import json
+from typing import Dict, List
+
+
+ENCODINGS = ('json', 'compact', 'table')
+DEFAULT_ENCODING = 'json'
+
+# Полное название поля -> короткий ключ
+ALIASES = {
+    'id': 'id',
+    'название': 'н',
+    'компания': 'к',
+    'оплата': 'з',
+    'опыт': 'оп',
+    'тип_занятости': 'тз',
+    'описание': 'о',
+}
+FIELD_NAMES = {alias: field for field, alias in ALIASES.items()}
+
+# Не влияют на оценку (в примерах промпта их тоже нет)
+DROPPED_FIELDS = {'ссылка', 'дата_публикации', 'employer_id', 'area_id'}
+
+LEGENDS = {
+    'json': '',
+    'compact': (
+        "\n\n# ФОРМАТ ВХОДНЫХ ДАННЫХ\n\n"
+        "Вакансии переданы компактно: JSON-объект {\"общее\": {...}, \"вакансии\": [...]}. "
+        "Ключи: id - id вакансии, н - название, к - компания, з - оплата, оп - опыт, "
+        "тз - тип занятости, о - описание. Поля из \"общее\" одинаковы у всех вакансий запроса. "
+        "В ответе vacancy_id = id, формат ответа прежний.\n"
+    ),
+    'table': (
+        "\n\n# ФОРМАТ ВХОДНЫХ ДАННЫХ\n\n"
+        "Вакансии переданы таблицей: первая строка - ключи колонок, дальше по строке "
+        "на вакансию, колонки разделены табуляцией. Строки перед заголовком вида "
+        "\"ключ=значение\" одинаковы у всех вакансий запроса. "
+        "Ключи: id - id вакансии, н - название, к - компания, з - оплата, оп - опыт, "
+        "тз - тип занятости, о - описание. В ответе vacancy_id = id, формат ответа прежний.\n"
+    ),
+}
+
+
+def legend(encoding: str) -> str:
+    """Расшифровка формата для системного промпта"""
+    return LEGENDS[encoding]
+
+
+def _compact_fields(vacancies: List[Dict]) -> List[Dict]:
+    """Короткие ключи, без лишних полей и пустых значений; порядок ключей - как в ALIASES"""
+    compact = []
+    for vacancy in vacancies:
+        item = {}
+        for field, alias in ALIASES.items():
+            if vacancy.get(field):
+                item[alias] = vacancy[field]
+        for field, value in vacancy.items():
+            if field not in ALIASES and field not in DROPPED_FIELDS and value:
+                item[field] = value
+        compact.append(item)
+    return compact
+
+
+def _common_fields(items: List[Dict]) -> Dict:
+    """Поля с одинаковым значением у всех вакансий (кроме id и описания)"""
+    if len(items) < 2:
+        return {}
+    common = {}
+    for key, value in items[0].items():
+        if key in ('id', 'о'):
+            continue
+        if all(item.get(key) == value for item in items[1:]):
+            common[key] = value
+    return common
+
+
+def _cell(value) -> str:
+    """Значение ячейки таблицы в одну строку"""
+    return ' '.join(str(value).split())
+
+
+def encode_vacancies(vacancies: List[Dict], encoding: str = DEFAULT_ENCODING) -> str:
+    """Текст вакансий для пользовательского сообщения"""
+    if encoding == 'json':
+        return json.dumps(vacancies, ensure_ascii=False, indent=2)
+
+    items = _compact_fields(vacancies)
+    common = _common_fields(items)
+    for item in items:
+        for key in common:
+            item.pop(key, None)
+
+    if encoding == 'compact':
+        data = {'общее': common, 'вакансии': items} if common else {'вакансии': items}
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+    # table: колонки - все ключи в порядке первого появления
+    columns = list(dict.fromkeys(key for item in items for key in item))
+    lines = [f"{key}={_cell(value)}" for key, value in common.items()]
+    lines.append('\t'.join(columns))
+    for item in items:
+        lines.append('\t'.join(_cell(item.get(key, '')) for key in columns))
+    return '\n'.join(lines)
+
+
+def decode_vacancies(content: str) -> List[Dict]:
+    """
+    Вакансии из текста любого режима (для тестового сервера и проверок)
+
+    Возвращает поля с полными названиями; пропущенные поля не восстанавливаются.
+    """
+    content = content.strip()
+
+    if content.startswith('[') or content.startswith('{'):
+        data = json.loads(content)
+        if isinstance(data, list):
+            return data
+        common = data.get('общее', {})
+        items = [{**common, **item} for item in data.get('вакансии', [])]
+    else:
+        lines = content.split('\n')
+        common = {}
+        while lines and '\t' not in lines[0] and '=' in lines[0]:
+            key, value = lines.pop(0).split('=', 1)
+            common[key] = value
+        columns = lines[0].split('\t') if lines else []
+        items = [
+            {**common, **{k: v for k, v in zip(columns, line.split('\t')) if v}}
+            for line in lines[1:]
+        ]
+
+    return [{FIELD_NAMES.get(key, key): value for key, value in item.items()} for item in items]
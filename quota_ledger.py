@@ -0,0 +1,261 @@
+"""
+УЧЁТ КВОТЫ ПЛАТНЫХ API (2GIS)
+Постоянный журнал запросов с дневным и месячным окнами
++ планировщик, распределяющий остаток квоты по приоритету компаний
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка только между потоками одного процесса
+    fcntl = None
+
+
+# Лимиты по умолчанию: бесплатный тариф 2GIS - 1000 запросов в месяц
+DEFAULT_LIMITS = {
+    '2gis': {'daily': None, 'monthly': 1000}
+}
+
+
+class QuotaLedger:
+    """
+    Журнал расхода квоты API, общий для всех запусков (API, батч-скрипты)
+
+    Хранит счетчики по дням и месяцам в JSON файле. Списание идет под
+    блокировкой файла {ledger_file}.lock: журнал перечитывается, счетчик
+    увеличивается и файл сохраняется, пока другие процессы ждут.
+    """
+
+    def __init__(
+        self,
+        ledger_file: str = "api_quota_ledger.json",
+        limits: Optional[Dict[str, Dict[str, Optional[int]]]] = None
+    ):
+        """
+        Инициализация журнала
+
+        Args:
+            ledger_file: Файл журнала
+            limits: Лимиты по источникам, например {'2gis': {'daily': 50, 'monthly': 1000}}
+                    None в окне = без ограничения
+        """
+        self.ledger_file = ledger_file
+        self.lock_file = f"{ledger_file}.lock"
+        self.limits = limits or DEFAULT_LIMITS
+        self._mtime = None
+        self._thread_lock = threading.Lock()
+        self.ledger = self._load_ledger()
+
+    def _load_ledger(self) -> Dict:
+        """Загрузить журнал из файла"""
+        try:
+            path = Path(self.ledger_file)
+            if path.exists():
+                self._mtime = path.stat().st_mtime
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки журнала квоты: {e}")
+        return {}
+
+    def _save_ledger(self):
+        """Сохранить журнал (атомарно, через временный файл)"""
+        try:
+            tmp_file = f"{self.ledger_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.ledger, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.ledger_file)
+            self._mtime = Path(self.ledger_file).stat().st_mtime
+        except Exception as e:
+            print(f"⚠️ Ошибка сохранения журнала квоты: {e}")
+
+    def _refresh(self):
+        """Перечитать журнал, если его обновил другой процесс"""
+        path = Path(self.ledger_file)
+        if path.exists() and path.stat().st_mtime != self._mtime:
+            self.ledger = self._load_ledger()
+
+    @contextmanager
+    def _locked(self):
+        """
+        Монопольный доступ к журналу (потоки и процессы)
+
+        Внутри журнал перечитывается всегда: mtime может не измениться,
+        если два процесса записали файл в одну и ту же единицу времени.
+        """
+        with self._thread_lock:
+            if fcntl is None:
+                self.ledger = self._load_ledger()
+                yield
+                return
+
+            with open(self.lock_file, 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    self.ledger = self._load_ledger()
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _windows(now: Optional[datetime] = None) -> Tuple[str, str]:
+        """Ключи текущего дня и месяца"""
+        now = now or datetime.now()
+        return now.strftime('%Y-%m-%d'), now.strftime('%Y-%m')
+
+    def used(self, source: str) -> Dict[str, int]:
+        """Сколько запросов потрачено сегодня и в этом месяце"""
+        self._refresh()
+        return self._used(source)
+
+    def _used(self, source: str) -> Dict[str, int]:
+        day, month = self._windows()
+        entry = self.ledger.get(source, {})
+        return {
+            'daily': entry.get('days', {}).get(day, 0),
+            'monthly': entry.get('months', {}).get(month, 0)
+        }
+
+    def remaining(self, source: str) -> Optional[int]:
+        """
+        Остаток квоты (минимум по дневному и месячному окну)
+
+        Returns:
+            Количество доступных запросов или None, если лимитов нет
+        """
+        return self._remaining(source, self.used(source))
+
+    def _remaining(self, source: str, used: Dict[str, int]) -> Optional[int]:
+        limits = self.limits.get(source, {})
+
+        left = [
+            max(0, limit - used[window])
+            for window, limit in limits.items()
+            if limit is not None
+        ]
+
+        return min(left) if left else None
+
+    def can_spend(self, source: str, count: int = 1) -> bool:
+        """Можно ли потратить count запросов"""
+        left = self.remaining(source)
+        return left is None or left >= count
+
+    def reserve(self, source: str, count: int = 1) -> bool:
+        """
+        Проверить остаток и списать count запросов одним действием
+
+        В отличие от can_spend + spend, два процесса не могут одновременно
+        получить последние запросы квоты.
+
+        Returns:
+            True, если квота списана и запрос можно делать
+        """
+        with self._locked():
+            left = self._remaining(source, self._used(source))
+            if left is not None and left < count:
+                return False
+            self._add(source, count)
+            self._save_ledger()
+            return True
+
+    def spend(self, source: str, count: int = 1):
+        """Записать расход квоты"""
+        with self._locked():
+            self._add(source, count)
+            self._save_ledger()
+
+    def _add(self, source: str, count: int):
+        """Увеличить счетчики текущего дня и месяца (под _locked)"""
+        day, month = self._windows()
+
+        entry = self.ledger.setdefault(source, {'days': {}, 'months': {}})
+        entry['days'][day] = entry['days'].get(day, 0) + count
+        entry['months'][month] = entry['months'].get(month, 0) + count
+
+        # Храним только последние 31 день и 12 месяцев
+        entry['days'] = dict(sorted(entry['days'].items())[-31:])
+        entry['months'] = dict(sorted(entry['months'].items())[-12:])
+
+    def get_stats(self) -> Dict:
+        """Статистика по всем источникам с лимитами"""
+        return {
+            source: {
+                'used': self.used(source),
+                'limits': limits,
+                'remaining': self.remaining(source)
+            }
+            for source, limits in self.limits.items()
+        }
+
+
+class QuotaPlanner:
+    """
+    Планировщик расхода квоты
+
+    Отдает платный источник компаниям с наибольшим priority_score
+    (см. SmartContactsFinder.analyze_vacancies), остальные откладывает
+    на бесплатные источники.
+    """
+
+    def __init__(self, ledger: QuotaLedger, source: str = '2gis', reserve: int = 0):
+        """
+        Args:
+            ledger: Журнал квоты
+            source: Платный источник
+            reserve: Сколько запросов оставить в запасе
+        """
+        self.ledger = ledger
+        self.source = source
+        self.reserve = reserve
+
+    def plan(
+        self,
+        companies: List[Dict],
+        limit: Optional[int] = None,
+        cost: Optional[Callable[[Dict], int]] = None
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Разделить компании на платные и отложенные
+
+        Args:
+            companies: Компании с полем priority_score
+            limit: Дополнительный лимит запросов на этот запуск
+            cost: Стоимость компании в запросах (0 для уже закешированных)
+
+        Returns:
+            (компании для платного источника, компании для бесплатных источников)
+        """
+        budget = self.ledger.remaining(self.source)
+        if budget is not None:
+            budget = max(0, budget - self.reserve)
+        if limit is not None:
+            budget = limit if budget is None else min(budget, limit)
+
+        ranked = sorted(
+            companies,
+            key=lambda c: c.get('priority_score', 0),
+            reverse=True
+        )
+
+        paid = []
+        deferred = []
+
+        for company in ranked:
+            company_cost = cost(company) if cost else 1
+
+            if budget is None or company_cost <= budget:
+                paid.append(company)
+                if budget is not None:
+                    budget -= company_cost
+            else:
+                deferred.append(company)
+
+        return paid, deferred
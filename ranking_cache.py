@@ -0,0 +1,125 @@
+"""
+КЕШ РЕЗУЛЬТАТОВ РАНЖИРОВАНИЯ GPT
+Ключ - хеш версии промпта, модели и содержимого вакансии без id, ссылки
+и даты публикации. Повторный запуск, повтор после ошибки валидации и та же
+вакансия, перевыложенная под новым id, берут оценку из кеша без запроса.
+"""
+
+import json
+import os
+import hashlib
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+from datetime import datetime
+
+
+# Поля, которые меняются при перепубликации и не влияют на оценку
+VOLATILE_FIELDS = {'id', 'ссылка', 'дата_публикации'}
+
+
+def prompt_version(prompt: str) -> str:
+    """Версия промпта - хеш его текста: правка промпта сбрасывает кеш"""
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+
+
+class RankingCache:
+    """Кеш: хеш (промпт, модель, содержимое вакансии) -> результат ранжирования"""
+
+    def __init__(self, cache_file: str = "ranked_results/ranking_cache.json", save_every: int = 20):
+        """
+        Args:
+            cache_file: Файл кеша
+            save_every: Сохранять файл после стольких новых записей (и при save())
+        """
+        self.cache_file = cache_file
+        self.save_every = save_every
+        self.entries = self._load_cache()
+        self._dirty = 0
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stored': 0
+        }
+
+    def _load_cache(self) -> Dict:
+        """Загрузить кеш из файла"""
+        try:
+            if Path(self.cache_file).exists():
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки кеша ранжирования: {e}")
+        return {}
+
+    def save(self):
+        """Сохранить кеш, если были изменения (атомарно, через временный файл)"""
+        if not self._dirty:
+            return
+
+        try:
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+            self._dirty = 0
+        except Exception as e:
+            print(f"⚠️ Ошибка сохранения кеша ранжирования: {e}")
+
+    @staticmethod
+    def key(version: str, model: str, vacancy: Dict) -> str:
+        """Ключ вакансии: без служебных (_*) и изменчивых полей, порядок полей не важен"""
+        content = {
+            k: v for k, v in vacancy.items()
+            if not k.startswith('_') and k not in VOLATILE_FIELDS
+        }
+        payload = json.dumps([version, model, content], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, version: str, model: str, vacancy: Dict) -> Optional[Dict]:
+        """
+        Результат из кеша с vacancy_id текущей вакансии или None
+        """
+        entry = self.entries.get(self.key(version, model, vacancy))
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+
+        self.stats['hits'] += 1
+        return {**entry['result'], 'vacancy_id': vacancy.get('id', '')}
+
+    def put(self, version: str, model: str, vacancy: Dict, result: Dict):
+        """Сохранить принятый результат"""
+        self.entries[self.key(version, model, vacancy)] = {
+            'result': result,
+            'vacancy_id': vacancy.get('id', ''),
+            'cached_at': datetime.now().isoformat()
+        }
+        self.stats['stored'] += 1
+        self._dirty += 1
+        if self._dirty >= self.save_every:
+            self.save()
+
+    def split(self, version: str, model: str, vacancies: List[Dict]) -> Tuple[Dict[int, Dict], List[int]]:
+        """
+        Разделить вакансии на найденные в кеше и требующие запроса
+
+        Returns:
+            ({позиция: результат из кеша}, [позиции без результата])
+        """
+        cached = {}
+        missing = []
+        for position, vacancy in enumerate(vacancies):
+            result = self.get(version, model, vacancy)
+            if result is None:
+                missing.append(position)
+            else:
+                cached[position] = result
+        return cached, missing
+
+    def get_stats(self) -> Dict:
+        """Статистика кеша"""
+        return {
+            **self.stats,
+            'size': len(self.entries)
+        }
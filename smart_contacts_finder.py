@@ -11,27 +11,45 @@ from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
 from collections import Counter
+from quota_ledger import QuotaLedger, QuotaPlanner
+from org_index import OrgIndex
+from corpus_io import read_vacancies
 
 
 class SmartContactsFinder:
     """Умный поиск контактов с приоритизацией и альтернативными методами"""
     
-    def __init__(self, api_key_2gis: str, cache_file: str = "contacts_cache.json"):
+    def __init__(
+        self,
+        api_key_2gis: str,
+        cache_file: str = "contacts_cache.json",
+        quota_ledger: Optional[QuotaLedger] = None,
+        org_index: Optional[OrgIndex] = None
+    ):
         """
         Инициализация умного поисковика
         
         Args:
             api_key_2gis: API ключ 2GIS
             cache_file: Файл для кеширования результатов
+            quota_ledger: Журнал квоты 2GIS (общий для всех запусков)
+            org_index: Локальный индекс организаций 2GIS
         """
         self.api_key_2gis = api_key_2gis
         self.base_url_2gis = "https://catalog.api.2gis.com/3.0/items"
         self.cache_file = cache_file
         self.cache = self._load_cache()
         self.request_delay = 0.5
-        self.api_calls_count = 0
+        self.api_calls_count = 0  # Запросы текущего запуска
         self.api_limit = 1000  # Лимит бесплатных запросов
         
+        # Квота хранится между запусками (дневное и месячное окно)
+        self.quota = quota_ledger or QuotaLedger()
+        
+        # Все организации из ответов 2GIS, а не только первая
+        self.org_index = org_index or OrgIndex()
+        self.page_size_2gis = 10
+        
     def _load_cache(self) -> Dict:
         """Загрузить кеш из файла"""
         try:
@@ -63,8 +81,7 @@ class SmartContactsFinder:
         print("📊 Анализ вакансий для приоритизации...")
         
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                vacancies = json.load(f)
+            vacancies = read_vacancies(json_file)
         except Exception as e:
             print(f"❌ Ошибка чтения файла: {e}")
             return [], {}
@@ -140,19 +157,34 @@ class SmartContactsFinder:
         if cache_key in self.cache:
             return self.cache[cache_key]
         
-        # Проверяем лимит
+        # Проверяем индекс организаций из прошлых ответов 2GIS
+        region_id = self._get_region_id(city)
+        item = self.org_index.lookup(company_name, region_id)
+        if item:
+            contacts = self._extract_contacts_2gis(item, company_name)
+            self.cache[cache_key] = contacts
+            self._save_cache()
+            return contacts
+        
+        # Проверяем лимит (текущий запуск и общая квота)
         if self.api_calls_count >= self.api_limit:
             print(f"⚠️ Достигнут лимит API 2GIS ({self.api_limit} запросов)")
             return None
         
+        # Квота списывается до запроса: параллельные процессы не превысят лимит
+        if not self.quota.reserve('2gis'):
+            print("⚠️ Исчерпана квота 2GIS (см. api_quota_ledger.json)")
+            return None
+        
         # Делаем запрос к API
         try:
             params = {
                 'q': company_name,
                 'key': self.api_key_2gis,
                 'locale': 'ru_RU',
-                'fields': 'items.contact_groups,items.address,items.org',
-                'region_id': self._get_region_id(city)
+                'fields': 'items.contact_groups,items.address,items.org,items.name_ex',
+                'region_id': region_id,
+                'page_size': self.page_size_2gis
             }
             
             response = requests.get(self.base_url_2gis, params=params, timeout=10)
@@ -162,7 +194,10 @@ class SmartContactsFinder:
                 data = response.json()
                 
                 if data.get('result') and data['result'].get('items'):
-                    item = data['result']['items'][0]
+                    items = data['result']['items']
+                    self.org_index.add_items(items, region_id)
+                    
+                    item = self.org_index.lookup(company_name, region_id) or items[0]
                     contacts = self._extract_contacts_2gis(item, company_name)
                     
                     # Сохраняем в кеш
@@ -345,12 +380,29 @@ class SmartContactsFinder:
             print(f"   {i}. {salary_mark} {comp['company']} ({comp['vacancies_count']} вакансий)")
         print()
         
+        remaining = self.quota.remaining('2gis')
         print(f"🔍 Лимит 2GIS API: {api_limit} запросов")
+        print(f"📒 Остаток квоты 2GIS: {remaining if remaining is not None else 'без ограничений'}")
         print(f"📦 В кеше уже есть: {len([k for k in self.cache.keys() if k.startswith('2gis_')])} компаний")
         print()
         
-        # Определяем сколько компаний будем обрабатывать
-        companies_to_process = prioritized[:api_limit]
+        # Распределяем квоту: самые приоритетные компании идут в 2GIS,
+        # остальные - только в бесплатные источники.
+        # Компании из кеша квоту не тратят.
+        planner = QuotaPlanner(self.quota)
+        paid, deferred = planner.plan(
+            prioritized,
+            limit=api_limit,
+            cost=lambda c: 0 if f"2gis_{c['company']}_{city}" in self.cache else 1
+        )
+        
+        paid_names = {c['company'] for c in paid}
+        companies_to_process = paid + (deferred if use_alternative else [])
+        
+        print(f"💳 Через 2GIS: {len(paid)} компаний")
+        if use_alternative:
+            print(f"🆓 Только бесплатные источники: {len(deferred)} компаний")
+        print()
         
         response = input(f"Обработать {len(companies_to_process)} приоритетных компаний? (да/нет): ").strip().lower()
         if response not in ['да', 'yes', 'y', 'д']:
@@ -365,8 +417,7 @@ class SmartContactsFinder:
         total = len(companies_to_process)
         
         # Загружаем вакансии для альтернативного поиска
-        with open(json_file, 'r', encoding='utf-8') as f:
-            vacancies = json.load(f)
+        vacancies = read_vacancies(json_file)
         
         vacancy_links = {}
         for v in vacancies:
@@ -379,8 +430,10 @@ class SmartContactsFinder:
             
             print(f"[{i}/{total}] {company}...", end=' ')
             
-            # Сначала пробуем 2GIS
-            contacts = self.search_company_2gis(company, city)
+            # Сначала пробуем 2GIS (если компании досталась квота)
+            contacts = None
+            if company in paid_names:
+                contacts = self.search_company_2gis(company, city)
             
             if contacts and contacts.get('found'):
                 print(f"✓ 2GIS (тел: {len(contacts.get('phones', []))}, email: {len(contacts.get('emails', []))})")
@@ -400,12 +453,14 @@ class SmartContactsFinder:
                 if contacts:
                     results.append(contacts)
             
-            # Проверка лимита
-            if self.api_calls_count >= api_limit:
+            # Проверка лимита: дальше - только бесплатные источники
+            if self.api_calls_count >= api_limit and paid_names:
                 print()
                 print(f"⚠️ Достигнут лимит API ({api_limit} запросов)")
                 print(f"Обработано компаний: {i}/{total}")
-                break
+                if not use_alternative:
+                    break
+                paid_names = set()
         
         print()
         print(f"✅ Использовано API запросов: {self.api_calls_count}/{api_limit}")
@@ -417,6 +472,7 @@ class SmartContactsFinder:
             'found_alternative': len([r for r in results if r.get('source') == 'alternative' and r.get('found')]),
             'not_found': len([r for r in results if not r.get('found')]),
             'api_calls_used': self.api_calls_count,
+            'org_index_hits': self.org_index.stats['hits'],
             'with_phones': len([r for r in results if r.get('phones')]),
             'with_emails': len([r for r in results if r.get('emails')]),
             'with_websites': len([r for r in results if r.get('websites')])
@@ -0,0 +1,97 @@
+"""
+ОЦЕНКА ТОКЕНОВ И СОКРАЩЕНИЕ ОПИСАНИЙ ДЛЯ GPT
+Без сетевого токенизатора: если установлен tiktoken - точный подсчет,
+иначе оценка по символам (кириллица ~3 символа на токен, латиница ~4).
+Длинные описания сокращаются до лимита: сначала убираются разделы
+"Условия", "Мы предлагаем", "О компании" (на оценку почти не влияют),
+затем текст обрезается по границе предложения.
+"""
+
+import re
+from typing import List, Tuple
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")  # gpt-4o / gpt-4o-mini
+except Exception:
+    _encoding = None
+
+
+CYRILLIC_CHARS_PER_TOKEN = 3.0
+OTHER_CHARS_PER_TOKEN = 4.0
+
+CYRILLIC_PATTERN = re.compile(r'[а-яёА-ЯЁ]')
+
+# Заголовки разделов описания HH ("Обязанности:", "Условия:" ...)
+SECTION_PATTERN = re.compile(
+    r'(?:Обязанности|Задачи|Чем предстоит заниматься|Что нужно делать|Требования|Мы ждем|Ожидания'
+    r'|Условия|Мы предлагаем|Что мы предлагаем|Предлагаем|О компании|О нас|Бонусы|Преимущества)\s*:',
+    re.IGNORECASE
+)
+
+# Разделы, которые убираются первыми
+LOW_VALUE_SECTIONS = ('условия', 'мы предлагаем', 'что мы предлагаем', 'предлагаем',
+                      'о компании', 'о нас', 'бонусы', 'преимущества')
+
+SENTENCE_END = re.compile(r'[.!?;](?=\s|$)')
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценка числа токенов текста"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+
+    cyrillic = len(CYRILLIC_PATTERN.findall(text))
+    return int(cyrillic / CYRILLIC_CHARS_PER_TOKEN + (len(text) - cyrillic) / OTHER_CHARS_PER_TOKEN) + 1
+
+
+def _sections(text: str) -> List[Tuple[str, str]]:
+    """Разделы описания: [(заголовок в нижнем регистре или '', текст раздела)]"""
+    sections = []
+    start = 0
+    title = ''
+    for match in SECTION_PATTERN.finditer(text):
+        if match.start() > start:
+            sections.append((title, text[start:match.start()]))
+        title = match.group(0).rstrip(': ').lower()
+        start = match.start()
+    sections.append((title, text[start:]))
+    return sections
+
+
+def trim_text(text: str, max_tokens: int) -> str:
+    """
+    Сократить описание до max_tokens токенов
+
+    Сначала убираются малоинформативные разделы (с конца), затем текст
+    обрезается по последней границе предложения в пределах лимита.
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+
+    sections = _sections(text)
+    for index in range(len(sections) - 1, -1, -1):
+        if sections[index][0] in LOW_VALUE_SECTIONS:
+            removed = estimate_tokens(sections[index][1])
+            sections[index] = (sections[index][0], '')
+            tokens -= removed
+            if tokens <= max_tokens:
+                break
+
+    text = ''.join(section for _, section in sections).strip()
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    # Символов на токен в этом тексте - чтобы не подбирать длину перебором
+    limit = int(len(text) * max_tokens / estimate_tokens(text))
+    cut = text[:limit]
+    ends = [m.end() for m in SENTENCE_END.finditer(cut)]
+    if ends and ends[-1] > limit // 2:
+        cut = cut[:ends[-1]]
+    else:
+        cut = cut[:cut.rfind(' ')] if ' ' in cut else cut
+
+    return cut.rstrip() + ' …'
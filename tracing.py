@@ -0,0 +1,267 @@
+"""
+ТРАССИРОВКА ЗАПРОСОВ ПО ЭТАПАМ
+Легкие спаны на contextvars: запрос API открывает трассу, вложенные
+этапы (страницы поиска HH.ru, детали вакансий, паузы, дедупликация,
+сортировка, источники контактов) пишут в нее время. По трассе видно,
+куда ушли минуты конкретного запроса.
+
+Вне трассы span() ничего не делает, поэтому парсер и движок контактов
+в скриптах работают как раньше.
+
+Экспорт (TRACE_EXPORT):
+    json - трасса строкой в TRACE_FILE (по умолчанию traces.jsonl)
+    otlp - OTLP/HTTP JSON на OTEL_EXPORTER_OTLP_ENDPOINT
+           (по умолчанию http://127.0.0.1:4318/v1/traces, локальный коллектор)
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional
+
+import requests
+
+
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://127.0.0.1:4318").rstrip('/') + "/v1/traces"
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "hh-parser-api")
+
+# Спанов в одной трассе для экспорта; остальные учитываются только в сводке этапов
+MAX_SPANS_PER_TRACE = 5000
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+_file_lock = threading.Lock()
+
+
+class Span:
+    """Один этап: имя, время, атрибуты и родитель"""
+
+    __slots__ = ('trace', 'name', 'span_id', 'parent', 'attributes', 'start_ns', '_started',
+                 'duration_ns', 'children_ns', 'error')
+
+    def __init__(self, trace: 'Trace', name: str, parent: Optional['Span'], attributes: Dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent = parent
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter_ns()
+        self.duration_ns = None
+        self.children_ns = 0
+        self.error = None
+
+    def set(self, **attributes):
+        """Добавить атрибуты (число найденных вакансий и т.п.)"""
+        self.attributes.update(attributes)
+
+    def finish(self):
+        self.duration_ns = time.perf_counter_ns() - self._started
+        if self.parent is not None:
+            self.parent.children_ns += self.duration_ns
+        self.trace._finish(self)
+
+
+class Trace:
+    """Спаны одного запроса и сводка по этапам"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.root: Optional[Span] = None
+        self.dropped = 0
+        # имя этапа -> [число спанов, общее время, собственное время без вложенных этапов]
+        self.stages: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def _finish(self, span: Span):
+        with self._lock:
+            stage = self.stages.setdefault(span.name, [0, 0, 0])
+            stage[0] += 1
+            stage[1] += span.duration_ns
+            stage[2] += span.duration_ns - span.children_ns
+            if len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def timings(self) -> Dict:
+        """
+        Сводка для ответа API
+
+        total_ms этапа включает вложенные этапы (hh.detail содержит hh.sleep),
+        self_ms - только собственное время.
+        """
+        with self._lock:
+            stages = {
+                name: {
+                    'count': count,
+                    'total_ms': round(total / 1e6, 1),
+                    'self_ms': round(own / 1e6, 1)
+                }
+                for name, (count, total, own) in sorted(self.stages.items(), key=lambda item: -item[1][1])
+                if self.root is None or name != self.root.name
+            }
+        total_ms = None
+        if self.root is not None:
+            # Трасса может быть еще открыта (сводка для ответа того же запроса)
+            duration = self.root.duration_ns or time.perf_counter_ns() - self.root._started
+            total_ms = round(duration / 1e6, 1)
+        return {
+            'trace_id': self.trace_id,
+            'total_ms': total_ms,
+            'stages': stages
+        }
+
+    def to_json(self) -> Dict:
+        """Трасса для TRACE_EXPORT=json"""
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'timings': self.timings(),
+            'dropped_spans': self.dropped,
+            'spans': [
+                {
+                    'span_id': span.span_id,
+                    'parent_id': span.parent.span_id if span.parent else None,
+                    'name': span.name,
+                    'start_ns': span.start_ns,
+                    'duration_ms': round(span.duration_ns / 1e6, 3),
+                    'attributes': span.attributes,
+                    'error': span.error
+                }
+                for span in self.spans
+            ]
+        }
+
+    def to_otlp(self) -> Dict:
+        """Трасса в OTLP/HTTP JSON"""
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [_otlp_attribute('service.name', SERVICE_NAME)]},
+                'scopeSpans': [{
+                    'scope': {'name': 'hh_parser.tracing'},
+                    'spans': [
+                        {
+                            'traceId': self.trace_id,
+                            'spanId': span.span_id,
+                            'parentSpanId': span.parent.span_id if span.parent else '',
+                            'name': span.name,
+                            'kind': 1,
+                            'startTimeUnixNano': str(span.start_ns),
+                            'endTimeUnixNano': str(span.start_ns + span.duration_ns),
+                            'attributes': [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+                            'status': {'code': 2, 'message': span.error} if span.error else {'code': 1}
+                        }
+                        for span in self.spans
+                    ]
+                }]
+            }]
+        }
+
+
+def _otlp_attribute(key: str, value) -> Dict:
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+def export_enabled() -> bool:
+    """Трассы экспортируются (тогда запросы трассируются всегда)"""
+    return TRACE_EXPORT in ('json', 'otlp')
+
+
+def current_trace() -> Optional[Trace]:
+    span = _current_span.get()
+    return span.trace if span else None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Этап внутри текущей трассы; вне трассы ничего не делает"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    current = Span(parent.trace, name, parent, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+
+
+def traced(name: str):
+    """Декоратор: вызов функции - этап трассы"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def start_trace(name: str, enabled: bool = True, **attributes):
+    """
+    Открыть трассу запроса
+
+    Args:
+        name: Имя корневого спана ("POST /api/search")
+        enabled: False - трасса не создается (вложенные span() ничего не делают)
+        **attributes: Атрибуты корневого спана
+
+    Yields:
+        Trace или None
+    """
+    if not enabled:
+        yield None
+        return
+
+    trace = Trace(name)
+    root = Span(trace, name, None, attributes)
+    trace.root = root
+    token = _current_span.set(root)
+    try:
+        yield trace
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        _current_span.reset(token)
+        root.finish()
+        export(trace)
+
+
+def export(trace: Trace):
+    """Выгрузить трассу согласно TRACE_EXPORT (OTLP - в фоне, чтобы не задерживать ответ)"""
+    if TRACE_EXPORT == 'json':
+        line = json.dumps(trace.to_json(), ensure_ascii=False, default=str)
+        with _file_lock:
+            with open(TRACE_FILE, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+    elif TRACE_EXPORT == 'otlp':
+        threading.Thread(target=_send_otlp, args=(trace.to_otlp(),), daemon=True).start()
+
+
+def _send_otlp(payload: Dict):
+    try:
+        requests.post(OTLP_ENDPOINT, json=payload, timeout=5)
+    except requests.RequestException as e:
+        print(f"⚠️ Не удалось отправить трассу в {OTLP_ENDPOINT}: {e}")
@@ -6,6 +6,7 @@
 import json
 import re
 from typing import List, Dict
+from corpus_io import iter_vacancies
 
 
 def parse_vacancies_txt(txt_file: str) -> List[Dict]:
@@ -104,7 +105,7 @@ def extract_companies_list(json_file: str, output_file: str = "companies_list.tx
     Извлечь список уникальных компаний из JSON файла
     
     Args:
-        json_file: JSON файл с вакансиями
+        json_file: Файл с вакансиями (.json, .jsonl, .jsonl.gz)
         output_file: Текстовый файл со списком компаний
     """
     print("=" * 60)
@@ -113,11 +114,8 @@ def extract_companies_list(json_file: str, output_file: str = "companies_list.tx
     print()
     
     try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            vacancies = json.load(f)
-        
         companies = set()
-        for vacancy in vacancies:
+        for vacancy in iter_vacancies(json_file):
             company = vacancy.get('компания', '').strip()
             if company:
                 companies.add(company)
@@ -0,0 +1,390 @@
+"""
+ЛОКАЛЬНОЕ ХРАНИЛИЩЕ ВАКАНСИЙ
+SQLite с полнотекстовым индексом FTS5 по названию и описанию. Каждый
+запуск HHParser сохраняет сюда полученные вакансии, поэтому:
+    - повторный поиск запрашивает у HH.ru детали только новых и
+      перевыложенных вакансий (остальные берутся отсюда);
+    - /api/search с source=local отвечает из хранилища за миллисекунды,
+      без обращения к HH.ru.
+
+Кроме полной вакансии хранятся колонки для фильтров: работодатель,
+регион, вилка зарплаты и дата публикации (все с индексами).
+
+Файл - VACANCY_STORE_FILE (по умолчанию vacancy_store.sqlite),
+пустое значение выключает хранилище.
+
+Использование:
+    python vacancy_store.py import vacancies_all.jsonl.gz    # загрузить прошлые выгрузки
+    (регион берется из area_id; старые выгрузки без него находятся только без --area или с --area 113)
+    python vacancy_store.py search "CRM оператор" --area 1 --period 7
+    python vacancy_store.py stats
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Dict, Iterable, List, Optional
+
+from corpus_io import iter_vacancies
+
+
+VACANCY_STORE_FILE = os.getenv("VACANCY_STORE_FILE", "vacancy_store.sqlite")
+
+# Вакансий в одной транзакции при импорте
+IMPORT_CHUNK = 1000
+
+# "Россия": вакансии всех регионов
+AREA_ALL = 113
+
+# Дата публикации хранится в UTC, чтобы сравнивать строки
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# Окончания, которые отбрасываются перед поиском по префиксу (заявки -> заявк*)
+_ENDINGS = 'аеёиийоуыьэюя'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vacancies (
+    id TEXT PRIMARY KEY,
+    название TEXT NOT NULL DEFAULT '',
+    описание TEXT NOT NULL DEFAULT '',
+    employer_id TEXT,
+    area_id INTEGER,
+    salary_from INTEGER,
+    salary_to INTEGER,
+    published_at TEXT,
+    fetched_at TEXT NOT NULL,
+    seen_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_vacancies_employer ON vacancies (employer_id);
+CREATE INDEX IF NOT EXISTS idx_vacancies_area ON vacancies (area_id, published_at);
+CREATE INDEX IF NOT EXISTS idx_vacancies_salary_from ON vacancies (salary_from);
+CREATE INDEX IF NOT EXISTS idx_vacancies_salary_to ON vacancies (salary_to);
+CREATE INDEX IF NOT EXISTS idx_vacancies_published ON vacancies (published_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS vacancies_fts USING fts5(
+    название, описание, content='vacancies', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS vacancies_ai AFTER INSERT ON vacancies BEGIN
+    INSERT INTO vacancies_fts (rowid, название, описание) VALUES (new.rowid, new.название, new.описание);
+END;
+CREATE TRIGGER IF NOT EXISTS vacancies_ad AFTER DELETE ON vacancies BEGIN
+    INSERT INTO vacancies_fts (vacancies_fts, rowid, название, описание)
+    VALUES ('delete', old.rowid, old.название, old.описание);
+END;
+CREATE TRIGGER IF NOT EXISTS vacancies_au AFTER UPDATE OF название, описание ON vacancies BEGIN
+    INSERT INTO vacancies_fts (vacancies_fts, rowid, название, описание)
+    VALUES ('delete', old.rowid, old.название, old.описание);
+    INSERT INTO vacancies_fts (rowid, название, описание) VALUES (new.rowid, new.название, new.описание);
+END;
+"""
+
+
+def normalize_date(value: Optional[str]) -> Optional[str]:
+    """'2025-12-01T10:00:00+0300' -> '2025-12-01T07:00:00' (UTC)"""
+    if not value:
+        return None
+    try:
+        date = datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z')
+    except ValueError:
+        return value
+    return date.astimezone(timezone.utc).strftime(DATE_FORMAT)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime(DATE_FORMAT)
+
+
+def _salary_from_text(text: str):
+    """Вилка из строки HHParser._format_salary ('от 50 000 руб.', '50 000 - 80 000 руб.')"""
+    numbers = [int(n.replace(' ', '')) for n in re.findall(r'\d[\d ]*\d|\d', text or '')]
+    if not numbers:
+        return None, None
+    if text.startswith('до '):
+        return None, numbers[0]
+    if text.startswith('от '):
+        return numbers[0], None
+    return numbers[0], numbers[-1]
+
+
+def _fts_terms(text: str) -> List[str]:
+    """
+    Слова запроса для FTS5: без окончаний и с поиском по префиксу
+
+    Это не морфология: у FTS5 нет русского стеммера, отбрасываются только
+    конечные гласные. Формы с другой основой не находятся ("заявки" ->
+    "заявк"* не совпадает с "заявок").
+    """
+    terms = []
+    for word in re.findall(r'\w+', (text or '').lower()):
+        stem = word
+        while len(stem) > 4 and stem[-1] in _ENDINGS and len(word) - len(stem) < 2:
+            stem = stem[:-1]
+        terms.append(f'"{stem}"*')
+    return terms
+
+
+class VacancyStore:
+    """Вакансии всех запусков парсера в SQLite с полнотекстовым поиском"""
+
+    def __init__(self, db_file: str = VACANCY_STORE_FILE):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        # Одно соединение на процесс: API и парсер могут работать из разных потоков
+        self.db = sqlite3.connect(db_file, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def save(self, vacancy: Dict, raw: Optional[Dict] = None):
+        """
+        Сохранить вакансию (новую или обновленную)
+
+        Args:
+            vacancy: Вакансия в формате HHParser.get_vacancy_details
+            raw: Ответ HH.ru /vacancies/{id} - регион и вилка зарплаты берутся из него
+        """
+        self.save_many([(vacancy, raw)])
+
+    def save_many(self, items: Iterable) -> int:
+        """Сохранить пары (вакансия, ответ HH.ru или None) одной транзакцией"""
+        now = _now()
+        rows = []
+        for vacancy, raw in items:
+            if raw is not None:
+                salary = raw.get('salary') or {}
+                salary_from, salary_to = salary.get('from'), salary.get('to')
+                area_id = (raw.get('area') or {}).get('id')
+            else:
+                salary_from, salary_to = _salary_from_text(vacancy.get('оплата', ''))
+                # Регион есть только в выгрузках HHParser с полем area_id
+                area_id = vacancy.get('area_id')
+            rows.append((
+                str(vacancy['id']), vacancy.get('название', ''), vacancy.get('описание', ''),
+                str(vacancy.get('employer_id') or '') or None,
+                int(area_id) if area_id else None, salary_from, salary_to,
+                normalize_date(vacancy.get('дата_публикации')), now, now,
+                json.dumps(vacancy, ensure_ascii=False)
+            ))
+
+        with self._lock, self.db:
+            self.db.executemany(
+                """
+                INSERT INTO vacancies (id, название, описание, employer_id, area_id, salary_from,
+                                       salary_to, published_at, fetched_at, seen_at, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    название = excluded.название, описание = excluded.описание,
+                    employer_id = excluded.employer_id,
+                    area_id = COALESCE(excluded.area_id, vacancies.area_id),
+                    salary_from = excluded.salary_from, salary_to = excluded.salary_to,
+                    published_at = excluded.published_at, fetched_at = excluded.fetched_at,
+                    seen_at = excluded.seen_at, data = excluded.data
+                """,
+                rows
+            )
+        return len(rows)
+
+    def unchanged(self, items: List[Dict]) -> Dict[str, Dict]:
+        """
+        Сохраненные вакансии для элементов страницы поиска HH.ru, которые не менялись
+
+        Вакансия считается прежней, если в хранилище она есть с той же датой
+        публикации (перевыложенную HH.ru публикует с новой датой). Найденным
+        обновляется время, когда их последний раз видели в выдаче.
+
+        Returns:
+            {id: вакансия} - детали этих вакансий запрашивать не нужно
+        """
+        published = {str(item['id']): normalize_date(item.get('published_at')) for item in items}
+        published = {vacancy_id: date for vacancy_id, date in published.items() if date}
+        if not published:
+            return {}
+
+        placeholders = ','.join('?' * len(published))
+        with self._lock:
+            rows = self.db.execute(
+                f"SELECT id, published_at, data FROM vacancies WHERE id IN ({placeholders})",
+                list(published)
+            ).fetchall()
+            found = {
+                vacancy_id: json.loads(data)
+                for vacancy_id, published_at, data in rows
+                if published_at == published[vacancy_id]
+            }
+            if found:
+                with self.db:
+                    self.db.executemany(
+                        "UPDATE vacancies SET seen_at = ? WHERE id = ?",
+                        [(_now(), vacancy_id) for vacancy_id in found]
+                    )
+        return found
+
+    def get(self, vacancy_id) -> Optional[Dict]:
+        with self._lock:
+            row = self.db.execute("SELECT data FROM vacancies WHERE id = ?", (str(vacancy_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def search(
+        self,
+        keywords: Optional[str] = None,
+        area: Optional[int] = None,
+        salary: Optional[int] = None,
+        only_with_salary: bool = False,
+        period: Optional[int] = None,
+        excluded_text: Optional[str] = None,
+        employer_id: Optional[str] = None,
+        limit: int = 10000
+    ) -> List[Dict]:
+        """
+        Поиск по хранилищу с теми же параметрами, что HHParser.search_vacancies
+
+        Слова запроса должны встречаться все (в любой форме: поиск по основе),
+        исключенные слова - ни одно. Зарплата как на HH.ru: вилка покрывает
+        salary, вакансии без зарплаты остаются, если не only_with_salary.
+
+        Returns:
+            Вакансии, свежие первыми
+        """
+        conditions = []
+        params = []
+
+        terms = _fts_terms(keywords)
+        if terms:
+            conditions.append("rowid IN (SELECT rowid FROM vacancies_fts WHERE vacancies_fts MATCH ?)")
+            params.append(' AND '.join(terms))
+
+        excluded = _fts_terms(excluded_text.replace(',', ' ') if excluded_text else '')
+        if excluded:
+            conditions.append("rowid NOT IN (SELECT rowid FROM vacancies_fts WHERE vacancies_fts MATCH ?)")
+            params.append(' OR '.join(excluded))
+
+        if area and area != AREA_ALL:
+            conditions.append("area_id = ?")
+            params.append(area)
+
+        if only_with_salary:
+            conditions.append("(salary_from IS NOT NULL OR salary_to IS NOT NULL)")
+        if salary:
+            conditions.append(
+                "((salary_from IS NULL AND salary_to IS NULL) OR COALESCE(salary_to, salary_from) >= ?)"
+            )
+            params.append(salary)
+
+        if period:
+            since = datetime.now(timezone.utc) - timedelta(days=period)
+            conditions.append("published_at >= ?")
+            params.append(since.strftime(DATE_FORMAT))
+
+        if employer_id:
+            conditions.append("employer_id = ?")
+            params.append(str(employer_id))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self.db.execute(
+                f"SELECT data FROM vacancies {where} ORDER BY published_at DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            count, employers, without_area, oldest, newest, last_fetch = self.db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT employer_id), COUNT(*) - COUNT(area_id), "
+                "MIN(published_at), MAX(published_at), MAX(fetched_at) FROM vacancies"
+            ).fetchone()
+        return {
+            'vacancies': count,
+            'employers': employers,
+            'without_area': without_area,
+            'oldest_published': oldest,
+            'newest_published': newest,
+            'last_fetched': last_fetch,
+            'size_mb': round(os.path.getsize(self.db_file) / 1024 / 1024, 1) if os.path.exists(self.db_file) else 0
+        }
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def default_store() -> Optional[VacancyStore]:
+    """Общее хранилище процесса (None, если VACANCY_STORE_FILE пустой)"""
+    global _default_store
+    if not VACANCY_STORE_FILE:
+        return None
+    with _default_lock:
+        if _default_store is None:
+            _default_store = VacancyStore(VACANCY_STORE_FILE)
+        return _default_store
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Локальное хранилище вакансий")
+    arg_parser.add_argument('--db', default=VACANCY_STORE_FILE or "vacancy_store.sqlite", help="Файл SQLite")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    load = commands.add_parser('import', help="Загрузить вакансии из файлов (.json, .jsonl, .jsonl.gz)")
+    load.add_argument('files', nargs='+')
+
+    search = commands.add_parser('search', help="Поиск по хранилищу")
+    search.add_argument('keywords', nargs='?', default='')
+    search.add_argument('--area', type=int, default=None)
+    search.add_argument('--salary', type=int, default=None)
+    search.add_argument('--period', type=int, default=None)
+    search.add_argument('--exclude', default=None)
+    search.add_argument('--limit', type=int, default=20)
+
+    commands.add_parser('stats', help="Сколько вакансий в хранилище")
+
+    args = arg_parser.parse_args()
+    store = VacancyStore(args.db)
+
+    if args.command == 'import':
+        for path in args.files:
+            vacancies = iter_vacancies(path)
+            count = 0
+            # Частями, чтобы не держать весь корпус в памяти
+            while True:
+                chunk = [(vacancy, None) for vacancy in islice(vacancies, IMPORT_CHUNK)]
+                if not chunk:
+                    break
+                count += store.save_many(chunk)
+            print(f"✅ {path}: {count} вакансий")
+        print(f"📦 В хранилище: {store.stats()['vacancies']}")
+
+    elif args.command == 'search':
+        if args.area and args.area != AREA_ALL:
+            without_area = store.stats()['without_area']
+            if without_area:
+                print(f"⚠️ {without_area} вакансий без региона (импорт старых выгрузок) не попадут в поиск с --area")
+        start = time.perf_counter()
+        vacancies = store.search(
+            args.keywords, area=args.area, salary=args.salary,
+            period=args.period, excluded_text=args.exclude, limit=args.limit
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        for vacancy in vacancies:
+            print(f"{vacancy.get('дата_публикации', '')[:10]}  {vacancy['название']} - {vacancy['компания']} ({vacancy['оплата']})")
+        print(f"\n🔍 Найдено: {len(vacancies)} за {elapsed:.1f} мс")
+
+    else:
+        for key, value in store.stats().items():
+            print(f"{key}: {value}")
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
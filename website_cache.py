@@ -0,0 +1,148 @@
+"""
+КЕШ РАСПАРСЕННЫХ СТРАНИЦ САЙТОВ
+Хранит ETag, Last-Modified и хеш тела страницы вместе с найденными
+контактами. Повторная загрузка идет условным запросом: на 304 или
+неизменившийся хеш контакты берутся из кеша без разбора HTML.
+"""
+
+import json
+import os
+import hashlib
+import threading
+from typing import Dict, List, Optional
+from pathlib import Path
+from datetime import datetime
+
+
+class WebsiteCache:
+    """Кеш страниц: URL запроса -> валидаторы, хеш тела, контакты и ссылки"""
+
+    def __init__(self, cache_file: str = "website_cache.json", save_every: int = 50):
+        """
+        Args:
+            cache_file: Файл кеша
+            save_every: Сохранять файл после стольких изменений (и при save())
+        """
+        self.cache_file = cache_file
+        self.save_every = save_every
+        self.entries = self._load_cache()
+        self._dirty = 0
+        # Кеш общий для потоков обхода сайта: изменения записей и снимок
+        # для сохранения - под _lock, запись файла - под _save_lock
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+        self.stats = {
+            'not_modified': 0,  # 304 от сервера
+            'unchanged': 0,     # 200, но хеш тела тот же
+            'parsed': 0         # страница разобрана заново
+        }
+
+    def _load_cache(self) -> Dict:
+        """Загрузить кеш из файла"""
+        try:
+            if Path(self.cache_file).exists():
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки кеша сайтов: {e}")
+        return {}
+
+    def save(self):
+        """Сохранить кеш, если были изменения (атомарно, через временный файл)"""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                snapshot = json.dumps(self.entries, ensure_ascii=False)
+                saved = self._dirty
+
+            try:
+                tmp_file = f"{self.cache_file}.tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    f.write(snapshot)
+                os.replace(tmp_file, self.cache_file)
+                with self._lock:
+                    self._dirty -= saved
+            except Exception as e:
+                print(f"⚠️ Ошибка сохранения кеша сайтов: {e}")
+
+    def _changed(self) -> bool:
+        """Отметить изменение (под _lock); True - пора сохранить файл"""
+        self._dirty += 1
+        return self._dirty >= self.save_every
+
+    @staticmethod
+    def body_hash(body: bytes) -> str:
+        """Хеш тела страницы"""
+        return hashlib.sha1(body).hexdigest()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Запись кеша для URL или None"""
+        return self.entries.get(url)
+
+    def conditional_headers(self, entry: Optional[Dict]) -> Dict[str, str]:
+        """Заголовки условного запроса по сохраненным валидаторам"""
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def revalidated(self, url: str, entry: Dict, headers, not_modified: bool):
+        """
+        Страница не изменилась (304 или тот же хеш)
+
+        Обновляет валидаторы, если сервер прислал новые.
+        """
+        etag = headers.get('ETag') or entry.get('etag')
+        last_modified = headers.get('Last-Modified') or entry.get('last_modified')
+        need_save = False
+
+        with self._lock:
+            self.stats['not_modified' if not_modified else 'unchanged'] += 1
+            if etag != entry.get('etag') or last_modified != entry.get('last_modified'):
+                entry['etag'] = etag
+                entry['last_modified'] = last_modified
+                entry['checked_at'] = datetime.now().isoformat()
+                need_save = self._changed()
+
+        if need_save:
+            self.save()
+
+    def put(
+        self,
+        url: str,
+        final_url: str,
+        headers,
+        digest: str,
+        contacts: Dict[str, List[str]],
+        links: List[str]
+    ):
+        """Сохранить результат разбора страницы"""
+        entry = {
+            'final_url': final_url,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'sha1': digest,
+            'contacts': contacts,
+            'links': links,
+            'checked_at': datetime.now().isoformat()
+        }
+        with self._lock:
+            self.stats['parsed'] += 1
+            self.entries[url] = entry
+            need_save = self._changed()
+
+        if need_save:
+            self.save()
+
+    def get_stats(self) -> Dict:
+        """Статистика кеша"""
+        with self._lock:
+            return {
+                **self.stats,
+                'size': len(self.entries)
+            }
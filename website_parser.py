@@ -4,105 +4,165 @@
 """
 
 import re
+import asyncio
 import requests
-from typing import Dict, List, Optional
-from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, urljoin
 import time
 
+from website_cache import WebsiteCache
+from http_recorder import install_from_env
+from metrics import track_upstream, cache_lookup, QUEUE_DEPTH
+
+try:
+    import aiohttp
+except ImportError:  # без aiohttp сайты парсятся последовательно
+    aiohttp = None
+
+
+# Однопроходный сканер контактов.
+# Кандидаты ищутся не регулярками, а str.find по коротким литералам
+# (это в разы быстрее), телефоны - одним скомпилированным паттерном.
+# Кандидаты обходятся в порядке документа, в каждой позиции проверяется
+# точный паттерн того же вида, что и раньше. После совпадения кандидаты
+# внутри него пропускаются, поэтому домен из email не считается
+# Telegram-ником, а номер из wa.me не ищется повторно.
+# (литерал, сдвиг начала контакта относительно литерала, тип)
+CONTACT_TRIGGERS = (
+    ('@', 0, 'at'),
+    ('.me/', 0, 'me'), ('.ME/', 0, 'me'), ('.Me/', 0, 'me'),
+    ('g://', -1, 'tg'), ('G://', -1, 'tg'),
+    ('atsapp', -2, 'whatsapp'), ('atsApp', -2, 'whatsapp'), ('ATSAPP', -2, 'whatsapp'),
+)
+
+EMAIL_LOCAL_TAIL = re.compile(r'[A-Za-z0-9._%+-]+$')
+EMAIL = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+TELEGRAM_AT = re.compile(r'@([a-zA-Z0-9_]{5,32})')
+TELEGRAM_LINK = re.compile(r'\.me/([a-zA-Z0-9_]+)', re.IGNORECASE)
+TELEGRAM_RESOLVE = re.compile(r'tg://resolve\?domain=([a-zA-Z0-9_]+)', re.IGNORECASE)
+WHATSAPP_LINK = re.compile(r'\.me/(\+?[0-9]{10,15})', re.IGNORECASE)
+WHATSAPP_API = re.compile(
+    r'(?:(?<=api\.)whatsapp\.com/send|whatsapp://send)\?phone=(\+?[0-9]{10,15})'
+    r'|(?<=chat\.)whatsapp\.com/([a-zA-Z0-9]+)',
+    re.IGNORECASE
+)
+PHONE = re.compile(r'(?:\+7|8)[\s-]?\(?[0-9]{3}\)?[\s-]?[0-9]{3}[\s-]?[0-9]{2}[\s-]?[0-9]{2}')
+
+PHONE_PATTERN = re.compile(r'(?:\+7|8)[0-9]{10}')
+NON_PHONE_CHARS = re.compile(r'[^\d+]')
+TELEGRAM_USERNAME = re.compile(r'^[a-zA-Z0-9_]+$')
+
+# Сколько контактов каждого типа оставлять
+CONTACT_LIMITS = {'telegram': 5, 'whatsapp': 3, 'phones': 5, 'emails': 5}
+
+# Ссылки на страницы, где обычно лежат мессенджеры (в href или тексте ссылки).
+# Чем раньше слово в списке, тем выше приоритет страницы.
+CONTACT_LINK_KEYWORDS = (
+    'contact', 'kontakt', 'контакт', 'svyaz', 'связ',
+    'rekvizit', 'requisite', 'реквизит',
+    'about', 'o-kompanii', 'o-nas', 'о компании', 'о нас',
+)
+LINK_PATTERN = re.compile(r'<a\s[^>]*?href\s*=\s*["\']([^"\'#]+)["\'][^>]*>(.{0,200}?)</a>', re.IGNORECASE | re.DOTALL)
+SKIP_LINK_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.zip', '.doc', '.docx', '.xls', '.xlsx')
+
 
 class WebsiteParser:
     """Парсер сайтов для поиска контактов (Telegram, WhatsApp, etc.)"""
     
-    def __init__(self, timeout: int = 10, user_agent: str = None):
+    # Типы содержимого, которые имеет смысл читать
+    HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+    
+    def __init__(
+        self,
+        timeout: int = 10,
+        user_agent: str = None,
+        max_bytes: int = 1_000_000,
+        pool_connections: int = 100,
+        pool_maxsize: int = 4,
+        crawl_max_pages: int = 4,
+        crawl_max_depth: int = 1,
+        crawl_time_budget: float = 8.0,
+        crawl_byte_budget: int = 3_000_000,
+        cache: Optional[WebsiteCache] = None
+    ):
         """
         Инициализация парсера
         
         Args:
             timeout: Таймаут запроса в секундах
             user_agent: User-Agent для запросов
+            max_bytes: Максимум байт, читаемых со страницы (остальное отбрасывается)
+            pool_connections: Сколько хостов держать в пуле соединений
+            pool_maxsize: Соединений на один хост (и параллельных загрузок страниц сайта)
+            crawl_max_pages: Сколько страниц контактов загружать кроме главной
+            crawl_max_depth: Глубина обхода от главной страницы
+            crawl_time_budget: Лимит времени на сайт в секундах
+            crawl_byte_budget: Лимит загруженных байт на сайт
+            cache: Кеш страниц (условные запросы, разбор только изменившихся страниц)
         """
         self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.pool_maxsize = pool_maxsize
+        self.crawl_max_pages = crawl_max_pages
+        self.crawl_max_depth = crawl_max_depth
+        self.crawl_time_budget = crawl_time_budget
+        self.crawl_byte_budget = crawl_byte_budget
+        self.cache = cache
         self.user_agent = user_agent or (
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
             'AppleWebKit/537.36 (KHTML, like Gecko) '
             'Chrome/120.0.0.0 Safari/537.36'
         )
         
-        # Регулярные выражения для поиска
-        self.telegram_patterns = [
-            r't\.me/([a-zA-Z0-9_]+)',  # t.me/username
-            r'telegram\.me/([a-zA-Z0-9_]+)',  # telegram.me/username
-            r'@([a-zA-Z0-9_]{5,32})',  # @username (минимум 5 символов)
-            r'tg://resolve\?domain=([a-zA-Z0-9_]+)',  # tg://resolve
-        ]
-        
-        self.whatsapp_patterns = [
-            r'wa\.me/(\+?[0-9]{10,15})',  # wa.me/+79991234567
-            r'api\.whatsapp\.com/send\?phone=(\+?[0-9]{10,15})',  # API ссылка
-            r'whatsapp://send\?phone=(\+?[0-9]{10,15})',  # whatsapp:// протокол
-            r'chat\.whatsapp\.com/([a-zA-Z0-9]+)',  # Групповой чат
-        ]
-        
-        self.phone_patterns = [
-            r'\+7[\s-]?\(?[0-9]{3}\)?[\s-]?[0-9]{3}[\s-]?[0-9]{2}[\s-]?[0-9]{2}',  # +7
-            r'8[\s-]?\(?[0-9]{3}\)?[\s-]?[0-9]{3}[\s-]?[0-9]{2}[\s-]?[0-9]{2}',  # 8
-        ]
-        
-        self.email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+        # Одна сессия с пулом keep-alive соединений на каждый хост
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': self.user_agent,
+            'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.5'
+        })
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Запись/воспроизведение ответов сайтов (HTTP_FIXTURES, HTTP_MODE)
+        install_from_env(self.session, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
     
-    def parse_website(self, url: str) -> Dict:
+    def parse_website(self, url: str, crawl: bool = True) -> Dict:
         """
         Парсит сайт и извлекает контакты
         
+        Если на главной не хватает контактов, загружает страницы вида
+        /contacts, /kontakty, "О компании" (параллельно, в пределах
+        лимитов по страницам, глубине, времени и байтам).
+        
         Args:
             url: URL сайта для парсинга
+            crawl: Искать контакты на страницах контактов
             
         Returns:
             Словарь с найденными контактами
         """
-        result = {
-            'url': url,
-            'success': False,
-            'telegram': [],
-            'whatsapp': [],
-            'phones': [],
-            'emails': [],
-            'error': None
-        }
+        result = self._new_result(url)
         
         try:
-            # Добавляем схему если её нет
-            if not url.startswith(('http://', 'https://')):
-                url = 'https://' + url
-            
             # Делаем запрос
-            headers = {'User-Agent': self.user_agent}
-            response = requests.get(url, headers=headers, timeout=self.timeout, allow_redirects=True)
+            started = time.monotonic()
+            page = self._fetch(self._normalize_url(url))
             
-            if response.status_code == 200:
-                html_content = response.text
-                
-                # Ищем Telegram
-                result['telegram'] = self._find_telegram(html_content)
-                
-                # Ищем WhatsApp
-                result['whatsapp'] = self._find_whatsapp(html_content)
+            if page['error'] is None:
+                self._add_page(result, page)
                 
-                # Ищем телефоны
-                result['phones'] = self._find_phones(html_content)
+                if crawl and not self._has_enough_contacts(result):
+                    self._crawl_contact_pages(result, page, started)
                 
-                # Ищем email
-                result['emails'] = self._find_emails(html_content)
-                
-                # Успешно если нашли хоть что-то
-                result['success'] = any([
-                    result['telegram'],
-                    result['whatsapp'],
-                    result['phones'],
-                    result['emails']
-                ])
+                self._finish_result(result)
             else:
-                result['error'] = f"HTTP {response.status_code}"
+                result['error'] = page['error']
                 
         except requests.exceptions.Timeout:
             result['error'] = "Timeout"
@@ -110,84 +170,401 @@ class WebsiteParser:
             result['error'] = "Connection error"
         except Exception as e:
             result['error'] = str(e)
+        finally:
+            if self.cache:
+                self.cache.save()
         
         return result
     
-    def _find_telegram(self, html_content: str) -> List[str]:
-        """Ищет Telegram контакты в HTML"""
-        telegram_links = []
+    def _new_result(self, url: str) -> Dict:
+        """Пустой результат парсинга сайта"""
+        return {
+            'url': url,
+            'success': False,
+            'telegram': [],
+            'whatsapp': [],
+            'phones': [],
+            'emails': [],
+            'pages': [],
+            'error': None
+        }
+    
+    def _normalize_url(self, url: str) -> str:
+        """Добавить схему, если её нет"""
+        if not url.startswith(('http://', 'https://')):
+            url = 'https://' + url
+        return url
+    
+    def _add_page(self, result: Dict, page: Dict):
+        """Извлечь контакты со страницы и добавить в результат"""
+        self._merge_contacts(result, page['contacts'])
+        result['pages'].append(page['url'])
+    
+    def _finish_result(self, result: Dict):
+        """Успешно если нашли хоть что-то"""
+        result['success'] = any([
+            result['telegram'],
+            result['whatsapp'],
+            result['phones'],
+            result['emails']
+        ])
+    
+    def _crawl_contact_pages(self, result: Dict, landing: Dict, started: float):
+        """
+        Обойти страницы контактов, найденные на главной
         
-        for pattern in self.telegram_patterns:
-            matches = re.findall(pattern, html_content, re.IGNORECASE)
-            for match in matches:
-                # Очищаем от лишнего
-                cleaned = match.strip()
+        Страницы одного уровня загружаются параллельно. Обход прекращается,
+        когда контактов достаточно или исчерпан лимит времени/байт.
+        """
+        crawl = {'bytes': landing['bytes'], 'visited': {landing['url'].rstrip('/')}, 'pages_left': self.crawl_max_pages}
+        level = [landing]
+        
+        # Не через with: выход из него ждал бы все начатые загрузки и
+        # лимит времени не соблюдался бы
+        executor = ThreadPoolExecutor(max_workers=self.pool_maxsize)
+        try:
+            for _ in range(self.crawl_max_depth):
+                links = self._next_crawl_links(level, crawl)
+                if not links:
+                    return
                 
-                # Фильтруем спам и типичные ложные срабатывания
-                if self._is_valid_telegram(cleaned):
-                    # Форматируем единообразно
-                    if not cleaned.startswith('@'):
-                        formatted = f"@{cleaned}"
-                    else:
-                        formatted = cleaned
-                    
-                    if formatted not in telegram_links:
-                        telegram_links.append(formatted)
+                futures = [executor.submit(self._fetch, link) for link in links]
+                level = []
+                
+                try:
+                    time_left = self.crawl_time_budget - (time.monotonic() - started)
+                    for future in as_completed(futures, timeout=max(0.0, time_left)):
+                        try:
+                            page = future.result()
+                        except requests.exceptions.RequestException:
+                            continue
+                        
+                        if page['error'] is not None:
+                            continue
+                        
+                        crawl['bytes'] += page['bytes']
+                        self._add_page(result, page)
+                        level.append(page)
+                        
+                        if self._crawl_exhausted(result, crawl, started):
+                            break
+                except FuturesTimeout:
+                    pass
+                
+                # Незапущенные загрузки не нужны
+                for future in futures:
+                    future.cancel()
+                
+                if self._crawl_exhausted(result, crawl, started) or crawl['pages_left'] <= 0:
+                    return
+        finally:
+            # Не ждем начатые загрузки: они завершатся в фоне (не дольше timeout),
+            # их результат уже не используется
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _next_crawl_links(self, level: List[Dict], crawl: Dict) -> List[str]:
+        """Ссылки следующего уровня обхода, которые ещё не загружались"""
+        links = []
+        for page in level:
+            for link in page['links']:
+                if link.rstrip('/') not in crawl['visited'] and len(links) < crawl['pages_left']:
+                    crawl['visited'].add(link.rstrip('/'))
+                    links.append(link)
+        
+        crawl['pages_left'] -= len(links)
+        return links
+    
+    def _crawl_exhausted(self, result: Dict, crawl: Dict, started: float) -> bool:
+        """Контактов достаточно или исчерпан лимит байт/времени"""
+        return (
+            self._has_enough_contacts(result)
+            or crawl['bytes'] >= self.crawl_byte_budget
+            or time.monotonic() - started >= self.crawl_time_budget
+        )
+    
+    def _discover_contact_links(self, html: str, base_url: str) -> List[str]:
+        """
+        Найти на странице ссылки на страницы контактов того же сайта
         
-        return telegram_links[:5]  # Максимум 5 контактов
+        Returns:
+            Абсолютные URL, самые вероятные первыми
+        """
+        base_host = urlparse(base_url).netloc.lower().removeprefix('www.')
+        ranked = {}
+        
+        for href, text in LINK_PATTERN.findall(html):
+            href = href.strip()
+            if href.startswith(('mailto:', 'tel:', 'javascript:')):
+                continue
+            
+            link = urljoin(base_url, href)
+            parsed = urlparse(link)
+            
+            if parsed.scheme not in ('http', 'https'):
+                continue
+            if parsed.netloc.lower().removeprefix('www.') != base_host:
+                continue
+            if parsed.path.lower().endswith(SKIP_LINK_EXTENSIONS):
+                continue
+            
+            haystack = f"{parsed.path} {text}".lower()
+            for rank, keyword in enumerate(CONTACT_LINK_KEYWORDS):
+                if keyword in haystack:
+                    link = link.split('#')[0]
+                    ranked[link] = min(rank, ranked.get(link, rank))
+                    break
+        
+        return sorted(ranked, key=ranked.get)
+    
+    def _merge_contacts(self, result: Dict, found: Dict[str, List[str]]):
+        """Добавить найденные контакты в результат (без дубликатов, с лимитами)"""
+        for key, limit in CONTACT_LIMITS.items():
+            for value in found.get(key, []):
+                if len(result[key]) < limit and value not in result[key]:
+                    result[key].append(value)
+    
+    def _has_enough_contacts(self, result: Dict) -> bool:
+        """Мессенджеры и хотя бы телефон или email уже найдены"""
+        return bool(
+            result['telegram']
+            and result['whatsapp']
+            and (result['phones'] or result['emails'])
+        )
     
-    def _find_whatsapp(self, html_content: str) -> List[str]:
-        """Ищет WhatsApp контакты в HTML"""
-        whatsapp_contacts = []
+    def _fetch(self, url: str) -> Dict:
+        """
+        Загрузить HTML страницы потоково
         
-        for pattern in self.whatsapp_patterns:
-            matches = re.findall(pattern, html_content, re.IGNORECASE)
-            for match in matches:
-                cleaned = match.strip()
-                
-                if self._is_valid_phone(cleaned):
-                    # Форматируем телефон
-                    formatted = self._format_phone(cleaned)
-                    if formatted and formatted not in whatsapp_contacts:
-                        whatsapp_contacts.append(formatted)
-                elif 'chat.whatsapp.com' in pattern:
-                    # Групповой чат
-                    invite_link = f"https://chat.whatsapp.com/{cleaned}"
-                    if invite_link not in whatsapp_contacts:
-                        whatsapp_contacts.append(invite_link)
-        
-        return whatsapp_contacts[:3]  # Максимум 3 контакта
-    
-    def _find_phones(self, html_content: str) -> List[str]:
-        """Ищет телефоны в HTML"""
-        phones = []
-        
-        for pattern in self.phone_patterns:
-            matches = re.findall(pattern, html_content)
-            for match in matches:
-                cleaned = match.strip()
-                
-                if self._is_valid_phone(cleaned):
-                    formatted = self._format_phone(cleaned)
-                    if formatted and formatted not in phones:
-                        phones.append(formatted)
+        Читается не больше max_bytes, не-HTML ответы обрываются сразу
+        после заголовков, тело декодируется один раз.
+        
+        Returns:
+            Словарь страницы (см. _new_page); error = None при успехе
+        """
+        page = self._new_page(url)
+        cached = self.cache.get(url) if self.cache else None
+        
+        with track_upstream('website') as call, self.session.get(
+            url,
+            headers=self.cache.conditional_headers(cached) if self.cache else None,
+            timeout=self.timeout,
+            allow_redirects=True,
+            stream=True
+        ) as response:
+            page['url'] = response.url
+            page['status'] = call.status = response.status_code
+            
+            if response.status_code == 304 and cached:
+                return self._page_from_cache(page, url, cached, response.headers, not_modified=True)
+            
+            content_type = response.headers.get('Content-Type', '')
+            page['error'] = self._response_error(response.status_code, content_type)
+            if page['error']:
+                return page
+            
+            body = bytearray()
+            for chunk in response.iter_content(chunk_size=65536):
+                body.extend(chunk)
+                if len(body) >= self.max_bytes:
+                    del body[self.max_bytes:]
+                    break
+        
+        return self._complete_page(page, url, bytes(body), content_type, response.headers, cached)
+    
+    def _new_page(self, url: str) -> Dict:
+        """
+        Пустой результат загрузки страницы
         
-        return phones[:5]  # Максимум 5 телефонов
+        contacts и links заполняются разбором HTML или из кеша,
+        html = None, если страница взята из кеша.
+        """
+        return {
+            'url': url,
+            'status': None,
+            'html': None,
+            'bytes': 0,
+            'contacts': None,
+            'links': [],
+            'cached': False,
+            'error': None
+        }
     
-    def _find_emails(self, html_content: str) -> List[str]:
-        """Ищет email в HTML"""
-        matches = re.findall(self.email_pattern, html_content)
+    def _complete_page(self, page: Dict, url: str, body: bytes, content_type: str, headers, cached: Optional[Dict]) -> Dict:
+        """Разобрать тело страницы, если оно изменилось с прошлой загрузки"""
+        page['bytes'] = len(body)
         
-        # Фильтруем спам и типичные ложные срабатывания
-        emails = []
-        for email in matches:
-            email = email.lower().strip()
+        if self.cache:
+            digest = self.cache.body_hash(body)
+            if cached and cached.get('sha1') == digest:
+                return self._page_from_cache(page, url, cached, headers, not_modified=False)
+        
+        if self.cache:
+            cache_lookup('website', hit=False)
+        
+        page['html'] = self._decode(body, content_type)
+        page['contacts'] = self._extract_contacts(page['html'])
+        page['links'] = self._discover_contact_links(page['html'], page['url'])
+        
+        if self.cache:
+            self.cache.put(url, page['url'], headers, digest, page['contacts'], page['links'])
+        
+        return page
+    
+    def _page_from_cache(self, page: Dict, url: str, cached: Dict, headers, not_modified: bool) -> Dict:
+        """Страница не изменилась: контакты и ссылки из кеша, без разбора HTML"""
+        self.cache.revalidated(url, cached, headers, not_modified)
+        cache_lookup('website', hit=True)
+        page['url'] = cached.get('final_url') or page['url']
+        page['contacts'] = cached['contacts']
+        page['links'] = cached['links']
+        page['cached'] = True
+        page['error'] = None
+        return page
+    
+    def _response_error(self, status: int, content_type: str) -> Optional[str]:
+        """Причина не читать тело ответа (не 200 или не HTML)"""
+        if status != 200:
+            return f"HTTP {status}"
+        
+        mime_type = content_type.split(';')[0].strip().lower()
+        if mime_type and mime_type not in self.HTML_CONTENT_TYPES:
+            return f"Not HTML: {mime_type}"
+        
+        return None
+    
+    def _decode(self, body: bytes, content_type: str) -> str:
+        """
+        Декодировать тело страницы
+        
+        Кодировка берется из Content-Type, затем из <meta charset> в начале
+        документа, иначе UTF-8. Без угадывания по всему телу.
+        """
+        match = re.search(r'charset=["\']?([\w-]+)', content_type, re.IGNORECASE)
+        if not match:
+            match = re.search(rb'<meta[^>]+charset=["\']?([\w-]+)', body[:4096], re.IGNORECASE)
+        
+        encoding = match.group(1) if match else 'utf-8'
+        if isinstance(encoding, bytes):
+            encoding = encoding.decode('ascii', 'ignore')
+        
+        try:
+            return body.decode(encoding, errors='replace')
+        except LookupError:
+            return body.decode('utf-8', errors='replace')
+    
+    def _extract_contacts(self, html_content: str) -> Dict[str, List[str]]:
+        """
+        Извлечь все типы контактов из HTML за один проход (см. _scan_contacts)
+        
+        Правила валидации и форматирования те же, что и раньше;
+        сканирование останавливается, когда все лимиты заполнены.
+        """
+        found = {key: [] for key in CONTACT_LIMITS}
+        
+        def add(key: str, value: str):
+            if len(found[key]) < CONTACT_LIMITS[key] and value not in found[key]:
+                found[key].append(value)
+        
+        for kind, value in self._scan_contacts(html_content):
+            if kind == 'telegram':
+                # Фильтруем спам и типичные ложные срабатывания
+                if self._is_valid_telegram(value):
+                    add('telegram', f"@{value.lstrip('@')}")
+            
+            elif kind == 'whatsapp':
+                if self._is_valid_phone(value):
+                    formatted = self._format_phone(value)
+                    if formatted:
+                        add('whatsapp', formatted)
+                        # Номер из ссылки WhatsApp - это и телефон компании
+                        if PHONE_PATTERN.match(value):
+                            add('phones', formatted)
+            
+            elif kind == 'whatsapp_chat':
+                add('whatsapp', f"https://chat.whatsapp.com/{value}")
             
-            if self._is_valid_email(email):
-                if email not in emails:
-                    emails.append(email)
+            elif kind == 'phone':
+                if self._is_valid_phone(value):
+                    formatted = self._format_phone(value)
+                    if formatted:
+                        add('phones', formatted)
+            
+            elif kind == 'email':
+                email = value.lower()
+                if self._is_valid_email(email):
+                    add('emails', email)
+            
+            if all(len(found[key]) >= limit for key, limit in CONTACT_LIMITS.items()):
+                break
+        
+        return found
+    
+    def _scan_contacts(self, html: str):
+        """
+        Один проход по HTML: выдает пары (тип, значение) в порядке документа
         
-        return emails[:5]  # Максимум 5 email
+        Типы: telegram, whatsapp, whatsapp_chat, phone, email
+        """
+        candidates = [
+            (match.start(), 'phone', match)
+            for match in PHONE.finditer(html)
+        ]
+        for literal, offset, kind in CONTACT_TRIGGERS:
+            index = html.find(literal)
+            while index != -1:
+                candidates.append((max(0, index + offset), kind, None))
+                index = html.find(literal, index + 1)
+        
+        candidates.sort(key=lambda candidate: candidate[0])
+        
+        consumed = 0
+        for start, kind, match in candidates:
+            if start < consumed:
+                continue
+            
+            if kind == 'phone':
+                yield 'phone', match.group()
+            
+            elif kind == 'at':
+                # email: локальная часть ищется назад от "@"
+                local = EMAIL_LOCAL_TAIL.search(html, max(0, start - 64), start)
+                if local:
+                    match = EMAIL.search(html, local.start(), start + 256)
+                    if match and match.start() > start:
+                        match = None
+                if match:
+                    yield 'email', match.group()
+                else:
+                    match = TELEGRAM_AT.match(html, start)
+                    if match:
+                        yield 'telegram', match.group(1)
+            
+            elif kind == 'me':
+                before = html[max(0, start - 8):start].lower()
+                if before.endswith('telegram') or before.endswith('t'):
+                    match = TELEGRAM_LINK.match(html, start)
+                    if match:
+                        yield 'telegram', match.group(1)
+                elif before.endswith('wa'):
+                    match = WHATSAPP_LINK.match(html, start)
+                    if match:
+                        yield 'whatsapp', match.group(1)
+            
+            elif kind == 'tg':
+                match = TELEGRAM_RESOLVE.match(html, start)
+                if match:
+                    yield 'telegram', match.group(1)
+            
+            elif kind == 'whatsapp':
+                match = WHATSAPP_API.match(html, start)
+                if match:
+                    if match.group(1):
+                        yield 'whatsapp', match.group(1)
+                    else:
+                        yield 'whatsapp_chat', match.group(2)
+            
+            if match:
+                consumed = match.end()
     
     def _is_valid_telegram(self, username: str) -> bool:
         """Проверяет валидность Telegram username"""
@@ -202,7 +579,7 @@ class WebsiteParser:
             return False
         
         # Только буквы, цифры и подчеркивание
-        if not re.match(r'^[a-zA-Z0-9_]+$', username):
+        if not TELEGRAM_USERNAME.match(username):
             return False
         
         # Фильтруем типичные ложные срабатывания
@@ -223,7 +600,7 @@ class WebsiteParser:
             return False
         
         # Убираем все кроме цифр и +
-        digits = re.sub(r'[^\d+]', '', phone)
+        digits = NON_PHONE_CHARS.sub('', phone)
         
         # Проверяем длину (для российских номеров)
         if len(digits) < 11:
@@ -266,7 +643,7 @@ class WebsiteParser:
     def _format_phone(self, phone: str) -> Optional[str]:
         """Форматирует телефон в единый формат"""
         # Убираем все кроме цифр и +
-        digits = re.sub(r'[^\d+]', '', phone)
+        digits = NON_PHONE_CHARS.sub('', phone)
         
         # Для российских номеров
         if digits.startswith('8') and len(digits) == 11:
@@ -280,26 +657,227 @@ class WebsiteParser:
         
         return None
     
-    def parse_multiple_websites(self, urls: List[str]) -> List[Dict]:
+    def parse_multiple_websites(
+        self,
+        urls: List[str],
+        concurrency: int = 20,
+        per_domain: int = 2,
+        domain_delay: float = 0.5,
+        crawl: bool = True
+    ) -> List[Dict]:
         """
-        Парсит несколько сайтов
+        Парсит несколько сайтов параллельно
+        
+        Разные домены загружаются одновременно, задержка domain_delay
+        соблюдается только между запросами к одному домену.
         
         Args:
             urls: Список URL для парсинга
+            concurrency: Сколько сайтов обрабатывать одновременно
+            per_domain: Одновременных запросов к одному домену
+            domain_delay: Пауза между запросами к одному домену в секундах
+            crawl: Искать контакты на страницах контактов
             
         Returns:
-            Список словарей с результатами
+            Список словарей с результатами (в порядке urls)
         """
-        results = []
+        if aiohttp is None:
+            results = []
+            for url in urls:
+                results.append(self.parse_website(url, crawl=crawl))
+                time.sleep(domain_delay)
+            return results
+        
+        async def collect():
+            results = [None] * len(urls)
+            async for index, result in self.iter_websites_async(
+                urls, concurrency, per_domain, domain_delay, crawl
+            ):
+                results[index] = result
+            return results
+        
+        return asyncio.run(collect())
+    
+    async def iter_websites_async(
+        self,
+        urls: List[str],
+        concurrency: int = 20,
+        per_domain: int = 2,
+        domain_delay: float = 0.5,
+        crawl: bool = True
+    ) -> AsyncIterator[Tuple[int, Dict]]:
+        """
+        Парсит сайты асинхронно и отдает результаты по мере готовности
+        
+        Yields:
+            (индекс URL в urls, результат как у parse_website)
+        """
+        if aiohttp is None:
+            raise RuntimeError("Для асинхронного парсинга установите aiohttp")
+        
+        politeness = _DomainPoliteness(per_domain, domain_delay)
+        slots = asyncio.Semaphore(concurrency)
+        connector = aiohttp.TCPConnector(
+            limit=concurrency * per_domain,
+            limit_per_host=per_domain,
+            ttl_dns_cache=600
+        )
         
-        for url in urls:
-            result = self.parse_website(url)
-            results.append(result)
+        async with aiohttp.ClientSession(
+            connector=connector,
+            headers=dict(self.session.headers),
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        ) as session:
+            
+            async def parse(index: int, url: str) -> Tuple[int, Dict]:
+                # Семафор берется до запроса, чтобы ожидание очереди
+                # не съедало таймаут самого запроса
+                async with slots:
+                    return index, await self._parse_website_async(session, politeness, url, crawl)
+            
+            tasks = [asyncio.create_task(parse(i, url)) for i, url in enumerate(urls)]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+            finally:
+                for task in tasks:
+                    task.cancel()
+                if self.cache:
+                    self.cache.save()
+    
+    async def _parse_website_async(self, session, politeness, url: str, crawl: bool) -> Dict:
+        """Асинхронный вариант parse_website"""
+        result = self._new_result(url)
+        
+        try:
+            started = time.monotonic()
+            page = await self._fetch_async(session, politeness, self._normalize_url(url))
             
-            # Небольшая задержка между запросами
-            time.sleep(0.5)
+            if page['error'] is None:
+                self._add_page(result, page)
+                
+                if crawl and not self._has_enough_contacts(result):
+                    await self._crawl_contact_pages_async(session, politeness, result, page, started)
+                
+                self._finish_result(result)
+            else:
+                result['error'] = page['error']
+                
+        except asyncio.TimeoutError:
+            result['error'] = "Timeout"
+        except aiohttp.ClientConnectionError:
+            result['error'] = "Connection error"
+        except Exception as e:
+            result['error'] = str(e)
         
-        return results
+        return result
+    
+    async def _crawl_contact_pages_async(self, session, politeness, result: Dict, landing: Dict, started: float):
+        """Асинхронный вариант _crawl_contact_pages с теми же лимитами"""
+        crawl = {'bytes': landing['bytes'], 'visited': {landing['url'].rstrip('/')}, 'pages_left': self.crawl_max_pages}
+        level = [landing]
+        
+        for _ in range(self.crawl_max_depth):
+            links = self._next_crawl_links(level, crawl)
+            if not links:
+                return
+            
+            pending = {asyncio.create_task(self._fetch_async(session, politeness, link)) for link in links}
+            level = []
+            
+            try:
+                while pending and not self._crawl_exhausted(result, crawl, started):
+                    time_left = self.crawl_time_budget - (time.monotonic() - started)
+                    done, pending = await asyncio.wait(
+                        pending, timeout=time_left, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    
+                    for task in done:
+                        if task.exception() is not None:
+                            continue
+                        
+                        page = task.result()
+                        if page['error'] is not None:
+                            continue
+                        
+                        crawl['bytes'] += page['bytes']
+                        self._add_page(result, page)
+                        level.append(page)
+            finally:
+                for task in pending:
+                    task.cancel()
+            
+            if self._crawl_exhausted(result, crawl, started) or crawl['pages_left'] <= 0:
+                return
+    
+    async def _fetch_async(self, session, politeness, url: str) -> Dict:
+        """Асинхронный вариант _fetch (тот же лимит размера и проверка HTML)"""
+        page = self._new_page(url)
+        cached = self.cache.get(url) if self.cache else None
+        headers = self.cache.conditional_headers(cached) if self.cache else None
+        
+        async with politeness.slot(url):
+            with track_upstream('website') as call:
+                async with session.get(url, headers=headers, allow_redirects=True) as response:
+                    page['url'] = str(response.url)
+                    page['status'] = call.status = response.status
+                
+                    if response.status == 304 and cached:
+                        return self._page_from_cache(page, url, cached, response.headers, not_modified=True)
+                
+                    content_type = response.headers.get('Content-Type', '')
+                    page['error'] = self._response_error(response.status, content_type)
+                    if page['error']:
+                        return page
+                
+                    body = bytearray()
+                    async for chunk in response.content.iter_chunked(65536):
+                        body.extend(chunk)
+                        if len(body) >= self.max_bytes:
+                            del body[self.max_bytes:]
+                            break
+        
+        # Декодирование и разбор HTML - в пуле потоков, чтобы не задерживать
+        # загрузки других доменов в цикле событий (кеш сайтов потокобезопасен)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._complete_page, page, url, bytes(body), content_type, response.headers, cached
+        )
+
+
+class _DomainPoliteness:
+    """Ограничение параллельности и частоты запросов к одному домену"""
+    
+    def __init__(self, per_domain: int, delay: float):
+        self.per_domain = per_domain
+        self.delay = delay
+        self.semaphores = {}
+        self.next_request_at = {}
+    
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """Дождаться очереди домена перед запросом"""
+        domain = urlparse(url).netloc.lower().removeprefix('www.')
+        semaphore = self.semaphores.setdefault(domain, asyncio.Semaphore(self.per_domain))
+        
+        QUEUE_DEPTH.inc(queue='website_domain')
+        try:
+            await semaphore.acquire()
+        finally:
+            QUEUE_DEPTH.dec(queue='website_domain')
+        
+        try:
+            # Время следующего запроса резервируется до ожидания,
+            # поэтому параллельные запросы к домену идут с интервалом delay
+            now = asyncio.get_running_loop().time()
+            request_at = max(now, self.next_request_at.get(domain, now))
+            self.next_request_at[domain] = request_at + self.delay
+            
+            if request_at > now:
+                await asyncio.sleep(request_at - now)
+            
+            yield
+        finally:
+            semaphore.release()
 
 
 def main():